@@ -1,4 +1,4 @@
-from app.util.constants import LOCAL_EMBEDDING_MODEL_KEY
+from app.util.constants import LOCAL_EMBEDDING_MODEL_KEY, MAX_SIZE_EMBEDDINGS_KEY
 from app.util.openai_wrapper import UIOpenAIConfiguration
 from app.util.secrets_handler import SecretsHandler
 from intelligence_toolkit.AI.base_embedder import BaseEmbedder
@@ -15,16 +15,21 @@ def create_embedder(
     try:
         ai_configuration = UIOpenAIConfiguration().get_configuration()
         secrets_handler = SecretsHandler()
+        max_cached_embeddings = int(
+            secrets_handler.get_secret(MAX_SIZE_EMBEDDINGS_KEY) or 0
+        )
         if local_embedding:
             return LocalEmbedder(
                 db_name=config.cache_name,
                 max_tokens=ai_configuration.max_tokens,
                 model=secrets_handler.get_secret(LOCAL_EMBEDDING_MODEL_KEY) or None,
+                max_cached_embeddings=max_cached_embeddings,
             )
         return OpenAIEmbedder(
             configuration=ai_configuration,
             db_name=config.cache_name,
             concurrent_coroutines=concurrent_coroutines,
+            max_cached_embeddings=max_cached_embeddings,
         )
     except Exception as e:
         print(f"Error creating connection: {e}")
\ No newline at end of file
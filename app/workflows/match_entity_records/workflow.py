@@ -4,7 +4,6 @@
 import io
 import os
 
-import numpy as np
 import polars as pl
 import streamlit as st
 
@@ -261,7 +260,6 @@ async def create(sv: rm_variables.SessionVariable, workflow=None) -> None:
                             sv.matching_sentence_pair_embedding_threshold.value
                         )
                         sv.matching_merged_df.value = mer.build_model_df(attsa)
-                        all_sentences_data = mer.sentences_vector_data
 
                         pb = st.progress(0, "Embedding text batches...")
 
@@ -274,24 +272,9 @@ async def create(sv: rm_variables.SessionVariable, workflow=None) -> None:
                         callback = ProgressBatchCallback()
                         callback.on_batch_change = on_embedding_batch_change
 
-                        functions_embedder = functions.embedder(local_embedding)
-                        data_embeddings = await functions_embedder.embed_store_many(
-                            all_sentences_data, [callback], sv_home.save_cache.value
-                        )
-
-                        all_sentences = [x["text"] for x in all_sentences_data]
-                        all_embeddings = [
-                            np.array(
-                                next(
-                                    d["vector"]
-                                    for d in data_embeddings
-                                    if d["text"] == f
-                                )
-                            )
-                            for f in all_sentences
-                        ]
-                        mer.embeddings = all_embeddings
-                        mer.all_sentences = all_sentences
+                        mer.embedder = functions.embedder(local_embedding)
+                        mer.cache_embeddings = sv_home.save_cache.value
+                        await mer.embed_sentences([callback])
 
                         pb.empty()
                         sv.matching_matches_df.value = mer.detect_record_groups(
@@ -12,6 +12,7 @@ import streamlit as st
 import app.util.embedder as embedder
 import app.util.example_outputs_ui as example_outputs_ui
 import app.workflows.query_text_data.functions as functions
+import intelligence_toolkit.query_text_data.config as qtd_config
 import intelligence_toolkit.query_text_data.prompts as prompts
 from app.util import ui_components
 from app.util.download_pdf import add_download_pdf
@@ -123,6 +124,8 @@ async def create(sv: SessionVariables, workflow=None):
                 "Embedded {} of {} text chunks..."
             )
             await qtd.embed_text_chunks(callbacks=[embed_callback])
+            if len(qtd.cid_to_vector) >= qtd_config.vector_index_min_rows:
+                qtd.create_vector_index()
             chunk_pb.empty()
             embed_pb.empty()
             st.rerun()
@@ -4,6 +4,7 @@
 
 
 import asyncio
+from collections.abc import Callable
 
 from tqdm.asyncio import tqdm_asyncio
 
@@ -18,29 +19,33 @@ class BaseChat(BaseBatchAsync, OpenAIClient):
     def __init__(
         self, configuration=None, concurrent_coroutines=DEFAULT_CONCURRENT_COROUTINES
     ) -> None:
-        OpenAIClient.__init__(self, configuration)
-        self.semaphore = asyncio.Semaphore(concurrent_coroutines)
+        OpenAIClient.__init__(self, configuration, concurrent_coroutines)
 
     @retry_with_backoff()
     async def generate_text_async(self, messages, callbacks, stream, **llm_kwargs):
-        async with self.semaphore:
-            try:
-                chat = await self.generate_chat_async(messages=messages, stream=stream, **llm_kwargs)
-                if callbacks:
-                    self.progress_callback()
-            except Exception as e:
-                print(f"Error validating report: {e}")
-                msg = f"Problem in OpenAI response. {e}"
-                raise Exception(msg) from e
-            return chat
+        # Concurrency and rate budgets are enforced by the shared rate_limiter
+        try:
+            chat = await self.generate_chat_async(messages=messages, stream=stream, **llm_kwargs)
+            if callbacks:
+                self.progress_callback()
+        except Exception as e:
+            print(f"Error validating report: {e}")
+            msg = f"Problem in OpenAI response. {e}"
+            raise Exception(msg) from e
+        return chat
 
-    @retry_with_backoff()
     async def generate_texts_async(
         self,
         messages_list: list[list[dict[str, str]]],
         callbacks: list[ProgressBatchCallback] | None = None,
+        on_result: Callable[[int, str], None] | None = None,
         **llm_kwargs,
     ):
+        """Generate a response per message list concurrently, in input order.
+
+        `on_result` is called with the index and response of each request as soon
+        as it completes, so callers can use partial results before all are done.
+        """
         self.total_tasks = len(messages_list)
         tasks = [
             asyncio.create_task(
@@ -48,6 +53,13 @@ class BaseChat(BaseBatchAsync, OpenAIClient):
             )
             for messages in messages_list
         ]
+        if on_result is not None:
+            for index, task in enumerate(tasks):
+                task.add_done_callback(
+                    lambda task, index=index: task.cancelled()
+                    or task.exception() is not None
+                    or on_result(index, task.result())
+                )
         if callbacks:
             progress_task = asyncio.create_task(self.track_progress(tasks, callbacks))
         result = await tqdm_asyncio.gather(*tasks)
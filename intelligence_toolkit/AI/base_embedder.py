@@ -8,7 +8,6 @@ from abc import ABC, abstractmethod
 from typing import Any
 
 import numpy as np
-import pyarrow as pa
 from tqdm.asyncio import tqdm_asyncio
 
 from intelligence_toolkit.AI.base_batch_async import BaseBatchAsync
@@ -16,25 +15,24 @@ from intelligence_toolkit.AI.classes import VectorData
 from intelligence_toolkit.AI.defaults import (
     DEFAULT_CONCURRENT_COROUTINES,
     DEFAULT_LLM_MAX_TOKENS,
+    DEFAULT_MAX_CACHED_EMBEDDINGS,
+    EMBEDDING_BATCH_MAX_INPUTS,
+    EMBEDDING_BATCH_MAX_TOKENS,
     EMBEDDING_BATCHES_NUMBER,
 )
+from intelligence_toolkit.AI.embedding_cache import EmbeddingCache
+from intelligence_toolkit.AI.rate_limiter import (
+    RateLimiter,
+    estimate_tokens,
+    get_rate_limiter,
+)
 from intelligence_toolkit.AI.utils import get_token_count, hash_text
-from intelligence_toolkit.AI.vector_store import VectorStore
 from intelligence_toolkit.helpers.constants import CACHE_PATH
 from intelligence_toolkit.helpers.decorators import retry_with_backoff
 from intelligence_toolkit.helpers.progress_batch_callback import ProgressBatchCallback
 
 logger = logging.getLogger(__name__)
 
-schema = pa.schema(
-    [
-        pa.field("hash", pa.string()),
-        pa.field("text", pa.string()),
-        pa.field("vector", pa.list_(pa.float64())),
-        pa.field("additional_details", pa.string()),
-    ]
-)
-
 
 class BaseEmbedder(ABC, BaseBatchAsync):
     def __init__(
@@ -44,19 +42,30 @@ class BaseEmbedder(ABC, BaseBatchAsync):
         max_tokens=DEFAULT_LLM_MAX_TOKENS,
         concurrent_coroutines=DEFAULT_CONCURRENT_COROUTINES,
         check_token_count=True,
+        model: str = "",
+        max_cached_embeddings=DEFAULT_MAX_CACHED_EMBEDDINGS,
     ) -> None:
-        self.vector_store = VectorStore(db_name, db_path, schema)
+        self.embedding_cache = EmbeddingCache(db_name, db_path, max_cached_embeddings)
+        self.vector_store = self.embedding_cache.vector_store
+        self.model = model
         self.max_tokens = max_tokens
-        self.semaphore = asyncio.Semaphore(concurrent_coroutines)
+        self.max_batch_inputs = EMBEDDING_BATCH_MAX_INPUTS
+        self.max_batch_tokens = EMBEDDING_BATCH_MAX_TOKENS
+        self.rate_limiter = self._create_rate_limiter(concurrent_coroutines)
         self.check_token_count = check_token_count
 
+    def _create_rate_limiter(self, concurrent_coroutines: int) -> RateLimiter:
+        return get_rate_limiter(
+            ("embedder", type(self).__name__, self.model), concurrent_coroutines
+        )
+
     @retry_with_backoff()
     async def embed_one_async(
         self,
         data: VectorData,
         has_callback=False,
     ) -> Any | list[float]:
-        async with self.semaphore:
+        async with self.rate_limiter.limit(lambda: estimate_tokens(data["text"])):
             if not data["hash"]:
                 text_hashed = hash_text(data["text"])
                 data["hash"] = text_hashed
@@ -70,16 +79,17 @@ class BaseEmbedder(ABC, BaseBatchAsync):
                     except Exception:
                         pass
             try:
-                embedding = await asyncio.wait_for(
-                    self._generate_embedding_async(data["text"]), timeout=90
-                )
+                # The call stays in this task, so a client sharing the limiter
+                # sees the slot as already held instead of waiting for another
+                async with asyncio.timeout(90):
+                    embedding = await self._generate_embedding_async(data["text"])
                 data["additional_details"] = json.dumps(
                     data["additional_details"] if "additional_details" in data else {}
                 )
                 data["vector"] = embedding
             except Exception as e:
                 msg = f"Timeout in embedding generation. {e} Please try again."
-                raise Exception(msg)
+                raise Exception(msg) from e
 
             if has_callback:
                 self.progress_callback()
@@ -89,16 +99,13 @@ class BaseEmbedder(ABC, BaseBatchAsync):
     def embed_store_one(
         self, text: str, cache_data=True, additional_detail: Any = "{}"
     ) -> Any | list[float]:
-        cache_data = False  # disable for now
         text_hashed = hash_text(text)
         if cache_data:
-            existing_embedding = (
-                self.vector_store.search_by_column(text_hashed, "hash")
-                if cache_data
-                else []
+            existing_embedding = self.embedding_cache.get_many(
+                [text_hashed], self.model
             )
-            if len(existing_embedding) > 0:
-                return existing_embedding.get("vector")[0]
+            if text_hashed in existing_embedding:
+                return existing_embedding[text_hashed]
 
         # error when local
         if self.check_token_count:
@@ -118,78 +125,152 @@ class BaseEmbedder(ABC, BaseBatchAsync):
                 "vector": embedding,
                 "additional_details": json.dumps(additional_detail),
             }
-            self.vector_store.save([data]) if cache_data else None
+            self.embedding_cache.put_many([data], self.model) if cache_data else None
         except Exception as e:
             msg = f"Problem in embedding generation. {e}"
-            raise Exception(msg)
+            raise Exception(msg) from e
         return embedding
 
     @retry_with_backoff()
+    async def embed_batch_async(
+        self,
+        items: list[VectorData],
+        has_callback=False,
+        cache_data=False,
+    ) -> np.ndarray:
+        texts = [item["text"] for item in items]
+        async with self.rate_limiter.limit(lambda: estimate_tokens(texts)):
+            try:
+                async with asyncio.timeout(90):
+                    embeddings = await self._generate_embeddings_async(texts)
+            except Exception as e:
+                msg = f"Timeout in embedding generation. {e} Please try again."
+                raise Exception(msg) from e
+
+            for item, embedding in zip(items, embeddings, strict=True):
+                item["additional_details"] = json.dumps(
+                    item["additional_details"] if "additional_details" in item else {}
+                )
+                item["vector"] = embedding
+            if cache_data:
+                self.embedding_cache.put_many(items, self.model)
+
+            if has_callback:
+                self.completed_tasks += len(items)
+            return embeddings
+
+    def _count_tokens(self, item: VectorData) -> int:
+        if self.check_token_count:
+            try:
+                tokens = get_token_count(item["text"])
+                if tokens > self.max_tokens:
+                    item["text"] = item["text"][: self.max_tokens]
+                    logger.info("Truncated text to max tokens")
+                    return self.max_tokens
+                return tokens
+            except Exception:
+                pass
+        # Rough estimate of ~4 characters per token
+        return len(item["text"]) // 4 + 1
+
+    def _pack_batches(self, items: list[VectorData]) -> list[list[VectorData]]:
+        """Group texts into requests bounded by the provider's input and token limits."""
+        batches = []
+        current = []
+        current_tokens = 0
+        for item in items:
+            tokens = self._count_tokens(item)
+            if len(current) > 0 and (
+                len(current) >= self.max_batch_inputs
+                or current_tokens + tokens > self.max_batch_tokens
+            ):
+                batches.append(current)
+                current = []
+                current_tokens = 0
+            current.append(item)
+            current_tokens += tokens
+        if len(current) > 0:
+            batches.append(current)
+        return batches
+
     async def embed_store_many(
         self,
         data: list[VectorData],
         callbacks: list[ProgressBatchCallback] | None = None,
         cache_data=True,
     ) -> np.ndarray[Any, np.dtype[Any]]:
-        cache_data = False  # disable for now
         self.total_tasks = len(data)
-        final_embeddings = []
-        loaded_texts = []
-        all_data = []
+        loaded_count = 0
+        # Identical texts are embedded once and shared
+        new_items = {}
+        duplicates = []
 
         for i in range(0, len(data), (EMBEDDING_BATCHES_NUMBER)):
             batch_data = data[i : i + (EMBEDDING_BATCHES_NUMBER)]
+            for item in batch_data:
+                if not item.get("hash"):
+                    item["hash"] = hash_text(item["text"])
 
-            if cache_data:
-                hash_all_texts = [hash_text(item["text"]) for item in batch_data]
-                existing = self.vector_store.search_by_column(hash_all_texts, "hash")
-
-                if len(existing.get("vector")) > 0:
-                    existing_texts = existing.sort_values("text")
-                    for item in existing_texts.to_numpy():
-                        all_data.append(
-                            {
-                                "hash": item[0],
-                                "text": item[1],
-                                "vector": item[2],
-                                "additional_details": item[3]
-                                if len(item) > 3
-                                else "{}",
-                            }
-                        )
-                        loaded_texts.append(item[1])
-                        final_embeddings.append(item[2])
-
-            new_items = [
-                item for item in batch_data if item["text"] not in loaded_texts
-            ]
-            if len(new_items) > 0:
-                tasks = [
-                    asyncio.create_task(self.embed_one_async(item, callbacks))
-                    for item in new_items
-                ]
-                if callbacks:
-                    progress_task = asyncio.create_task(
-                        self.track_progress(tasks, callbacks)
+            existing = (
+                self.embedding_cache.get_many(
+                    [item["hash"] for item in batch_data], self.model
+                )
+                if cache_data
+                else {}
+            )
+
+            for item in batch_data:
+                vector = existing.get(item["hash"])
+                if vector is not None:
+                    item["vector"] = vector
+                    item["additional_details"] = json.dumps(
+                        item.get("additional_details", {})
                     )
-                result = await tqdm_asyncio.gather(*tasks)
-                if callbacks:
-                    await progress_task
-                embeddings = [embedding[0] for embedding in result]
-                new_data = [embedding[1] for embedding in result]
-                all_data.extend(new_data)
-
-                final_embeddings.extend(embeddings)
-                if cache_data:
-                    self.vector_store.save(new_data)
-                    self.vector_store.update_duckdb_data()
-
-        print(f"Got {len(loaded_texts)} existing texts")
-        logger.info("Got %s existing texts", len(loaded_texts))
-        print(f"Got {len(final_embeddings) - len(loaded_texts)} new texts")
-        logger.info("Got %s new texts", len(final_embeddings) - len(loaded_texts))
-
-        return all_data
+                    loaded_count += 1
+                    if callbacks:
+                        self.progress_callback()
+                elif item["hash"] in new_items:
+                    duplicates.append(item)
+                else:
+                    new_items[item["hash"]] = item
+
+        if len(new_items) > 0:
+            tasks = [
+                asyncio.create_task(
+                    self.embed_batch_async(batch, callbacks, cache_data)
+                )
+                for batch in self._pack_batches(list(new_items.values()))
+            ]
+            if callbacks:
+                progress_task = asyncio.create_task(
+                    self.track_progress(tasks, callbacks)
+                )
+            await tqdm_asyncio.gather(*tasks)
+            if callbacks:
+                await progress_task
+
+        for item in duplicates:
+            item["vector"] = new_items[item["hash"]]["vector"]
+            item["additional_details"] = json.dumps(item.get("additional_details", {}))
+            if callbacks:
+                self.progress_callback()
+
+        print(f"Got {loaded_count} existing texts")
+        logger.info("Got %s existing texts", loaded_count)
+        print(f"Got {len(data) - loaded_count} new texts")
+        logger.info("Got %s new texts", len(data) - loaded_count)
+
+        return list(data)
+
+    async def _generate_embeddings_async(self, texts: list[str]) -> np.ndarray:
+        """Generate embeddings for a batch of texts as a float32 matrix.
+
+        Subclasses override this to send the whole batch in a single request.
+        """
+        embeddings = await asyncio.gather(
+            *[self._generate_embedding_async(text) for text in texts]
+        )
+        return np.asarray(embeddings, dtype=np.float32)
 
     @abstractmethod
     def _generate_embedding(self, text: str) -> list[float]:
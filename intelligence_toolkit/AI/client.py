@@ -1,79 +1,245 @@
 # Copyright (c) 2024 Microsoft Corporation. All rights reserved.
 # Licensed under the MIT license. See LICENSE file in the project.
 #
+import asyncio
 import logging
+import threading
+import weakref
 
+import httpx
 from azure.identity import DefaultAzureCredential, get_bearer_token_provider
-from openai import AsyncAzureOpenAI, AsyncOpenAI, AzureOpenAI, OpenAI
+from openai import (
+    AsyncAzureOpenAI,
+    AsyncOpenAI,
+    AzureOpenAI,
+    DefaultAsyncHttpxClient,
+    DefaultHttpxClient,
+    OpenAI,
+)
 
 from intelligence_toolkit.AI.classes import LLMCallback
+from intelligence_toolkit.AI.rate_limiter import (
+    RateLimiter,
+    estimate_tokens,
+    get_rate_limiter,
+)
 
-from .defaults import API_BASE_REQUIRED_FOR_AZURE, DEFAULT_EMBEDDING_MODEL
+from .defaults import (
+    API_BASE_REQUIRED_FOR_AZURE,
+    DEFAULT_CONCURRENT_COROUTINES,
+    DEFAULT_EMBEDDING_MODEL,
+    OPENAI_KEEPALIVE_EXPIRY,
+    OPENAI_MAX_CONNECTIONS,
+    OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+)
 from .openai_configuration import OpenAIConfiguration
 
 log = logging.getLogger(__name__)
 
+# Long-lived clients shared by every OpenAIClient with the same configuration,
+# so calls reuse warm connections and credentials instead of rebuilding them
+_sync_clients: dict[tuple, OpenAI | AzureOpenAI] = {}
+_async_clients: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+_async_client_closers: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+_unbound_async_clients: dict[tuple, AsyncOpenAI | AsyncAzureOpenAI] = {}
+_token_providers: dict[tuple, object] = {}
+_client_pool_lock = threading.RLock()
+
+
+def reset_client_pool() -> None:
+    """Drop every pooled client, e.g. after credentials change."""
+    with _client_pool_lock:
+        _sync_clients.clear()
+        _async_clients.clear()
+        _async_client_closers.clear()
+        _unbound_async_clients.clear()
+        _token_providers.clear()
+
+
+async def _close_on_shutdown(client):
+    try:
+        yield
+    finally:
+        try:
+            await client.close()
+        except Exception:
+            log.warning("Failed to close pooled async client", exc_info=True)
+
+
+def _close_with_loop(loop: asyncio.AbstractEventLoop, client) -> None:
+    # Starting the generator inside the loop registers it with the loop, whose
+    # shutdown_asyncgens() then closes it and so the client and its connections
+    closer = _close_on_shutdown(client)
+    try:
+        closer.__anext__().send(None)
+    except StopIteration:
+        pass
+    _async_client_closers.setdefault(loop, []).append(closer)
+
 
 class OpenAIClient:
     """OpenAI Client class definition."""
 
     _client = None
-    _async_client = None
+    _rate_limiter = None
+    _embedding_rate_limiter = None
 
-    def __init__(self, configuration: OpenAIConfiguration | None = None) -> None:
+    def __init__(
+        self,
+        configuration: OpenAIConfiguration | None = None,
+        concurrent_coroutines: int = DEFAULT_CONCURRENT_COROUTINES,
+    ) -> None:
         self.configuration = configuration or OpenAIConfiguration()
+        self.concurrent_coroutines = concurrent_coroutines
         self._create_openai_client()
 
+    @property
+    def rate_limiter(self) -> RateLimiter:
+        """Process-wide limiter shared by every client of the chat deployment."""
+        if self._rate_limiter is None:
+            self._rate_limiter = get_rate_limiter(
+                (
+                    "chat",
+                    self.configuration.api_type,
+                    self.configuration.api_base,
+                    self.configuration.model,
+                ),
+                self.concurrent_coroutines,
+                self.configuration.requests_per_minute,
+                self.configuration.tokens_per_minute,
+            )
+        return self._rate_limiter
+
+    @property
+    def embedding_rate_limiter(self) -> RateLimiter:
+        """Process-wide limiter shared by every client of the embedding deployment."""
+        if self._embedding_rate_limiter is None:
+            self._embedding_rate_limiter = get_rate_limiter(
+                (
+                    "embedding",
+                    self.configuration.api_type,
+                    self.configuration.api_base,
+                    self.configuration.embedding_model,
+                ),
+                self.concurrent_coroutines,
+                self.configuration.embedding_requests_per_minute,
+                self.configuration.embedding_tokens_per_minute,
+            )
+        return self._embedding_rate_limiter
+
+    def _pool_key(self) -> tuple:
+        return (
+            self.configuration.api_type,
+            self.configuration.api_base,
+            self.configuration.api_version,
+            self.configuration.az_auth_type,
+            self.configuration.api_key,
+        )
+
     def _create_openai_client(self) -> None:
-        """Create a new OpenAI client instance."""
+        """Attach the pooled clients for this configuration, creating them if needed."""
+        if (
+            self.configuration.api_type == "Azure OpenAI"
+            and self.configuration.api_base is None
+        ):
+            raise ValueError(API_BASE_REQUIRED_FOR_AZURE)
+        key = self._pool_key()
+        with _client_pool_lock:
+            self._client = _sync_clients.get(key)
+            if self._client is None:
+                self._client = self._new_client(asynchronous=False)
+                _sync_clients[key] = self._client
+        # Created up front so the first async call does not pay for it
+        self._get_async_client()
+
+    def _get_async_client(self):
+        """Return the pooled async client for the running event loop.
+
+        httpx async connections belong to the loop that opened them, so each loop
+        gets its own client, closed when the loop shuts down its async generators
+        as `asyncio.run` does. A client created outside any loop is adopted by the
+        first loop that uses it.
+        """
+        key = self._pool_key()
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        with _client_pool_lock:
+            if loop is None:
+                clients = _unbound_async_clients
+            else:
+                clients = _async_clients.setdefault(loop, {})
+                if key not in clients and key in _unbound_async_clients:
+                    clients[key] = _unbound_async_clients.pop(key)
+                    _close_with_loop(loop, clients[key])
+            client = clients.get(key)
+            if client is None:
+                client = self._new_client(asynchronous=True)
+                clients[key] = client
+                if loop is not None:
+                    _close_with_loop(loop, client)
+            return client
+
+    @property
+    def _async_client(self):
+        return self._get_async_client()
+
+    def _token_provider(self):
+        """Bearer token provider shared by every client of the same configuration.
+
+        The provider refreshes its token shortly before expiry, so credential
+        discovery and token requests happen once rather than per client.
+        """
+        key = self._pool_key()
+        provider = _token_providers.get(key)
+        if provider is None:
+            provider = get_bearer_token_provider(
+                DefaultAzureCredential(),
+                "https://cognitiveservices.azure.com/.default",
+            )
+            _token_providers[key] = provider
+        return provider
+
+    def _new_client(self, asynchronous: bool):
+        limits = httpx.Limits(
+            max_connections=OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY,
+        )
+        http_client = (
+            DefaultAsyncHttpxClient(limits=limits)
+            if asynchronous
+            else DefaultHttpxClient(limits=limits)
+        )
         if self.configuration.api_type == "Azure OpenAI":
             api_base = self.configuration.api_base
-            if api_base is None:
-                raise ValueError(API_BASE_REQUIRED_FOR_AZURE)
             log.info(
                 "Creating Azure OpenAI client api_base=%s",
                 api_base,
             )
-
+            client_class = AsyncAzureOpenAI if asynchronous else AzureOpenAI
             if self.configuration.az_auth_type == "Managed Identity":
-                token_provider = get_bearer_token_provider(
-                    DefaultAzureCredential(),
-                    "https://cognitiveservices.azure.com/.default",
-                )
-
-                self._client = AzureOpenAI(
-                    api_version=self.configuration.api_version,
-                    # Azure-Specifics
-                    azure_ad_token_provider=token_provider,
-                    azure_endpoint=api_base,
-                )
-                self._async_client = AsyncAzureOpenAI(
+                return client_class(
                     api_version=self.configuration.api_version,
                     # Azure-Specifics
-                    azure_ad_token_provider=token_provider,
+                    azure_ad_token_provider=self._token_provider(),
                     azure_endpoint=api_base,
+                    http_client=http_client,
                 )
-            else:
-                self._client = AzureOpenAI(
-                    api_version=self.configuration.api_version,
-                    # Azure-Specifics
-                    azure_endpoint=api_base,
-                    api_key=self.configuration.api_key,
-                )
-                self._async_client = AsyncAzureOpenAI(
-                    api_version=self.configuration.api_version,
-                    # Azure-Specifics
-                    azure_endpoint=api_base,
-                    api_key=self.configuration.api_key,
-                )
-        else:
-            log.info("Creating OpenAI client")
-            self._client = OpenAI(
-                api_key=self.configuration.api_key,
-            )
-            self._async_client = AsyncOpenAI(
+            return client_class(
+                api_version=self.configuration.api_version,
+                # Azure-Specifics
+                azure_endpoint=api_base,
                 api_key=self.configuration.api_key,
+                http_client=http_client,
             )
+        log.info("Creating OpenAI client")
+        client_class = AsyncOpenAI if asynchronous else OpenAI
+        return client_class(
+            api_key=self.configuration.api_key,
+            http_client=http_client,
+        )
 
     def generate_chat(
         self,
@@ -93,36 +259,41 @@ class OpenAIClient:
                 kwargs.pop("temperature")
             else:
                 temperature = self.configuration.temperature
-            response = self._client.chat.completions.create(
-                model=self.configuration.model,
-                temperature=temperature,
-                max_tokens=max_tokens,
-                messages=messages,
-                stream=stream,
-                **kwargs,
-            )
-            if stream and callbacks is not None:
-                full_response = ""
-                for chunk in response:
-                    if len(chunk.choices) > 0:
-                        delta = chunk.choices[0].delta.content or ""  # type: ignore
-                        if delta is not None:
-                            full_response += delta
-                            if callbacks:
-                                show = full_response
-                                if len(delta) > 0:
-                                    show += "▌"
-                                for callback in callbacks:
-                                    callback.on_llm_new_token(show)
-                return full_response
+            with self.rate_limiter.limit_sync(
+                lambda: estimate_tokens(messages) + (max_tokens or 0)
+            ):
+                response = self._client.chat.completions.create(
+                    model=self.configuration.model,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    messages=messages,
+                    stream=stream,
+                    **kwargs,
+                )
+                if stream and callbacks is not None:
+                    full_response = ""
+                    for chunk in response:
+                        if len(chunk.choices) > 0:
+                            delta = chunk.choices[0].delta.content or ""  # type: ignore
+                            if delta is not None:
+                                full_response += delta
+                                if callbacks:
+                                    show = full_response
+                                    if len(delta) > 0:
+                                        show += "▌"
+                                    for callback in callbacks:
+                                        callback.on_llm_new_token(show)
+                    return full_response
 
-            return (
-                response.choices[0].message.content if len(response.choices) > 0 else ""
-            )  # type: ignore
+                return (
+                    response.choices[0].message.content
+                    if len(response.choices) > 0
+                    else ""
+                )  # type: ignore
         except Exception as e:
             print(f"Error validating report: {e}")
             msg = f"Problem in OpenAI response. {e}"
-            raise Exception(msg)
+            raise Exception(msg) from e
 
     async def generate_chat_async(
         self,
@@ -141,43 +312,60 @@ class OpenAIClient:
             kwargs.pop("temperature")
         else:
             temperature = self.configuration.temperature
-        response = await self._async_client.chat.completions.create(
-            model=self.configuration.model,
-            temperature=temperature,
-            max_tokens=max_tokens,
-            messages=messages,
-            stream=stream,
-            **kwargs,
-        )
-        if stream and callbacks is not None:
-            full_response = ""
-            async for chunk in response:
-                delta = chunk.choices[0].delta.content or ""  # type: ignore
-                if delta is not None:
-                    full_response += delta
-                    if callbacks:
-                        show = full_response
-                        if len(delta) > 0:
-                            show += "▌"
-                        for callback in callbacks:
-                            callback.on_llm_new_token(show)
-            return full_response
-        
-        return response.choices[0].message.content or ""  # type: ignore
+        async with self.rate_limiter.limit(
+            lambda: estimate_tokens(messages) + (max_tokens or 0)
+        ):
+            response = await self._async_client.chat.completions.create(
+                model=self.configuration.model,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                messages=messages,
+                stream=stream,
+                **kwargs,
+            )
+            if stream and callbacks is not None:
+                full_response = ""
+                async for chunk in response:
+                    delta = chunk.choices[0].delta.content or ""  # type: ignore
+                    if delta is not None:
+                        full_response += delta
+                        if callbacks:
+                            show = full_response
+                            if len(delta) > 0:
+                                show += "▌"
+                            for callback in callbacks:
+                                callback.on_llm_new_token(show)
+                return full_response
+
+            return response.choices[0].message.content or ""  # type: ignore
 
     def generate_embedding(
         self, text: str, model: str = DEFAULT_EMBEDDING_MODEL
     ) -> list[float]:
-        embedding = self._client.embeddings.create(input=text, model=model)
+        with self.embedding_rate_limiter.limit_sync(lambda: estimate_tokens(text)):
+            embedding = self._client.embeddings.create(input=text, model=model)
         return embedding.data[0].embedding
 
     def generate_embeddings(
         self, text: list[str], model: str = DEFAULT_EMBEDDING_MODEL
     ) -> list[float]:
-        return self._client.embeddings.create(input=text, model=model)
+        with self.embedding_rate_limiter.limit_sync(lambda: estimate_tokens(text)):
+            return self._client.embeddings.create(input=text, model=model)
 
     async def generate_embedding_async(
         self, text: list[str], model: str = DEFAULT_EMBEDDING_MODEL
     ) -> list[float]:
-        embedding = await self._async_client.embeddings.create(input=text, model=model)
-        return embedding.data[0].embedding
\ No newline at end of file
+        async with self.embedding_rate_limiter.limit(lambda: estimate_tokens(text)):
+            embedding = await self._async_client.embeddings.create(
+                input=text, model=model
+            )
+        return embedding.data[0].embedding
+
+    async def generate_embeddings_async(
+        self, texts: list[str], model: str = DEFAULT_EMBEDDING_MODEL
+    ) -> list[list[float]]:
+        async with self.embedding_rate_limiter.limit(lambda: estimate_tokens(texts)):
+            response = await self._async_client.embeddings.create(
+                input=texts, model=model
+            )
+        return [item.embedding for item in sorted(response.data, key=lambda x: x.index)]
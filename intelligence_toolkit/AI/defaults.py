@@ -8,6 +8,14 @@ DEFAULT_LLM_MODEL = "gpt-4.1-mini"
 DEFAULT_LLM_MAX_TOKENS = 4000
 DEFAULT_AZ_AUTH_TYPE = "Azure Key"
 EMBEDDING_BATCHES_NUMBER = 500
+# Inputs and tokens packed into a single embedding request
+EMBEDDING_BATCH_MAX_INPUTS = 2048
+EMBEDDING_BATCH_MAX_TOKENS = 100000
+LOCAL_EMBEDDING_BATCH_MAX_INPUTS = 256
+# 0 keeps every cached embedding
+DEFAULT_MAX_CACHED_EMBEDDINGS = 0
+# Cache hits whose access times are written back together
+DEFAULT_CACHE_ACCESS_FLUSH_SIZE = 10000
 #
 # Text Embedding Parameters
 DEFAULT_EMBEDDING_MODEL = "text-embedding-3-small"
@@ -25,3 +33,17 @@ CHUNK_OVERLAP = 0
 DEFAULT_REPORT_BATCH_SIZE = 100
 
 DEFAULT_CONCURRENT_COROUTINES = 50
+
+# Shared rate limiting per deployment; 0 leaves a budget unlimited
+DEFAULT_REQUESTS_PER_MINUTE = 0
+DEFAULT_TOKENS_PER_MINUTE = 0
+RATE_LIMITER_MIN_CONCURRENCY = 1
+RATE_LIMITER_POLL_SECONDS = 0.05
+# Concurrency stops growing while latency exceeds this multiple of its average
+RATE_LIMITER_LATENCY_FACTOR = 2.0
+
+# Connection pool shared by the pooled OpenAI clients; idle connections are kept
+# warm between bursts of requests instead of httpx's 5 second default
+OPENAI_MAX_CONNECTIONS = 200
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = 100
+OPENAI_KEEPALIVE_EXPIRY = 120
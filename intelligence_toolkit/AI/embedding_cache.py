@@ -0,0 +1,113 @@
+# Copyright (c) 2024 Microsoft Corporation. All rights reserved.
+# Licensed under the MIT license. See LICENSE file in the project.
+#
+import logging
+import time
+from typing import Any
+
+import numpy as np
+import pyarrow as pa
+
+from intelligence_toolkit.AI.defaults import (
+    DEFAULT_CACHE_ACCESS_FLUSH_SIZE,
+    DEFAULT_MAX_CACHED_EMBEDDINGS,
+)
+from intelligence_toolkit.AI.vector_store import VectorStore
+from intelligence_toolkit.helpers.constants import CACHE_PATH
+
+logger = logging.getLogger(__name__)
+
+schema = pa.schema(
+    [
+        pa.field("hash", pa.string()),
+        pa.field("model", pa.string()),
+        pa.field("text", pa.string()),
+        pa.field("vector", pa.list_(pa.float32())),
+        pa.field("additional_details", pa.string()),
+        pa.field("accessed_at", pa.int64()),
+    ]
+)
+
+
+class EmbeddingCache:
+    """Content-addressed embedding cache keyed on (model, text hash).
+
+    Entries are evicted least-recently-used first once the table holds more than
+    `max_size` rows; a `max_size` of 0 keeps everything.
+
+    Each table update writes a new Lance version, so reads only note their hits.
+    Access times are written in one update before each eviction, or once
+    `access_flush_size` hits are pending; hits noted after the last write are
+    lost when the process exits.
+    """
+
+    def __init__(
+        self,
+        db_name: str = "embeddings",
+        db_path=CACHE_PATH,
+        max_size: int = DEFAULT_MAX_CACHED_EMBEDDINGS,
+        access_flush_size: int = DEFAULT_CACHE_ACCESS_FLUSH_SIZE,
+    ) -> None:
+        self.vector_store = VectorStore(db_name, db_path, schema)
+        self.max_size = max_size
+        self.access_flush_size = access_flush_size
+        self.pending_accesses: dict[str, set[str]] = {}
+
+    def get_many(self, hashes: list[str], model: str) -> dict[str, np.ndarray]:
+        """Return the cached vectors for `hashes`, marking them as recently used."""
+        unique_hashes = list(dict.fromkeys(hashes))
+        found = self.vector_store.search_by_keys(
+            unique_hashes, "hash", {"model": model}, ["hash", "vector"]
+        )
+        if found.num_rows == 0:
+            return {}
+
+        vectors = found.column("vector").combine_chunks()
+        matrix = vectors.flatten().to_numpy().reshape(len(vectors), -1)
+        found_hashes = found.column("hash").to_pylist()
+        self.pending_accesses.setdefault(model, set()).update(found_hashes)
+        pending = sum(len(hashes) for hashes in self.pending_accesses.values())
+        if pending >= self.access_flush_size:
+            self.flush_accesses()
+        return dict(zip(found_hashes, matrix, strict=True))
+
+    def flush_accesses(self) -> None:
+        """Write the access times of the hits noted since the last flush."""
+        now = time.time_ns()
+        for model, hashes in self.pending_accesses.items():
+            self.vector_store.update_by_keys(
+                list(hashes), "hash", {"accessed_at": now}, {"model": model}
+            )
+        self.pending_accesses = {}
+
+    def put_many(self, items: list[dict[str, Any]], model: str) -> None:
+        """Store new embeddings in a single write and apply the size bound."""
+        if len(items) == 0:
+            return
+        if self.max_size > 0:
+            # Earlier hits are stamped before these rows, as they happened first
+            self.flush_accesses()
+        now = time.time_ns()
+        table = pa.table(
+            {
+                "hash": [item["hash"] for item in items],
+                "model": [model] * len(items),
+                "text": [item["text"] for item in items],
+                "vector": [
+                    np.asarray(item["vector"], dtype=np.float32) for item in items
+                ],
+                "additional_details": [
+                    item.get("additional_details", "{}") for item in items
+                ],
+                # Distinct stamps so eviction never splits a tie inside a batch
+                "accessed_at": [now + i for i in range(len(items))],
+            },
+            schema=schema,
+        )
+        self.vector_store.save(table)
+        if self.max_size > 0:
+            evicted = self.vector_store.evict_oldest(
+                self.max_size, ["accessed_at", "model", "hash"]
+            )
+            if evicted > 0:
+                logger.info("Evicted %s cached embeddings", evicted)
@@ -5,6 +5,7 @@
 import asyncio
 from typing import Any
 
+import numpy as np
 from sentence_transformers import SentenceTransformer
 
 from intelligence_toolkit.AI.base_embedder import BaseEmbedder
@@ -12,6 +13,8 @@ from intelligence_toolkit.AI.defaults import (
     DEFAULT_CONCURRENT_COROUTINES,
     DEFAULT_LLM_MAX_TOKENS,
     DEFAULT_LOCAL_EMBEDDING_MODEL,
+    DEFAULT_MAX_CACHED_EMBEDDINGS,
+    LOCAL_EMBEDDING_BATCH_MAX_INPUTS,
 )
 from intelligence_toolkit.helpers.constants import CACHE_PATH
 
@@ -25,11 +28,21 @@ class LocalEmbedder(BaseEmbedder):
         max_tokens=DEFAULT_LLM_MAX_TOKENS,
         concurrent_coroutines: int | None = DEFAULT_CONCURRENT_COROUTINES + 100,
         model: str | None = DEFAULT_LOCAL_EMBEDDING_MODEL,
+        max_cached_embeddings: int = DEFAULT_MAX_CACHED_EMBEDDINGS,
     ):
-        super().__init__(db_name, db_path, max_tokens, concurrent_coroutines, False)
         # Use default model if None is passed
         if model is None:
             model = DEFAULT_LOCAL_EMBEDDING_MODEL
+        super().__init__(
+            db_name,
+            db_path,
+            max_tokens,
+            concurrent_coroutines,
+            False,
+            model=model,
+            max_cached_embeddings=max_cached_embeddings,
+        )
+        self.max_batch_inputs = LOCAL_EMBEDDING_BATCH_MAX_INPUTS
         try:
             self.local_client = SentenceTransformer(model)
         except Exception as e:
@@ -41,4 +54,11 @@ class LocalEmbedder(BaseEmbedder):
     async def _generate_embedding_async(self, text: str) -> list | Any:
         await asyncio.sleep(0)
 
-        return self._generate_embedding(text)
\ No newline at end of file
+        return self._generate_embedding(text)
+
+    def _generate_embeddings(self, texts: list[str]) -> np.ndarray:
+        return np.asarray(self.local_client.encode(texts), dtype=np.float32)
+
+    async def _generate_embeddings_async(self, texts: list[str]) -> np.ndarray:
+        # Encode off the event loop so other batches and callbacks keep running
+        return await asyncio.to_thread(self._generate_embeddings, texts)
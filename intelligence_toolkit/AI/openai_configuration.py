@@ -10,7 +10,9 @@ from .defaults import (
     DEFAULT_LLM_MAX_TOKENS,
     DEFAULT_LLM_MODEL,
     DEFAULT_OPENAI_VERSION,
+    DEFAULT_REQUESTS_PER_MINUTE,
     DEFAULT_TEMPERATURE,
+    DEFAULT_TOKENS_PER_MINUTE,
 )
 
 
@@ -37,6 +39,11 @@ class OpenAIConfiguration:
     _az_auth_type: str
     _embedding_model: str
 
+    _requests_per_minute: int
+    _tokens_per_minute: int
+    _embedding_requests_per_minute: int
+    _embedding_tokens_per_minute: int
+
     def __init__(
         self,
         config: dict | None = None,
@@ -59,6 +66,20 @@ class OpenAIConfiguration:
         self._embedding_model = config.get(
             "embedding_model", self._get_embedding_model()
         )
+        self._requests_per_minute = config.get(
+            "requests_per_minute", self._get_budget("OPENAI_REQUESTS_PER_MINUTE")
+        )
+        self._tokens_per_minute = config.get(
+            "tokens_per_minute", self._get_budget("OPENAI_TOKENS_PER_MINUTE")
+        )
+        self._embedding_requests_per_minute = config.get(
+            "embedding_requests_per_minute",
+            self._get_budget("OPENAI_EMBEDDING_REQUESTS_PER_MINUTE"),
+        )
+        self._embedding_tokens_per_minute = config.get(
+            "embedding_tokens_per_minute",
+            self._get_budget("OPENAI_EMBEDDING_TOKENS_PER_MINUTE"),
+        )
 
     def _get_openai_type(self):
         return os.environ.get("OPENAI_TYPE", "OpenAI")
@@ -86,6 +107,14 @@ class OpenAIConfiguration:
     def _get_api_key(self):
         return os.environ.get("OPENAI_API_KEY", "")
 
+    def _get_budget(self, variable: str) -> int:
+        default = (
+            DEFAULT_TOKENS_PER_MINUTE
+            if variable.endswith("TOKENS_PER_MINUTE")
+            else DEFAULT_REQUESTS_PER_MINUTE
+        )
+        return int(os.environ.get(variable, default))
+
     @property
     def api_key(self) -> str:
         """API key property definition."""
@@ -131,3 +160,23 @@ class OpenAIConfiguration:
     def az_auth_type(self) -> str:
         """Type of the Azure OpenAI connection."""
         return self._az_auth_type
+
+    @property
+    def requests_per_minute(self) -> int:
+        """Chat deployment request budget, 0 when unlimited."""
+        return self._requests_per_minute
+
+    @property
+    def tokens_per_minute(self) -> int:
+        """Chat deployment token budget, 0 when unlimited."""
+        return self._tokens_per_minute
+
+    @property
+    def embedding_requests_per_minute(self) -> int:
+        """Embedding deployment request budget, 0 when unlimited."""
+        return self._embedding_requests_per_minute
+
+    @property
+    def embedding_tokens_per_minute(self) -> int:
+        """Embedding deployment token budget, 0 when unlimited."""
+        return self._embedding_tokens_per_minute
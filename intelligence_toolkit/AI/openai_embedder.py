@@ -2,10 +2,16 @@
 # Licensed under the MIT license. See LICENSE file in the project.
 #
 
+import numpy as np
+
 from intelligence_toolkit.AI.base_embedder import BaseEmbedder
 from intelligence_toolkit.AI.client import OpenAIClient
-from intelligence_toolkit.AI.defaults import DEFAULT_CONCURRENT_COROUTINES
+from intelligence_toolkit.AI.defaults import (
+    DEFAULT_CONCURRENT_COROUTINES,
+    DEFAULT_MAX_CACHED_EMBEDDINGS,
+)
 from intelligence_toolkit.AI.openai_configuration import OpenAIConfiguration
+from intelligence_toolkit.AI.rate_limiter import RateLimiter
 from intelligence_toolkit.helpers.constants import CACHE_PATH
 
 
@@ -16,12 +22,22 @@ class OpenAIEmbedder(BaseEmbedder):
         db_name: str = "embeddings",
         db_path=CACHE_PATH,
         concurrent_coroutines: int | None = DEFAULT_CONCURRENT_COROUTINES,
+        max_cached_embeddings: int = DEFAULT_MAX_CACHED_EMBEDDINGS,
     ):
+        self.configuration = configuration
+        self.openai_client = OpenAIClient(configuration, concurrent_coroutines)
         super().__init__(
-            db_name, db_path, configuration.max_tokens, concurrent_coroutines
+            db_name,
+            db_path,
+            configuration.max_tokens,
+            concurrent_coroutines,
+            model=configuration.embedding_model,
+            max_cached_embeddings=max_cached_embeddings,
         )
-        self.configuration = configuration
-        self.openai_client = OpenAIClient(configuration)
+
+    def _create_rate_limiter(self, concurrent_coroutines: int) -> RateLimiter:
+        # Share the deployment's budget with every other client of the same model
+        return self.openai_client.embedding_rate_limiter
 
     def _generate_embedding(self, text: str) -> list[float]:
         return self.openai_client.generate_embedding(
@@ -31,4 +47,10 @@ class OpenAIEmbedder(BaseEmbedder):
     async def _generate_embedding_async(self, text: str) -> list[float]:
         return await self.openai_client.generate_embedding_async(
             text, model=self.configuration.embedding_model
-        )
\ No newline at end of file
+        )
+
+    async def _generate_embeddings_async(self, texts: list[str]) -> np.ndarray:
+        embeddings = await self.openai_client.generate_embeddings_async(
+            texts, model=self.configuration.embedding_model
+        )
+        return np.asarray(embeddings, dtype=np.float32)
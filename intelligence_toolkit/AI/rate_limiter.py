@@ -0,0 +1,246 @@
+# Copyright (c) 2024 Microsoft Corporation. All rights reserved.
+# Licensed under the MIT license. See LICENSE file in the project.
+#
+import asyncio
+import logging
+import threading
+import time
+from collections.abc import AsyncIterator, Callable, Iterator
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any
+
+from intelligence_toolkit.AI.defaults import (
+    RATE_LIMITER_LATENCY_FACTOR,
+    RATE_LIMITER_MIN_CONCURRENCY,
+    RATE_LIMITER_POLL_SECONDS,
+)
+from intelligence_toolkit.helpers.decorators import get_retry_after
+
+logger = logging.getLogger(__name__)
+
+
+def is_rate_limit_error(exception: BaseException) -> bool:
+    """Whether any error in the chain is an HTTP 429 or carries a retry hint."""
+    current = exception
+    while current is not None:
+        if getattr(current, "status_code", None) == 429:
+            return True
+        current = current.__cause__ or current.__context__
+    return get_retry_after(exception) is not None
+
+
+class TokenBucket:
+    """Refills `per_minute` units evenly over each minute, starting full."""
+
+    def __init__(self, per_minute: int) -> None:
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60
+        self.available = float(per_minute)
+        self.updated_at = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.available = min(
+            self.capacity, self.available + (now - self.updated_at) * self.rate
+        )
+        self.updated_at = now
+
+    def wait_time(self, amount: float) -> float:
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.available >= amount:
+            return 0
+        return (amount - self.available) / self.rate
+
+    def consume(self, amount: float) -> None:
+        self.available -= min(amount, self.capacity)
+
+
+class RateLimiter:
+    """Shared request scheduler for one model deployment.
+
+    Enforces optional requests-per-minute and tokens-per-minute budgets and
+    limits requests in flight. The concurrency limit adapts AIMD-style: it is
+    halved whenever a request is throttled and grows by one slot per window of
+    successful requests while latency stays near its running average.
+
+    State is guarded by a thread lock rather than asyncio primitives so one
+    limiter can be shared by every event loop and thread in the process.
+    Nested acquisitions from the same task or thread pass straight through;
+    `tokens` may be given as a callable, which is only evaluated when a token
+    budget is set and the slot is not already held.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        requests_per_minute: int = 0,
+        tokens_per_minute: int = 0,
+    ) -> None:
+        self._lock = threading.Lock()
+        self._holders: set[Any] = set()
+        self.max_concurrency = max_concurrency
+        self.concurrency_limit = float(max_concurrency)
+        self.in_flight = 0
+        self.throttled_requests = 0
+        self.latency_average: float | None = None
+        self.request_bucket = None
+        self.token_bucket = None
+        self.configure(max_concurrency, requests_per_minute, tokens_per_minute)
+
+    def configure(
+        self,
+        max_concurrency: int,
+        requests_per_minute: int = 0,
+        tokens_per_minute: int = 0,
+    ) -> None:
+        with self._lock:
+            if max_concurrency > self.max_concurrency:
+                self.concurrency_limit += max_concurrency - self.max_concurrency
+                self.max_concurrency = max_concurrency
+            # Only a changed budget replaces a bucket, so new clients cannot refill it
+            if requests_per_minute and (
+                self.request_bucket is None
+                or self.request_bucket.capacity != requests_per_minute
+            ):
+                self.request_bucket = TokenBucket(requests_per_minute)
+            if tokens_per_minute and (
+                self.token_bucket is None
+                or self.token_bucket.capacity != tokens_per_minute
+            ):
+                self.token_bucket = TokenBucket(tokens_per_minute)
+
+    def _try_acquire(self, tokens: int) -> float:
+        """Take a slot and return 0, or return how long to wait before trying again."""
+        with self._lock:
+            if self.in_flight >= max(
+                RATE_LIMITER_MIN_CONCURRENCY, int(self.concurrency_limit)
+            ):
+                return RATE_LIMITER_POLL_SECONDS
+            waits = [0.0]
+            if self.request_bucket is not None:
+                waits.append(self.request_bucket.wait_time(1))
+            if self.token_bucket is not None:
+                waits.append(self.token_bucket.wait_time(tokens))
+            wait = max(waits)
+            if wait > 0:
+                return wait
+            if self.request_bucket is not None:
+                self.request_bucket.consume(1)
+            if self.token_bucket is not None:
+                self.token_bucket.consume(tokens)
+            self.in_flight += 1
+            return 0
+
+    def _release(self, latency: float, throttled: bool) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            if throttled:
+                self.throttled_requests += 1
+                self.concurrency_limit = max(
+                    RATE_LIMITER_MIN_CONCURRENCY, self.concurrency_limit / 2
+                )
+                logger.info(
+                    "Throttled, concurrency limit now %s", int(self.concurrency_limit)
+                )
+                return
+            slow = (
+                self.latency_average is not None
+                and latency > RATE_LIMITER_LATENCY_FACTOR * self.latency_average
+            )
+            if not slow:
+                self.concurrency_limit = min(
+                    self.max_concurrency,
+                    self.concurrency_limit + 1 / self.concurrency_limit,
+                )
+            self.latency_average = (
+                latency
+                if self.latency_average is None
+                else 0.9 * self.latency_average + 0.1 * latency
+            )
+
+    @asynccontextmanager
+    async def limit(
+        self, tokens: int | Callable[[], int] = 0
+    ) -> AsyncIterator[None]:
+        holder = asyncio.current_task()
+        if holder in self._holders:
+            yield
+            return
+        if callable(tokens):
+            tokens = tokens() if self.token_bucket is not None else 0
+        while (wait := self._try_acquire(tokens)) > 0:
+            await asyncio.sleep(wait)
+        self._holders.add(holder)
+        start = time.monotonic()
+        throttled = False
+        try:
+            yield
+        except Exception as e:
+            throttled = is_rate_limit_error(e)
+            raise
+        finally:
+            self._holders.discard(holder)
+            self._release(time.monotonic() - start, throttled)
+
+    @contextmanager
+    def limit_sync(self, tokens: int | Callable[[], int] = 0) -> Iterator[None]:
+        holder = threading.get_ident()
+        if holder in self._holders:
+            yield
+            return
+        if callable(tokens):
+            tokens = tokens() if self.token_bucket is not None else 0
+        while (wait := self._try_acquire(tokens)) > 0:
+            time.sleep(wait)
+        self._holders.add(holder)
+        start = time.monotonic()
+        throttled = False
+        try:
+            yield
+        except Exception as e:
+            throttled = is_rate_limit_error(e)
+            raise
+        finally:
+            self._holders.discard(holder)
+            self._release(time.monotonic() - start, throttled)
+
+
+_rate_limiters: dict[tuple, RateLimiter] = {}
+_rate_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(
+    key: tuple,
+    max_concurrency: int,
+    requests_per_minute: int = 0,
+    tokens_per_minute: int = 0,
+) -> RateLimiter:
+    """Return the process-wide limiter for a deployment, creating it if needed.
+
+    Callers sharing a key share one budget; the concurrency ceiling is the largest
+    requested for that key.
+    """
+    with _rate_limiters_lock:
+        limiter = _rate_limiters.get(key)
+        if limiter is None:
+            limiter = RateLimiter(max_concurrency, requests_per_minute, tokens_per_minute)
+            _rate_limiters[key] = limiter
+            return limiter
+    limiter.configure(max_concurrency, requests_per_minute, tokens_per_minute)
+    return limiter
+
+
+def reset_rate_limiters() -> None:
+    with _rate_limiters_lock:
+        _rate_limiters.clear()
+
+
+def estimate_tokens(text: Any) -> int:
+    # Imported here because AI.utils imports BaseChat, which uses this module
+    from intelligence_toolkit.AI.utils import get_token_count
+
+    try:
+        return get_token_count(text)
+    except Exception:
+        return len(str(text)) // 4 + 1
@@ -13,8 +13,38 @@ from intelligence_toolkit.helpers.constants import CACHE_PATH
 table_missing_msg = "Table not initialized"
 
 
+def _sql_literal(value: Any) -> str:
+    if isinstance(value, str):
+        escaped = value.replace("'", "''")
+        return f"'{escaped}'"
+    return str(value)
+
+
+def _where_clause(filters: dict[str, Any] | None) -> str:
+    if not filters:
+        return "TRUE"
+    return " AND ".join(
+        f"{column} = {_sql_literal(value)}" for column, value in filters.items()
+    )
+
+
+def _before_clause(columns: list[str], values: tuple) -> str:
+    """Rows that sort strictly before `values` when ordered by `columns`."""
+    clauses = []
+    for ix, column in enumerate(columns):
+        equal = [
+            f"{previous} = {_sql_literal(value)}"
+            for previous, value in zip(columns[:ix], values[:ix], strict=True)
+        ]
+        clauses.append(
+            " AND ".join([*equal, f"{column} < {_sql_literal(values[ix])}"])
+        )
+    return " OR ".join(f"({clause})" for clause in clauses)
+
+
 class VectorStore:
     table = None
+    table_name = None
     duckdb_data = None
 
     def __init__(
@@ -25,12 +55,19 @@ class VectorStore:
     ):
         self.db_connection = lancedb.connect(path)
         if table_name is not None:
-            self.table = self.db_connection.create_table(
-                table_name, schema=schema, exist_ok=True
-            )
+            self.table_name = table_name
+            try:
+                self.table = self.db_connection.create_table(
+                    table_name, schema=schema, exist_ok=True
+                )
+            except ValueError:
+                # The store only holds cached data, so a table written with an
+                # older schema is discarded rather than migrated.
+                self.db_connection.drop_table(table_name)
+                self.table = self.db_connection.create_table(table_name, schema=schema)
             self.duckdb_data = self.table.to_lance()
 
-    def save(self, items: list[Any]) -> None:
+    def save(self, items: list[Any] | pa.Table) -> None:
         if self.table is None:
             raise ValueError(table_missing_msg)
         self.table.add(items)
@@ -44,11 +81,149 @@ class VectorStore:
         query = f"SELECT DISTINCT * FROM arrow_data WHERE {column} IN {tuple(texts)}"
         return duckdb.execute(query).df()
 
-    def search_by_vector(self, vector: list[float], k: int = 10) -> list[dict]:
+    def search_by_keys(
+        self,
+        keys: list[str],
+        column: str,
+        filters: dict[str, Any] | None = None,
+        columns: list[str] | None = None,
+    ) -> pa.Table:
+        """Return the rows whose `column` is one of `keys` as a single semi-join."""
+        if self.table is None:
+            raise ValueError(table_missing_msg)
+        if len(keys) == 0:
+            empty = self.table.schema.empty_table()
+            return empty.select(columns) if columns else empty
+        arrow_data = self.table.to_lance()
+        arrow_keys = pa.table({column: pa.array(keys, pa.string())})
+        selected = ", ".join(f"d.{c}" for c in columns) if columns else "d.*"
+        query = (
+            f"SELECT {selected} FROM arrow_data d "
+            f"SEMI JOIN arrow_keys k ON d.{column} = k.{column} "
+            f"WHERE {_where_clause(filters)}"
+        )
+        return duckdb.execute(query).arrow()
+
+    def update_by_keys(
+        self,
+        keys: list[str],
+        column: str,
+        values: dict[str, Any],
+        filters: dict[str, Any] | None = None,
+    ) -> None:
+        """Set `values` on the rows whose `column` is one of `keys`, in one write.
+
+        The rows are selected with the same semi-join as `search_by_keys` and
+        merged back on `column` and the filter columns, so the key list never
+        becomes part of a SQL predicate.
+        """
+        if self.table is None:
+            raise ValueError(table_missing_msg)
+        if len(keys) == 0:
+            return
+        on = [column, *(filters or {})]
+        arrow_data = self.table.to_lance()
+        arrow_keys = pa.table({column: pa.array(keys, pa.string())})
+        selected = ", ".join(
+            f"{_sql_literal(values[name])} AS {name}"
+            if name in values
+            else f"d.{name}"
+            for name in self.table.schema.names
+        )
+        # One source row per key, as each source row is written once per match
+        query = (
+            f"SELECT DISTINCT ON ({', '.join(f'd.{c}' for c in on)}) {selected} "
+            f"FROM arrow_data d SEMI JOIN arrow_keys k ON d.{column} = k.{column} "
+            f"WHERE {_where_clause(filters)}"
+        )
+        rows = duckdb.execute(query).arrow().cast(self.table.schema)
+        if rows.num_rows == 0:
+            return
+        arrow_data.merge_insert(on).when_matched_update_all().execute(rows)
+
+    def evict_oldest(self, max_rows: int, order_columns: list[str]) -> int:
+        """Delete the rows beyond `max_rows`, lowest first by `order_columns`.
+
+        Later columns break ties in earlier ones, so rows sharing a timestamp are
+        split rather than all kept; only rows equal on every column are kept
+        together.
+        """
         if self.table is None:
             raise ValueError(table_missing_msg)
+        total = self.table.count_rows()
+        if max_rows <= 0 or total <= max_rows:
+            return 0
+        arrow_data = self.table.to_lance()
+        order = ", ".join(f"{c} DESC" for c in order_columns)
+        cutoff = duckdb.execute(
+            f"SELECT {', '.join(order_columns)} FROM arrow_data "
+            f"ORDER BY {order} LIMIT 1 OFFSET {max_rows - 1}"
+        ).fetchone()
+        self.table.delete(_before_clause(order_columns, cutoff))
+        return total - self.table.count_rows()
 
-        return self.table.search(vector).limit(k).to_list()
+    def search_by_vector(
+        self,
+        vector: list[float],
+        k: int = 10,
+        column: str | None = None,
+        metric: str | None = None,
+        nprobes: int | None = None,
+        refine_factor: int | None = None,
+        columns: list[str] | None = None,
+    ) -> list[dict]:
+        """Return the `k` nearest rows, using the column's ANN index when it has one.
+
+        `nprobes` and `refine_factor` trade speed for recall on indexed columns.
+        """
+        if self.table is None:
+            raise ValueError(table_missing_msg)
+
+        query = self.table.search(vector, vector_column_name=column)
+        if metric is not None:
+            query = query.metric(metric)
+        if nprobes is not None:
+            query = query.nprobes(nprobes)
+        if refine_factor is not None:
+            query = query.refine_factor(refine_factor)
+        if columns is not None:
+            query = query.select(columns)
+        return query.limit(k).to_list()
+
+    def create_vector_index(
+        self,
+        column: str = "vector",
+        metric: str = "cosine",
+        num_partitions: int = 256,
+        num_sub_vectors: int = 96,
+    ) -> None:
+        """Build (or rebuild) an IVF-PQ index on a fixed-size vector column."""
+        if self.table is None:
+            raise ValueError(table_missing_msg)
+        self.table.create_index(
+            metric=metric,
+            num_partitions=num_partitions,
+            num_sub_vectors=num_sub_vectors,
+            vector_column_name=column,
+            replace=True,
+        )
+
+    def has_vector_index(self, column: str = "vector") -> bool:
+        if self.table is None:
+            raise ValueError(table_missing_msg)
+        return any(
+            column in index["fields"] for index in self.table.to_lance().list_indices()
+        )
+
+    def count_unindexed_rows(self, column: str = "vector") -> int:
+        """Rows added since the vector index on `column` was built, or every row without one."""
+        if self.table is None:
+            raise ValueError(table_missing_msg)
+        dataset = self.table.to_lance()
+        for index in dataset.list_indices():
+            if column in index["fields"]:
+                return dataset.stats.index_stats(index["name"])["num_unindexed_rows"]
+        return self.table.count_rows()
 
     def update_duckdb_data(self) -> None:
         if self.table is None:
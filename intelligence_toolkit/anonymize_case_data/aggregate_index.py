@@ -0,0 +1,75 @@
+# Copyright (c) 2024 Microsoft Corporation. All rights reserved.
+# Licensed under the MIT license. See LICENSE file in the project.
+
+from collections import defaultdict
+from functools import reduce
+
+import numpy as np
+import pandas as pd
+
+
+class AggregateIndex:
+    def __init__(
+        self, adf: pd.DataFrame, att_separator: str = ";", val_separator: str = ":"
+    ) -> None:
+        """
+        Lookup structure over the reported aggregates, parsed once per dataset.
+        Each combination is keyed by its sorted attribute values, and every
+        attribute and attribute value keeps a postings list of the combinations
+        that contain it, so queries become hash lookups and list intersections
+        instead of scans of the selections column.
+
+        Where a combination is reported more than once, lookups return the
+        first count, the same as filtering the data frame.
+
+        Args:
+            adf (pd.DataFrame): The selections and protected_count of each aggregate
+            att_separator (str): The separator between attribute values in a selection
+            val_separator (str): The separator between an attribute and its value
+        """
+        self.adf = adf
+        self.att_separator = att_separator
+        self.val_separator = val_separator
+        self.selections: list[list[str]] = []
+        self.counts: list = []
+        self.key_counts: dict[tuple[str, ...], int] = {}
+        attribute_postings = defaultdict(list)
+        value_postings = defaultdict(list)
+        if len(adf) > 0:
+            rows = zip(
+                adf["selections"].tolist(), adf["protected_count"], strict=True
+            )
+        else:
+            rows = []
+        for i, (selection, count) in enumerate(rows):
+            selections = selection.split(att_separator)
+            self.selections.append(selections)
+            self.counts.append(count)
+            self.key_counts.setdefault(tuple(sorted(selections)), count)
+            for item in set(selections):
+                value_postings[item].append(i)
+            for att in {item.split(val_separator)[0] for item in selections}:
+                attribute_postings[att].append(i)
+        self.attribute_postings = {
+            att: np.array(ids, dtype=np.int64)
+            for att, ids in attribute_postings.items()
+        }
+        self.value_postings = {
+            item: np.array(ids, dtype=np.int64) for item, ids in value_postings.items()
+        }
+
+    def count(self, selections: list[str]) -> int:
+        """Protected count of the combination, or 0 if it was not reported."""
+        return self.key_counts.get(tuple(sorted(selections)), 0)
+
+    def containing(self, attributes, values) -> np.ndarray:
+        """Combinations holding every attribute and every attribute value, in order."""
+        empty = np.zeros(0, dtype=np.int64)
+        postings = [self.attribute_postings.get(att, empty) for att in attributes]
+        postings += [self.value_postings.get(item, empty) for item in values]
+        if len(postings) == 0:
+            return np.arange(len(self.selections), dtype=np.int64)
+        return reduce(
+            lambda x, y: np.intersect1d(x, y, assume_unique=True),
+            sorted(postings, key=len),
+        )
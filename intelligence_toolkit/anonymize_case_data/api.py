@@ -2,8 +2,11 @@
 # Licensed under the MIT license. See LICENSE file in the project.
 
 import math
+import multiprocessing
 import pandas as pd
 import plotly.graph_objects as go
+import polars as pl
+from concurrent.futures import ProcessPoolExecutor
 from enum import Enum
 from pacsynth import (
     AccuracyMode,
@@ -16,12 +19,39 @@ from pacsynth import (
 import app.util.df_functions as df_functions
 import intelligence_toolkit.anonymize_case_data.queries as queries
 import intelligence_toolkit.anonymize_case_data.visuals as visuals
-from intelligence_toolkit.anonymize_case_data.error_report import ErrorReport
+from intelligence_toolkit.anonymize_case_data.aggregate_index import AggregateIndex
+from intelligence_toolkit.anonymize_case_data.error_report import (
+    ErrorReport,
+    aggregate_frame,
+)
 from intelligence_toolkit.anonymize_case_data.synthesizability_statistics import (
     SynthesizabilityStatistics,
 )
+from intelligence_toolkit.anonymize_case_data.synthetic_index import SyntheticIndex
 from intelligence_toolkit.helpers.classes import IntelligenceWorkflow
 
+ACCURACY_MODES = [
+    "balanced",
+    "prioritize_long_combinations",
+    "prioritize_short_combinations",
+]
+
+SWEEP_COLUMNS = [
+    "Epsilon",
+    "Fabrication Strategy",
+    "Protected Records",
+    "Delta",
+    "Aggregate Error",
+    "Aggregate Suppressed %",
+    "Aggregate Fabricated %",
+    "Synthetic Error",
+    "Synthetic Suppressed %",
+    "Synthetic Fabricated %",
+]
+# Each sweep worker holds its own copy of the sensitive data and aggregates, and
+# pacsynth already fits on every core, so few workers are run by default
+DEFAULT_SWEEP_WORKERS = 2
+
 
 
 class AnonymizeCaseData(IntelligenceWorkflow):
@@ -38,6 +68,8 @@ class AnonymizeCaseData(IntelligenceWorkflow):
         self.aggregate_df = pd.DataFrame()
         self.synthetic_aggregate_df = pd.DataFrame()
         self.synthetic_df = pd.DataFrame()
+        self.synthetic_index = None
+        self.aggregate_index = None
         self.aggregate_error_report = pd.DataFrame()
         self.synthetic_error_report = pd.DataFrame()
 
@@ -117,20 +149,18 @@ class AnonymizeCaseData(IntelligenceWorkflow):
 
         sensitive_dataset = Dataset.from_data_frame(self.sensitive_df)
 
-        params = (
-            DpAggregateSeededParametersBuilder()
-            .reporting_length(reporting_length)
-            .epsilon(epsilon)
-            .percentile_percentage(percentile_percentage)
-            .percentile_epsilon_proportion(percentile_epsilon_proportion)
-            .accuracy_mode(accuracy_mode)
-            .number_of_records_epsilon_proportion(number_of_records_epsilon_proportion)
-            .fabrication_mode(fabrication_mode.value)
-            .empty_value(empty_value)
-            .weight_selection_percentile(weight_selection_percentile)
-            .use_synthetic_counts(use_synthetic_counts)
-            .aggregate_counts_scale_factor(aggregate_counts_scale_factor)
-            .build()
+        params = _synthesizer_parameters(
+            epsilon=epsilon,
+            reporting_length=reporting_length,
+            percentile_percentage=percentile_percentage,
+            percentile_epsilon_proportion=percentile_epsilon_proportion,
+            number_of_records_epsilon_proportion=number_of_records_epsilon_proportion,
+            weight_selection_percentile=weight_selection_percentile,
+            accuracy_mode=accuracy_mode,
+            fabrication_mode=fabrication_mode,
+            empty_value=empty_value,
+            use_synthetic_counts=use_synthetic_counts,
+            aggregate_counts_scale_factor=aggregate_counts_scale_factor,
         )
 
         synth = DpAggregateSeededSynthesizer(params)
@@ -144,6 +174,7 @@ class AnonymizeCaseData(IntelligenceWorkflow):
         synthetic_raw_data = synth.sample()
         synthetic_dataset = Dataset(synthetic_raw_data)
         self.synthetic_df = Dataset.raw_data_to_data_frame(synthetic_raw_data)
+        self.synthetic_index = SyntheticIndex(self.synthetic_df)
 
         sensitive_aggregates = sensitive_dataset.get_aggregates(reporting_length, ";")
 
@@ -153,17 +184,8 @@ class AnonymizeCaseData(IntelligenceWorkflow):
         # generate aggregates from the synthetic data
         synthetic_aggregates = synthetic_dataset.get_aggregates(reporting_length, ";")
 
-        sensitive_aggregates_parsed = {
-            tuple(agg.split(";")): count
-            for (agg, count) in sensitive_aggregates.items()
-        }
-        dp_aggregates_parsed = {
-            tuple(agg.split(";")): count for (agg, count) in dp_aggregates.items()
-        }
-        synthetic_aggregates_parsed = {
-            tuple(agg.split(";")): count
-            for (agg, count) in synthetic_aggregates.items()
-        }
+        # shared by both error reports
+        sensitive_aggregates_frame = aggregate_frame(sensitive_aggregates)
 
         self.aggregate_df = pd.DataFrame(
             data=dp_aggregates.items(),
@@ -177,6 +199,8 @@ class AnonymizeCaseData(IntelligenceWorkflow):
             by=["protected_count"], ascending=False
         )
 
+        self.aggregate_index = AggregateIndex(self.aggregate_df)
+
         self.synthetic_aggregate_df = pd.DataFrame(
             data=synthetic_aggregates.items(),
             columns=["selections", "protected_count"],
@@ -190,12 +214,121 @@ class AnonymizeCaseData(IntelligenceWorkflow):
         )
 
         self.aggregate_error_report = ErrorReport(
-            sensitive_aggregates_parsed, dp_aggregates_parsed
+            sensitive_aggregates_frame, dp_aggregates
         ).gen()
         self.synthetic_error_report = ErrorReport(
-            sensitive_aggregates_parsed, synthetic_aggregates_parsed
+            sensitive_aggregates_frame, synthetic_aggregates
         ).gen()
 
+    def sweep_epsilons(
+        self,
+        df: pd.DataFrame,
+        epsilons: list[float],
+        fabrication_strategies: list[FabricationStrategy] | None = None,
+        reporting_length: int = 4,
+        percentile_percentage: float = 99,
+        percentile_epsilon_proportion: float = 0.01,
+        number_of_records_epsilon_proportion: float = 0.005,
+        weight_selection_percentile: float = 95,
+        accuracy_mode: str = "prioritize_long_combinations",
+        empty_value: str = "",
+        use_synthetic_counts: bool = True,
+        aggregate_counts_scale_factor: float = 1.0,
+        max_workers: int | None = None,
+    ) -> pd.DataFrame:
+        """
+        Compares the privacy-utility trade-off of several epsilons and fabrication strategies without changing the workflow state.
+
+        The sensitive dataset and its aggregates are computed once and shared by every run; each combination of epsilon and fabrication strategy fits its own synthesizer, in worker processes when more than one worker is used.
+
+        Every worker process receives its own copy of the sensitive data and of its aggregates, so peak memory grows with the worker count, and pacsynth already uses every core for each fit. More workers help only when memory is plentiful and the runs are short.
+
+        Args:
+            df (pd.DataFrame): The dataframe to be anonymized.
+            epsilons (list[float]): The epsilon values to compare.
+            fabrication_strategies (list[FabricationStrategy], optional): The fabrication strategies to compare. Defaults to [FabricationStrategy.BALANCED].
+            reporting_length (int, optional): The maximum length of attribute value combination to compute. Defaults to 4.
+            percentile_percentage (float, optional): The percentile to use for the epsilon budget. Defaults to 99.
+            percentile_epsilon_proportion (float, optional): The proportion of the epsilon budget to use for percentile calculation. Defaults to 0.01.
+            number_of_records_epsilon_proportion (float, optional): The proportion of the epsilon budget to use for the number of records. Defaults to 0.005.
+            weight_selection_percentile (float, optional): The percentile to use for selecting weights. Defaults to 95.
+            accuracy_mode (str, optional): The name of the AccuracyMode to use. Defaults to "prioritize_long_combinations".
+            empty_value (str, optional): The value to use for empty cells. Defaults to "".
+            use_synthetic_counts (bool, optional): Whether to use synthetic counts in progress to guide sampling. Defaults to True.
+            aggregate_counts_scale_factor (float, optional): The scale factor to use for aggregate counts. Defaults to 1.0.
+            max_workers (int, optional): The number of worker processes; defaults to DEFAULT_SWEEP_WORKERS, 1 runs in-process.
+
+        Returns:
+            pd.DataFrame: One row per epsilon and fabrication strategy, with the overall error, suppression and fabrication of the aggregate and synthetic data.
+        """
+        if accuracy_mode not in ACCURACY_MODES:
+            msg = f"Unknown accuracy mode: {accuracy_mode}"
+            raise ValueError(msg)
+        if fabrication_strategies is None:
+            fabrication_strategies = [self.FabricationStrategy.BALANCED]
+
+        raw_data = Dataset.data_frame_to_raw_data(df_functions.fix_null_ints(df))
+        sensitive_aggregates = aggregate_frame(
+            Dataset(raw_data).get_aggregates(reporting_length, ";")
+        )
+        parameters = {
+            "reporting_length": reporting_length,
+            "percentile_percentage": percentile_percentage,
+            "percentile_epsilon_proportion": percentile_epsilon_proportion,
+            "number_of_records_epsilon_proportion": (
+                number_of_records_epsilon_proportion
+            ),
+            "weight_selection_percentile": weight_selection_percentile,
+            "accuracy_mode": accuracy_mode,
+            "empty_value": empty_value,
+            "use_synthetic_counts": use_synthetic_counts,
+            "aggregate_counts_scale_factor": aggregate_counts_scale_factor,
+        }
+        # pacsynth objects cannot be pickled, so strategies travel by name
+        tasks = [
+            (epsilon, strategy.name)
+            for strategy in fabrication_strategies
+            for epsilon in epsilons
+        ]
+        workers = min(max_workers or DEFAULT_SWEEP_WORKERS, len(tasks))
+        if workers > 1:
+            # Polars thread pools do not survive a fork, so workers are spawned
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_sweep_worker,
+                initargs=(raw_data, sensitive_aggregates, parameters),
+            ) as executor:
+                rows = list(executor.map(_run_sweep_task, tasks))
+        else:
+            runner = _SweepRunner(raw_data, sensitive_aggregates, parameters)
+            rows = [runner.run(*task) for task in tasks]
+        return pd.DataFrame(rows, columns=SWEEP_COLUMNS)
+
+    def get_synthetic_index(self) -> SyntheticIndex:
+        # Rebuilt only when the synthetic data is replaced
+        if (
+            self.synthetic_index is None
+            or self.synthetic_index.sdf is not self.synthetic_df
+        ):
+            self.synthetic_index = SyntheticIndex(self.synthetic_df)
+        return self.synthetic_index
+
+    def get_aggregate_index(
+        self, att_separator: str = ";", val_separator: str = ":"
+    ) -> AggregateIndex:
+        # Rebuilt only when the aggregates or the separators change
+        if (
+            self.aggregate_index is None
+            or self.aggregate_index.adf is not self.aggregate_df
+            or self.aggregate_index.att_separator != att_separator
+            or self.aggregate_index.val_separator != val_separator
+        ):
+            self.aggregate_index = AggregateIndex(
+                self.aggregate_df, att_separator, val_separator
+            )
+        return self.aggregate_index
+
     def get_data_schema(self) -> dict[list[str]]:
         return queries.get_data_schema(self.synthetic_df)
 
@@ -212,6 +345,7 @@ class AnonymizeCaseData(IntelligenceWorkflow):
             source_attribute,
             target_attribute,
             highlight_attribute,
+            aggregates=self.get_aggregate_index(),
         )
 
     def compute_synthetic_graph_df(
@@ -227,6 +361,7 @@ class AnonymizeCaseData(IntelligenceWorkflow):
             source_attribute,
             target_attribute,
             highlight_attribute,
+            index=self.get_synthetic_index(),
         )
 
     def compute_time_series_query_df(
@@ -245,6 +380,8 @@ class AnonymizeCaseData(IntelligenceWorkflow):
             time_series=series_attributes,
             att_separator=att_separator,
             val_separator=val_separator,
+            index=self.get_synthetic_index(),
+            aggregates=self.get_aggregate_index(att_separator, val_separator),
         )
 
     def compute_top_attributes_query_df(
@@ -263,6 +400,8 @@ class AnonymizeCaseData(IntelligenceWorkflow):
             num_values,
             att_separator,
             val_separator,
+            index=self.get_synthetic_index(),
+            aggregates=self.get_aggregate_index(att_separator, val_separator),
         )
 
     def get_bar_chart_fig(
@@ -351,6 +490,7 @@ class AnonymizeCaseData(IntelligenceWorkflow):
                 highlight_attribute,
                 att_separator,
                 val_separator,
+                aggregates=self.get_aggregate_index(att_separator, val_separator),
             )
         else:
             chart_df = queries.compute_synthetic_graph(
@@ -361,6 +501,7 @@ class AnonymizeCaseData(IntelligenceWorkflow):
                 highlight_attribute,
                 att_separator,
                 val_separator,
+                index=self.get_synthetic_index(),
             )
         chart = visuals.get_flow_chart(
             chart_df,
@@ -374,3 +515,94 @@ class AnonymizeCaseData(IntelligenceWorkflow):
             scheme,
         )
         return chart, chart_df
+
+
+def _synthesizer_parameters(
+    epsilon: float,
+    reporting_length: int,
+    percentile_percentage: float,
+    percentile_epsilon_proportion: float,
+    number_of_records_epsilon_proportion: float,
+    weight_selection_percentile: float,
+    accuracy_mode: AccuracyMode,
+    fabrication_mode: AnonymizeCaseData.FabricationStrategy,
+    empty_value: str,
+    use_synthetic_counts: bool,
+    aggregate_counts_scale_factor: float,
+):
+    return (
+        DpAggregateSeededParametersBuilder()
+        .reporting_length(reporting_length)
+        .epsilon(epsilon)
+        .percentile_percentage(percentile_percentage)
+        .percentile_epsilon_proportion(percentile_epsilon_proportion)
+        .accuracy_mode(accuracy_mode)
+        .number_of_records_epsilon_proportion(number_of_records_epsilon_proportion)
+        .fabrication_mode(fabrication_mode.value)
+        .empty_value(empty_value)
+        .weight_selection_percentile(weight_selection_percentile)
+        .use_synthetic_counts(use_synthetic_counts)
+        .aggregate_counts_scale_factor(aggregate_counts_scale_factor)
+        .build()
+    )
+
+
+class _SweepRunner:
+    def __init__(
+        self,
+        raw_data: list[list[str]],
+        sensitive_aggregates: pl.DataFrame,
+        parameters: dict,
+    ) -> None:
+        # Built once per worker process and reused for each of its runs
+        self.sensitive_dataset = Dataset(raw_data)
+        self.sensitive_aggregates = sensitive_aggregates
+        self.parameters = parameters
+
+    def run(self, epsilon: float, fabrication_strategy: str) -> list:
+        parameters = {
+            **self.parameters,
+            "accuracy_mode": getattr(AccuracyMode, self.parameters["accuracy_mode"])(),
+        }
+        synth = DpAggregateSeededSynthesizer(
+            _synthesizer_parameters(
+                epsilon=epsilon,
+                fabrication_mode=AnonymizeCaseData.FabricationStrategy[
+                    fabrication_strategy
+                ],
+                **parameters,
+            )
+        )
+        synth.fit(self.sensitive_dataset)
+        protected_number_of_records = synth.get_dp_number_of_records()
+        synthetic_dataset = Dataset(synth.sample())
+        row = [
+            epsilon,
+            fabrication_strategy,
+            protected_number_of_records,
+            1.0 / (math.log(protected_number_of_records) * protected_number_of_records),
+        ]
+        for aggregates in [
+            synth.get_dp_aggregates(";"),
+            synthetic_dataset.get_aggregates(self.parameters["reporting_length"], ";"),
+        ]:
+            report = ErrorReport(self.sensitive_aggregates, aggregates)
+            report.gen()
+            row += [
+                report.mean_error,
+                report.suppressed_count * 100.0 / report.src_total,
+                report.fabricated_count * 100.0 / report.target_total,
+            ]
+        return row
+
+
+_sweep_runner: _SweepRunner | None = None
+
+
+def _init_sweep_worker(raw_data, sensitive_aggregates, parameters) -> None:
+    global _sweep_runner
+    _sweep_runner = _SweepRunner(raw_data, sensitive_aggregates, parameters)
+
+
+def _run_sweep_task(task: tuple[float, str]) -> list:
+    return _sweep_runner.run(*task)
@@ -4,54 +4,115 @@
 from collections import defaultdict
 import numpy as np
 import pandas as pd
+import polars as pl
+
+
+def aggregate_frame(aggregates, separator=";") -> pl.DataFrame:
+    """
+    One row per attribute value combination, with its key, length and count.
+    Combinations may be given as tuples or as separator-joined strings; strings
+    are measured without being split.
+    """
+    keys = list(aggregates.keys())
+    counts = list(aggregates.values())
+    if len(keys) > 0 and isinstance(keys[0], tuple):
+        lengths = pl.Series("length", [len(k) for k in keys], dtype=pl.Int64)
+        keys = [separator.join(k) for k in keys]
+    else:
+        lengths = None
+    frame = pl.DataFrame(
+        {
+            "key": pl.Series(keys, dtype=pl.Utf8),
+            "count": pl.Series(counts, dtype=None if len(counts) > 0 else pl.Int64),
+        }
+    )
+    if lengths is None:
+        lengths = (
+            frame["key"].str.count_matches(separator, literal=True).cast(pl.Int64)
+            + 1
+        ).alias("length")
+    return frame.with_columns(lengths)
 
 
 class ErrorReport:
-    def __init__(self, src_aggregates, target_aggregates):
+    def __init__(self, src_aggregates, target_aggregates, separator=";"):
         self.src_aggregates = src_aggregates
         self.target_aggregates = target_aggregates
+        self.separator = separator
+        self._statistics = None
+
+    def _by_len(self) -> dict[int, dict]:
+        # Both sides are joined once and every statistic comes from one group-by
+        if self._statistics is None:
+            src = self.src_aggregates
+            target = self.target_aggregates
+            if not isinstance(src, pl.DataFrame):
+                src = aggregate_frame(src, self.separator)
+            if not isinstance(target, pl.DataFrame):
+                target = aggregate_frame(target, self.separator)
+            joined = src.join(
+                target, on=["key", "length"], how="outer_coalesce", suffix="_target"
+            )
+            src_count = pl.col("count")
+            target_count = pl.col("count_target")
+            error = (target_count - src_count).abs()
+            rows = (
+                joined.group_by("length")
+                .agg(
+                    src_total=src_count.sum(),
+                    src_n=src_count.count(),
+                    target_total=target_count.sum(),
+                    fabricated=target_count.filter(src_count.is_null()).sum(),
+                    fabricated_n=target_count.filter(src_count.is_null()).count(),
+                    suppressed=src_count.filter(target_count.is_null()).sum(),
+                    suppressed_n=src_count.filter(target_count.is_null()).count(),
+                    error_total=error.sum(),
+                    error_n=error.count(),
+                )
+                .sort("length")
+            )
+            self._statistics = {row.pop("length"): row for row in rows.to_dicts()}
+        return self._statistics
 
     def calc_fabricated(self):
         self.fabricated_count = 0
         self.fabricated_count_by_len = defaultdict(int)
 
-        for u, v in self.target_aggregates.items():
-            if u not in self.src_aggregates:
-                self.fabricated_count += v
-                self.fabricated_count_by_len[len(u)] += v
+        for length, row in self._by_len().items():
+            if row["fabricated_n"] > 0:
+                self.fabricated_count += row["fabricated"]
+                self.fabricated_count_by_len[length] += row["fabricated"]
 
     def calc_suppressed(self):
         self.suppressed_count = 0
         self.suppressed_count_by_len = defaultdict(int)
 
-        for o, v in self.src_aggregates.items():
-            if o not in self.target_aggregates:
-                self.suppressed_count += v
-                self.suppressed_count_by_len[len(o)] += v
+        for length, row in self._by_len().items():
+            if row["suppressed_n"] > 0:
+                self.suppressed_count += row["suppressed"]
+                self.suppressed_count_by_len[length] += row["suppressed"]
 
     def calc_mean(self):
-        mean = []
-        mean_by_len = defaultdict(list)
+        rows = {l: row for l, row in self._by_len().items() if row["src_n"] > 0}
 
-        for o in self.src_aggregates:
-            mean.append(self.src_aggregates[o])
-            mean_by_len[len(o)].append(self.src_aggregates[o])
-
-        self.mean_count = np.mean(mean)
-        self.mean_count_by_len = {l: np.mean(mean_by_len[l]) for l in mean_by_len}
+        self.mean_count = _mean(
+            sum(row["src_total"] for row in rows.values()),
+            sum(row["src_n"] for row in rows.values()),
+        )
+        self.mean_count_by_len = {
+            l: _mean(row["src_total"], row["src_n"]) for l, row in rows.items()
+        }
 
     def calc_errors(self):
-        errors = []
-        errors_by_len = defaultdict(list)
-
-        for o in self.src_aggregates:
-            if o in self.target_aggregates:
-                err = abs(self.target_aggregates[o] - self.src_aggregates[o])
-                errors.append(err)
-                errors_by_len[len(o)].append(err)
+        rows = {l: row for l, row in self._by_len().items() if row["error_n"] > 0}
 
-        self.mean_error = np.mean(errors)
-        self.mean_error_by_len = {l: np.mean(errors_by_len[l]) for l in errors_by_len}
+        self.mean_error = _mean(
+            sum(row["error_total"] for row in rows.values()),
+            sum(row["error_n"] for row in rows.values()),
+        )
+        self.mean_error_by_len = {
+            l: _mean(row["error_total"], row["error_n"]) for l, row in rows.items()
+        }
 
     def calc_total(aggregates):
         total = 0
@@ -63,17 +124,24 @@ class ErrorReport:
 
         return (total, total_by_len)
 
+    def calc_totals(self):
+        self.src_total = 0
+        self.src_total_by_len = defaultdict(int)
+        self.target_total = 0
+        self.target_total_by_len = defaultdict(int)
+
+        for length, row in self._by_len().items():
+            self.src_total += row["src_total"]
+            self.src_total_by_len[length] += row["src_total"]
+            self.target_total += row["target_total"]
+            self.target_total_by_len[length] += row["target_total"]
+
     def gen(self):
         self.calc_fabricated()
         self.calc_suppressed()
         self.calc_mean()
         self.calc_errors()
-        self.src_total, self.src_total_by_len = ErrorReport.calc_total(
-            self.src_aggregates
-        )
-        self.target_total, self.target_total_by_len = ErrorReport.calc_total(
-            self.target_aggregates
-        )
+        self.calc_totals()
 
         rows = [
             [
@@ -100,3 +168,7 @@ class ErrorReport:
                 "Fabricated %",
             ],
         )
+
+
+def _mean(total, n) -> float:
+    return total / n if n > 0 else np.nan
@@ -4,8 +4,12 @@
 from collections import defaultdict
 from typing import Any
 
+import numpy as np
 import pandas as pd
 
+from intelligence_toolkit.anonymize_case_data.aggregate_index import AggregateIndex
+from intelligence_toolkit.anonymize_case_data.synthetic_index import SyntheticIndex
+
 
 def get_data_schema(sdf) -> dict[list[str]]:
     data_schema = defaultdict(list)
@@ -25,44 +29,41 @@ def compute_aggregate_graph(
     highlight_attribute,
     att_separator=";",
     val_separator=":",
+    aggregates: AggregateIndex | None = None,
 ) -> pd.DataFrame:
+    if aggregates is None:
+        aggregates = AggregateIndex(adf, att_separator, val_separator)
     edge_atts = {source_attribute, target_attribute}
     edges = []
     edge_counts = {}
     edge_highlights = {}
-    for i, row in adf.iterrows():
-        selections = row["selections"].split(att_separator)
-        selection_atts = set([x.split(val_separator)[0] for x in selections])
-        att_intersection = selection_atts.intersection(edge_atts)
-        if att_intersection == edge_atts:
-            # the record has both edge attributes; now we need to filter on the filters
-            val_intersection = set(selections).intersection(filters)
-            if val_intersection == set(filters):
-                # the record has both edge attributes and the filters
-                # check what else is in the selections
-                remaining = []
-                source_val = None
-                target_val = None
-                for selection in selections:
-                    att = selection.split(val_separator)[0]
-                    if att == source_attribute:
-                        source_val = selection.split(val_separator)[1]
-                    if att == target_attribute:
-                        target_val = selection.split(val_separator)[1]
-                    if (
-                        att not in edge_atts
-                        and selection not in filters
-                        and selection not in remaining
-                    ):
-                        remaining.append(selection)
-                if len(remaining) == 0:
-                    edge_counts[(source_val, target_val)] = row["protected_count"]
-                elif (
-                    len(remaining) == 1
-                    and highlight_attribute is not None
-                    and remaining[0] == highlight_attribute
-                ):
-                    edge_highlights[(source_val, target_val)] = row["protected_count"]
+    # only combinations with both edge attributes and all the filters can match
+    for i in aggregates.containing(edge_atts, set(filters)).tolist():
+        selections = aggregates.selections[i]
+        # check what else is in the selections
+        remaining = []
+        source_val = None
+        target_val = None
+        for selection in selections:
+            att = selection.split(val_separator)[0]
+            if att == source_attribute:
+                source_val = selection.split(val_separator)[1]
+            if att == target_attribute:
+                target_val = selection.split(val_separator)[1]
+            if (
+                att not in edge_atts
+                and selection not in filters
+                and selection not in remaining
+            ):
+                remaining.append(selection)
+        if len(remaining) == 0:
+            edge_counts[(source_val, target_val)] = aggregates.counts[i]
+        elif (
+            len(remaining) == 1
+            and highlight_attribute is not None
+            and remaining[0] == highlight_attribute
+        ):
+            edge_highlights[(source_val, target_val)] = aggregates.counts[i]
 
     for edge, count in edge_counts.items():
         if count > 0:
@@ -93,40 +94,53 @@ def compute_synthetic_graph(
     highlight_attribute,
     att_separator=";",
     val_separator=":",
+    index: SyntheticIndex | None = None,
 ) -> pd.DataFrame:
-    edges = []
+    if index is None:
+        index = SyntheticIndex(sdf)
     att_groups = {}
     for f in filters:
         att, val = f.split(val_separator)
         att_groups[att] = att_groups.get(att, []) + [val]
 
-    # compute all pairs of source and target
-    for source in sdf[source_attribute].unique():
-        for target in sdf[target_attribute].unique():
-            if len(str(source)) == 0 or len(str(target)) == 0:
-                continue
-            df = sdf.copy()
-            df = df[df[source_attribute] == source]
-            df = df[df[target_attribute] == target]
-            for att, vals in att_groups.items():
-                df = df[df[att].isin(vals)]
-            count = len(df)
-            if count > 0:
-                highlight = 0
-                if highlight_attribute != "":
-                    hatt, hval = highlight_attribute.split(val_separator)
-                    df = df[df[hatt] == hval]
-                    highlight = len(df)
-                edges.append(
-                    [
-                        source,
-                        target,
-                        count,
-                        highlight,
-                        highlight / count,
-                        "Synthetic",
-                    ]
-                )
+    # count every source and target pair of the filtered records in one pass
+    selected = index.select(att_groups)
+    rows = index.rows(selected)
+    sources = index.values[source_attribute]
+    targets = index.values[target_attribute]
+    has_source = np.array([len(str(x)) > 0 for x in sources], dtype=bool)
+    has_target = np.array([len(str(x)) > 0 for x in targets], dtype=bool)
+
+    def pair_counts(rows):
+        source_codes = index.codes[source_attribute][rows]
+        target_codes = index.codes[target_attribute][rows]
+        valid = (source_codes >= 0) & (target_codes >= 0)
+        source_codes, target_codes = source_codes[valid], target_codes[valid]
+        valid = has_source[source_codes] & has_target[target_codes]
+        pairs = source_codes[valid].astype(np.int64) * len(targets)
+        return np.unique(pairs + target_codes[valid], return_counts=True)
+
+    pairs, counts = pair_counts(rows)
+    highlights = np.zeros(len(pairs), dtype=np.int64)
+    if highlight_attribute != "":
+        hatt, hval = highlight_attribute.split(val_separator)
+        highlighted = index.rows(selected & index.bitmap(hatt, [hval]))
+        highlight_pairs, highlight_counts = pair_counts(highlighted)
+        highlights[np.searchsorted(pairs, highlight_pairs)] = highlight_counts
+
+    edges = [
+        [
+            sources[pair // len(targets)],
+            targets[pair % len(targets)],
+            count,
+            highlight,
+            highlight / count,
+            "Synthetic",
+        ]
+        for pair, count, highlight in zip(
+            pairs.tolist(), counts.tolist(), highlights.tolist(), strict=True
+        )
+    ]
 
     edges_df = pd.DataFrame(
         edges,
@@ -134,12 +148,13 @@ def compute_synthetic_graph(
     )
     return edges_df
 
-def compute_top_attributes_query(
-    query, sdf, adf, show_attributes, num_values, att_separator=";", val_separator=":"
-) -> pd.DataFrame | Any:
-    data_schema = get_data_schema(sdf)
-    df = sdf.copy(deep=True)
+def _query_filters(
+    query, data_schema, val_separator=":"
+) -> tuple[dict[str, list[str]], list[str], bool]:
+    # values selected per attribute, single-value selections, and whether any
+    # attribute has several selected values
     selection = []
+    filters = {}
     has_unions = False
     for att, vals in data_schema.items():
         filter_vals = [
@@ -148,21 +163,60 @@ def compute_top_attributes_query(
             if {"attribute": att, "value": v} in query and len(str(v)) > 0
         ]
         if len(filter_vals) > 0:
-            df = df[df[att].isin(filter_vals)]
+            filters[att] = filter_vals
             if len(filter_vals) == 1:
                 selection.append(f"{att}{val_separator}{filter_vals[0]}")
             else:
                 has_unions = True
-    # Add ID based on row number
-    df["Id"] = [i for i in range(len(df))]
-    sdf_filtered = df.melt(id_vars=["Id"], var_name="Attribute", value_name="Value")
-    sdf_filtered["AttributeValue"] = (
-        sdf_filtered["Attribute"] + val_separator + sdf_filtered["Value"]
-    )
-    sdf_filtered = sdf_filtered[sdf_filtered["Value"] != ""]
+    return filters, selection, has_unions
+
+
+def _aggregate_counts(
+    data_schema, attributes, selection, aggregates, val_separator=":"
+):
+    # reported count of the selection extended by each attribute value
+    for att in attributes:
+        for val in data_schema.get(att, []):
+            filter = f"{att}{val_separator}{val}"
+            extended_selection = (
+                sorted(selection + [filter])
+                if filter not in selection
+                else sorted(selection)
+            )
+            extended_agg_count = aggregates.count(extended_selection)
+            if extended_agg_count > 0:
+                yield att, filter, extended_agg_count
+
+
+def compute_top_attributes_query(
+    query,
+    sdf,
+    adf,
+    show_attributes,
+    num_values,
+    att_separator=";",
+    val_separator=":",
+    index: SyntheticIndex | None = None,
+    aggregates: AggregateIndex | None = None,
+) -> pd.DataFrame | Any:
+    if index is None:
+        index = SyntheticIndex(sdf)
+    data_schema = get_data_schema(sdf)
+    filters, selection, has_unions = _query_filters(query, data_schema, val_separator)
+    rows = index.rows(index.select(filters))
+    # values in order of first appearance, as value_counts would list them
+    attribute_values = []
+    value_counts = []
+    for att in sdf.columns:
+        counts = index.value_counts(att, rows)
+        for code in index.first_codes(att, rows).tolist():
+            value = index.values[att][code]
+            if value != "":
+                attribute_values.append(f"{att}{val_separator}{value}")
+                value_counts.append(counts[code])
     syn_counts = (
-        sdf_filtered["AttributeValue"]
-        .value_counts()
+        pd.Series(value_counts, index=attribute_values, dtype="int64")
+        .sort_values(ascending=False)
         .rename_axis("Attribute Value")
         .to_frame("Count")
     )
@@ -173,26 +227,14 @@ def compute_top_attributes_query(
     result_df = syn_counts[["Attribute", "Attribute Value", "Count", "Dataset"]]
 
     if not has_unions:
-        agg_rows = []
-        for att, vals in data_schema.items():
-            for val in vals:
-                filter = f"{att}{val_separator}{val}"
-                extended_selection = (
-                    sorted(selection + [filter])
-                    if filter not in selection
-                    else sorted(selection)
-                )
-                extended_selection_key = att_separator.join(extended_selection)
-                extended_filtered_aggs = adf[
-                    adf["selections"] == extended_selection_key
-                ]
-                extended_agg_count = (
-                    extended_filtered_aggs["protected_count"].values[0]
-                    if len(extended_filtered_aggs) > 0
-                    else 0
-                )
-                if extended_agg_count > 0:
-                    agg_rows.append([att, filter, extended_agg_count, "Aggregate"])
+        if aggregates is None:
+            aggregates = AggregateIndex(adf, att_separator, val_separator)
+        agg_rows = [
+            [att, filter, count, "Aggregate"]
+            for att, filter, count in _aggregate_counts(
+                data_schema, data_schema.keys(), selection, aggregates, val_separator
+            )
+        ]
         agg_df = pd.DataFrame(
             agg_rows, columns=["Attribute", "Attribute Value", "Count", "Dataset"]
         )
@@ -219,51 +261,99 @@ def compute_top_attributes_query(
     return result_df[["Attribute", "Attribute Value", "Count", "Dataset"]]
 
 def compute_time_series_query(
-    query, sdf, adf, time_attribute, time_series, att_separator=";", val_separator=":"
+    query,
+    sdf,
+    adf,
+    time_attribute,
+    time_series,
+    att_separator=";",
+    val_separator=":",
+    index: SyntheticIndex | None = None,
+    aggregates: AggregateIndex | None = None,
 ) -> pd.DataFrame:
-    tdfs = []
+    columns = [time_attribute, "Attribute", "Attribute Value", "Count", "Dataset"]
     times = [t for t in sorted(sdf[time_attribute].unique()) if len(str(t)) > 0]
+    if index is None:
+        index = SyntheticIndex(sdf)
+    if aggregates is None:
+        aggregates = AggregateIndex(adf, att_separator, val_separator)
+    data_schema = get_data_schema(sdf)
+    attributes = time_series if len(time_series) > 0 else list(sdf.columns)
+    # each period is the query plus that period's value of the time attribute
+    filters, selection, has_unions = _query_filters(
+        [x for x in query if x["attribute"] != time_attribute],
+        data_schema,
+        val_separator,
+    )
+    query_times, _, _ = _query_filters(
+        [x for x in query if x["attribute"] == time_attribute],
+        {time_attribute: data_schema[time_attribute]},
+        val_separator,
+    )
+    query_times = query_times.get(time_attribute, [])
+
+    # count every (period, attribute value) of the filtered records in one pass
+    rows = index.rows(index.select(filters))
+    time_codes = index.codes[time_attribute][rows]
+    num_times = len(index.values[time_attribute])
+    period_counts = {}
+    for att in attributes:
+        att_codes = index.codes[att][rows]
+        valid = (time_codes >= 0) & (att_codes >= 0)
+        num_values = len(index.values[att])
+        period_counts[att] = np.bincount(
+            time_codes[valid].astype(np.int64) * num_values + att_codes[valid],
+            minlength=num_times * num_values,
+        ).reshape(num_times, num_values)
+
+    records = []
     for time in times:
-        time_query = query + [{"attribute": time_attribute, "value": time}]
-        tdf = compute_top_attributes_query(
-            query=time_query,
-            sdf=sdf,
-            adf=adf,
-            show_attributes=time_series,
-            num_values=0,
-            att_separator=att_separator,
-            val_separator=val_separator,
+        time_vals = [
+            v for v in data_schema[time_attribute] if v in query_times or v == time
+        ]
+        time_selection = list(selection)
+        if len(time_vals) == 1:
+            time_selection.append(f"{time_attribute}{val_separator}{time_vals[0]}")
+        aggregate_counts = {}
+        if not has_unions and len(time_vals) == 1:
+            aggregate_counts = {
+                filter: (att, count)
+                for att, filter, count in _aggregate_counts(
+                    data_schema, attributes, time_selection, aggregates, val_separator
+                )
+            }
+        time_rows = [
+            index.value_codes[time_attribute][v]
+            for v in time_vals
+            if v in index.value_codes[time_attribute]
+        ]
+        for att in attributes:
+            counts = period_counts[att][time_rows].sum(axis=0)
+            for value, count in zip(index.values[att], counts.tolist(), strict=True):
+                filter = f"{att}{val_separator}{value}"
+                if count > 0 and value != "" and filter not in aggregate_counts:
+                    records.append([time, att, filter, count, "Synthetic"])
+        records.extend(
+            [time, att, filter, count, "Aggregate"]
+            for filter, (att, count) in aggregate_counts.items()
         )
-        tdf[time_attribute] = time
-        tdfs.append(tdf)
-    final_tdf = pd.concat(tdfs, axis=0, ignore_index=True)
-    missing = []
-    for _, row in final_tdf.iterrows():
-        att = row["Attribute"]
-        val = row["Attribute Value"]
-        for time in times:
-            match = final_tdf[
-                (final_tdf["Attribute"] == att)
-                & (final_tdf["Attribute Value"] == val)
-                & (final_tdf[time_attribute] == time)
-            ]
-            if len(match) == 0:
-                missing.append([time, att, val, 0, "Aggregate"])
+    tdf = pd.DataFrame(records, columns=columns)
 
-    if len(missing) > 0:
-        missing_df = pd.DataFrame(
-            missing,
-            columns=[
-                time_attribute,
-                "Attribute",
-                "Attribute Value",
-                "Count",
-                "Dataset",
-            ],
-        )
-        final_tdf = pd.concat([final_tdf, missing_df], axis=0, ignore_index=True)
+    # every attribute value seen in any period gets a point in every period
+    points = tdf[["Attribute", "Attribute Value"]].drop_duplicates()
+    grid = pd.MultiIndex.from_arrays(
+        [
+            np.repeat(np.array(times, dtype=object), len(points)),
+            np.tile(points["Attribute"].to_numpy(), len(times)),
+            np.tile(points["Attribute Value"].to_numpy(), len(times)),
+        ],
+        names=columns[:3],
+    )
+    tdf = tdf.set_index(columns[:3]).reindex(grid).reset_index()
+    tdf["Count"] = tdf["Count"].fillna(0).astype("int64")
+    tdf["Dataset"] = tdf["Dataset"].fillna("Aggregate")
     return (
-        final_tdf[[time_attribute, "Attribute", "Attribute Value", "Count", "Dataset"]]
-        .drop_duplicates()
+        tdf[columns]
         .sort_values(by=[time_attribute, "Attribute Value"])
+        .reset_index(drop=True)
     )
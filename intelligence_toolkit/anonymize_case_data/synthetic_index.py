@@ -0,0 +1,87 @@
+# Copyright (c) 2024 Microsoft Corporation. All rights reserved.
+# Licensed under the MIT license. See LICENSE file in the project.
+
+from collections import OrderedDict
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+# Value bitmaps kept between queries; the least recently used are dropped first
+BITMAP_CACHE_SIZE = 256
+
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+class SyntheticIndex:
+    def __init__(self, sdf: pd.DataFrame) -> None:
+        """
+        Columnar index over the synthetic records, built once per dataset. Each
+        attribute's values are coded as integers in order of first appearance, and
+        the rows holding a value are kept as a packed bitmap, so query filters
+        become bitmap intersections and counts become popcounts.
+
+        Values are matched as stored, the same way as filtering the data frame.
+
+        Args:
+            sdf (pd.DataFrame): The synthetic records, one column per attribute
+        """
+        self.sdf = sdf
+        self.num_rows = len(sdf)
+        self.codes: dict[str, np.ndarray] = {}
+        self.values: dict[str, np.ndarray] = {}
+        self.value_codes: dict[str, dict[Any, int]] = {}
+        for att in sdf.columns:
+            codes, uniques = pd.factorize(sdf[att])
+            self.codes[att] = codes
+            self.values[att] = np.asarray(uniques, dtype=object)
+            self.value_codes[att] = {value: code for code, value in enumerate(uniques)}
+        self._bitmaps: OrderedDict[tuple[str, int], np.ndarray] = OrderedDict()
+
+    def all_rows(self) -> np.ndarray:
+        return np.packbits(np.ones(self.num_rows, dtype=bool))
+
+    def _value_bitmap(self, att: str, code: int) -> np.ndarray:
+        key = (att, code)
+        if key in self._bitmaps:
+            self._bitmaps.move_to_end(key)
+            return self._bitmaps[key]
+        bitmap = np.packbits(self.codes[att] == code)
+        self._bitmaps[key] = bitmap
+        if len(self._bitmaps) > BITMAP_CACHE_SIZE:
+            self._bitmaps.popitem(last=False)
+        return bitmap
+
+    def bitmap(self, att: str, values: list) -> np.ndarray:
+        """Rows where the attribute holds any of the values."""
+        bitmap = np.zeros((self.num_rows + 7) // 8, dtype=np.uint8)
+        for value in values:
+            code = self.value_codes[att].get(value)
+            if code is not None:
+                bitmap |= self._value_bitmap(att, code)
+        return bitmap
+
+    def select(self, att_values: dict[str, list]) -> np.ndarray:
+        """Rows matching any of the listed values of every listed attribute."""
+        bitmap = self.all_rows()
+        for att, values in att_values.items():
+            bitmap &= self.bitmap(att, values)
+        return bitmap
+
+    def count(self, bitmap: np.ndarray) -> int:
+        return int(_POPCOUNT[bitmap].sum(dtype=np.int64))
+
+    def rows(self, bitmap: np.ndarray) -> np.ndarray:
+        return np.unpackbits(bitmap, count=self.num_rows).astype(bool)
+
+    def value_counts(self, att: str, rows: np.ndarray) -> np.ndarray:
+        """Count of each of the attribute's values within the selected rows."""
+        codes = self.codes[att][rows]
+        return np.bincount(codes[codes >= 0], minlength=len(self.values[att]))
+
+    def first_codes(self, att: str, rows: np.ndarray) -> np.ndarray:
+        """Codes present in the selected rows, in order of first appearance."""
+        codes = self.codes[att][rows]
+        codes = codes[codes >= 0]
+        uniques, first = np.unique(codes, return_index=True)
+        return uniques[np.argsort(first)]
@@ -8,3 +8,7 @@ type_val_sep = "="
 laplacian = True
 diaga = True
 correlation = True
+
+# Pattern counts and subject bitmaps kept by RecordCounter; least recently used go first
+record_count_cache_size = 100_000
+subject_bitmap_cache_size = 1024
@@ -1,66 +1,74 @@
 # Copyright (c) 2024 Microsoft Corporation. All rights reserved.
 # Licensed under the MIT license. See LICENSE file in the project.
 #
-from collections import defaultdict
+from collections import OrderedDict, defaultdict
 
 import numpy as np
+import pandas as pd
 
+import intelligence_toolkit.detect_case_patterns.config as config
 from intelligence_toolkit.helpers.constants import ATTRIBUTE_VALUE_SEPARATOR
 
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
 
 class RecordCounter:
-    def __init__(self, df):
+    def __init__(
+        self,
+        df,
+        cache_size: int = config.record_count_cache_size,
+        bitmap_cache_size: int = config.subject_bitmap_cache_size,
+    ):
+        # Subjects are numbered once; each attribute value and period keeps the
+        # sorted numbers of its subjects, expanded into a packed bitmap on demand
         self.counter = 0
         self.df = df
         self.periods = sorted(df["Period"].unique())
         self.atts = sorted(df["Full Attribute"].unique())
-        att_to_ids_df = (
-            df[["Subject ID", "Full Attribute"]]
-            .groupby("Full Attribute")
-            .agg(list)
-            .reset_index()
-        )
-        self.att_to_ids = dict(
-            zip(
-                att_to_ids_df["Full Attribute"],
-                [set(x) for x in att_to_ids_df["Subject ID"]],
-                strict=False,
-            )
-        )
-        # do same for Period
-        time_to_ids_df = (
-            df[["Subject ID", "Period"]].groupby("Period").agg(list).reset_index()
-        )
-        self.att_to_ids.update(
-            dict(
-                zip(
-                    time_to_ids_df["Period"],
-                    [set(x) for x in time_to_ids_df["Subject ID"]],
-                    strict=False,
-                )
-            )
-        )
-        self.cache = {}
+        subjects, subject_ids = pd.factorize(df["Subject ID"], use_na_sentinel=False)
+        self.num_subjects = len(subject_ids)
+        self.att_to_subjects = {}
+        for column in ["Full Attribute", "Period"]:
+            for key, rows in df.groupby(column).indices.items():
+                self.att_to_subjects[key] = np.unique(subjects[rows]).astype(np.int32)
+        self.cache_size = cache_size
+        self.bitmap_cache_size = bitmap_cache_size
+        self.cache = OrderedDict()
+        self.bitmaps = OrderedDict()
+
+    def _bitmap(self, att) -> np.ndarray:
+        if att in self.bitmaps:
+            self.bitmaps.move_to_end(att)
+            return self.bitmaps[att]
+        mask = np.zeros(self.num_subjects, dtype=bool)
+        mask[self.att_to_subjects[att]] = True
+        bitmap = np.packbits(mask)
+        self.bitmaps[att] = bitmap
+        if len(self.bitmaps) > self.bitmap_cache_size:
+            self.bitmaps.popitem(last=False)
+        return bitmap
 
     def count_records(self, atts):
         key = ";".join(sorted(atts))
         if key in self.cache:
+            self.cache.move_to_end(key)
             return self.cache[key]
 
         type_to_vals = defaultdict(list)
         for att in atts:
             type_to_vals[att.split(ATTRIBUTE_VALUE_SEPARATOR)[0]].append(att)
-        ids = set()
-        for ix, (_typ, vals) in enumerate(type_to_vals.items()):
-            combined_atts = set()
-            for val in vals:
-                combined_atts.update(self.att_to_ids[val])
-            if ix == 0:
-                ids.update(combined_atts)
+        # values of one type are alternatives; different types must all hold
+        ids = None
+        for vals in type_to_vals.values():
+            if len(vals) == 1:
+                combined_atts = self._bitmap(vals[0])
             else:
-                ids.intersection_update(combined_atts)
-        count = len(ids)
+                combined_atts = np.bitwise_or.reduce([self._bitmap(v) for v in vals])
+            ids = combined_atts if ids is None else ids & combined_atts
+        count = 0 if ids is None else int(_POPCOUNT[ids].sum(dtype=np.int64))
         self.cache[key] = count
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
         return count
 
     def compute_period_mean_sd_max(self, atts):
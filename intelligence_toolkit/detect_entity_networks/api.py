@@ -43,6 +43,7 @@ from intelligence_toolkit.detect_entity_networks.prepare_model import (
     build_main_graph,
     format_data_columns,
     generate_attribute_links,
+    is_value_hub,
 )
 from intelligence_toolkit.helpers.classes import IntelligenceWorkflow
 from intelligence_toolkit.helpers.constants import ATTRIBUTE_VALUE_SEPARATOR
@@ -64,8 +65,11 @@ class DetectEntityNetworks(IntelligenceWorkflow):
         self.exposure_report = ""
 
     def format_links_added(
-        self, values_df: pl.DataFrame, entity_id: int | str, columns: list[str]
-    ) -> pl.DataFrame:
+        self,
+        values_df: pl.DataFrame | pl.LazyFrame,
+        entity_id: int | str,
+        columns: list[str],
+    ) -> pl.DataFrame | pl.LazyFrame:
         return format_data_columns(values_df, columns, entity_id)
 
     def get_entity_types(self) -> list[str]:
@@ -86,12 +90,14 @@ class DetectEntityNetworks(IntelligenceWorkflow):
     def add_attribute_links(
         self, data_df: pl.DataFrame, entity_id_column: str, columns_to_link: list[str]
     ) -> list:
+        # Filter and clean in one lazy query, so Polars runs it as a single pass
+        data_lf = data_df.lazy()
         for column in columns_to_link:
-            data_df = data_df.filter(pl.col(column).is_not_null())
+            data_lf = data_lf.filter(pl.col(column).is_not_null())
 
         data_df_formatted = self.format_links_added(
-            data_df, entity_id_column, columns_to_link
-        )
+            data_lf, entity_id_column, columns_to_link
+        ).collect()
         links = generate_attribute_links(
             data_df_formatted, entity_id_column, columns_to_link
         )
@@ -156,10 +162,12 @@ class DetectEntityNetworks(IntelligenceWorkflow):
             all_nodes = self.graph.nodes()
             entity_nodes = [node for node in all_nodes if node.startswith(ENTITY_LABEL)]
             self.attributes_list = [
-                node for node in all_nodes if not node.startswith(ENTITY_LABEL)
+                node
+                for node in all_nodes
+                if not node.startswith(ENTITY_LABEL) and not is_value_hub(node)
             ]
             num_entities = len(entity_nodes)
-            num_attributes = len(all_nodes) - num_entities
+            num_attributes = len(self.attributes_list)
 
         if len(self.integrated_flags) > 0:
             num_flags = self.integrated_flags["count"].sum()
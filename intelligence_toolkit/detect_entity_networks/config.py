@@ -6,6 +6,8 @@ SIMILARITY_THRESHOLD_MIN = 0.001
 SIMILARITY_THRESHOLD_MAX = 1.0
 DEFAULT_MAX_ATTRIBUTE_DEGREE = 10
 ENTITY_LABEL = "ENTITY"
+# Hub node joining the attributes of different types that share a value
+VALUE_LABEL = "SHARED_VALUE"
 LIST_SEPARATOR = ";"
 
 cache_name = "detect_entity_networks"
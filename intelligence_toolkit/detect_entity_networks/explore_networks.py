@@ -13,6 +13,11 @@ from intelligence_toolkit.detect_entity_networks.config import (
     ENTITY_LABEL,
     LIST_SEPARATOR,
 )
+from intelligence_toolkit.detect_entity_networks.identify_networks import (
+    build_inferred_adjacency,
+    get_attribute_neighbors,
+)
+from intelligence_toolkit.detect_entity_networks.prepare_model import build_flag_totals
 from intelligence_toolkit.helpers.constants import ATTRIBUTE_VALUE_SEPARATOR
 
 
@@ -20,16 +25,10 @@ def _integrate_flags(graph: nx.Graph, df_integrated_flags: pl.DataFrame) -> nx.G
     if not graph.nodes() or df_integrated_flags.is_empty():
         return nx.Graph()
 
-    df_integrated_flags = df_integrated_flags.filter(pl.col("count") > 0)
-    flagged_nodes = (
-        df_integrated_flags.select("qualified_entity").unique().to_series().to_list()
-    )
-
-    flagged_nodes = [node for node in flagged_nodes if node in graph.nodes()]
-    for node in flagged_nodes:
-        graph.nodes[node]["flags"] = df_integrated_flags.filter(
-            pl.col("qualified_entity") == node
-        )["count"].sum()
+    flag_totals = build_flag_totals(df_integrated_flags.filter(pl.col("count") > 0))
+    for node, flags in flag_totals.items():
+        if node in graph.nodes():
+            graph.nodes[node]["flags"] = flags
     return graph
 
 
@@ -47,9 +46,11 @@ def _build_fuzzy_neighbors(
         msg = f"Node {att_neighbor} not in graph"
         raise ValueError(msg)
 
-    fuzzy_att_neighbors = set(graph.neighbors(att_neighbor))
-    if att_neighbor in inferred_links:
-        fuzzy_att_neighbors = fuzzy_att_neighbors.union(inferred_links[att_neighbor])
+    inferred_links = build_inferred_adjacency(inferred_links)
+    fuzzy_att_neighbors = get_attribute_neighbors(graph, att_neighbor)
+    fuzzy_att_neighbors = fuzzy_att_neighbors.union(
+        inferred_links.get(att_neighbor, ())
+    )
 
     fuzzy_att_neighbors_not_trimmed = [
         fuzzy_att_neighbor
@@ -83,8 +84,7 @@ def build_network_from_entities(
         else set()
     )
 
-    if inferred_links is None:
-        inferred_links = {}
+    inferred_links = build_inferred_adjacency(inferred_links)
 
     if integrated_flags is None:
         integrated_flags = pl.DataFrame()
@@ -93,11 +93,7 @@ def build_network_from_entities(
         n_c = str(entity_to_community[node]) if node in entity_to_community else ""
         network_graph.add_node(node, type=ENTITY_LABEL, network=n_c, flags=0)
         ent_neighbors = set(graph.neighbors(node))
-        if node in inferred_links:
-            ent_neighbors = ent_neighbors.union(inferred_links[node])
-        for i in inferred_links:
-            if node in inferred_links[i]:
-                ent_neighbors = ent_neighbors.union([node])
+        ent_neighbors = ent_neighbors.union(inferred_links.get(node, ()))
 
         ent_neighbors_not_trimmed = [
             ent_neighbor
@@ -120,9 +116,10 @@ def build_network_from_entities(
                     flags=0,
                 )
                 network_graph.add_edge(node, ent_neighbor)
-                att_neighbors = set(graph.neighbors(ent_neighbor))
-                if ent_neighbor in inferred_links:
-                    att_neighbors = att_neighbors.union(inferred_links[ent_neighbor])
+                att_neighbors = get_attribute_neighbors(graph, ent_neighbor)
+                att_neighbors = att_neighbors.union(
+                    inferred_links.get(ent_neighbor, ())
+                )
                 att_neighbors_not_trimmed = [
                     att_neighbor
                     for att_neighbor in att_neighbors
@@ -9,6 +9,7 @@ import networkx as nx
 import polars as pl
 
 from intelligence_toolkit.detect_entity_networks.config import ENTITY_LABEL
+from intelligence_toolkit.detect_entity_networks.prepare_model import build_flag_totals
 from intelligence_toolkit.helpers.constants import ATTRIBUTE_VALUE_SEPARATOR
 
 
@@ -29,15 +30,16 @@ def build_exposure_data(
     rdf = integrated_flags
     c_nodes = c_nodes.copy()
     if inferred_links:
+        seen = set(c_nodes)
         for key, values in inferred_links.items():
-            if key not in c_nodes and key in graph:
-                c_nodes.append(key)
-            for value in values:
-                if value not in c_nodes and value in graph:
-                    c_nodes.append(value)
+            for node in [key, *values]:
+                if node not in seen and node in graph:
+                    c_nodes.append(node)
+                    seen.add(node)
 
     rdf = rdf.filter(pl.col("qualified_entity").is_in(c_nodes))
     rdf = rdf.group_by(["qualified_entity", "flag"]).agg(pl.col("count").sum())
+    entity_flags = build_flag_totals(rdf)
     all_flagged = (
         rdf.filter(pl.col("count") > 0)
         .select("qualified_entity")
@@ -46,12 +48,8 @@ def build_exposure_data(
         .to_list()
     )
 
-    target_flags = (
-        rdf.filter(pl.col("qualified_entity") == qualified_selected)
-        .select(pl.col("count").sum())
-        .item()
-    )
-    total_flags = rdf.select(pl.col("count").sum()).item()
+    target_flags = entity_flags.get(qualified_selected, 0)
+    total_flags = sum(entity_flags.values())
     net_flags = total_flags - target_flags
     net_flagged = len(all_flagged)
     if qualified_selected in all_flagged:
@@ -70,9 +68,7 @@ def build_exposure_data(
 
             for _, step in enumerate(path):
                 if ENTITY_LABEL in step:
-                    step_risks = rdf.filter(pl.col("qualified_entity") == step)[
-                        "count"
-                    ].sum()
+                    step_risks = entity_flags.get(step, 0)
 
                     if step_risks == 0:
                         continue
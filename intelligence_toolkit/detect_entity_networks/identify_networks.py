@@ -5,13 +5,19 @@ from collections import defaultdict
 from typing import Any
 
 import networkx as nx
+import numpy as np
 import polars as pl
 from graspologic.partition import hierarchical_leiden
+from scipy.sparse import csr_matrix, diags
 
 from intelligence_toolkit.detect_entity_networks.config import (
     DEFAULT_MAX_ATTRIBUTE_DEGREE,
     ENTITY_LABEL,
 )
+from intelligence_toolkit.detect_entity_networks.prepare_model import (
+    build_flag_totals,
+    is_value_hub,
+)
 from intelligence_toolkit.helpers.constants import ATTRIBUTE_VALUE_SEPARATOR
 
 
@@ -24,15 +30,55 @@ def trim_nodeset(
     if additional_trimmed_attributes is None:
         additional_trimmed_attributes = []
 
+    # An attribute's degree counts each attribute it shares a value with, as if
+    # linked to it directly rather than through the value's hub
+    hub_peers = defaultdict(int)
+    for node, degree in graph.degree():
+        if is_value_hub(node):
+            for attribute in graph.neighbors(node):
+                hub_peers[attribute] += degree - 2
+
     trimmed_degrees = set()
     for node, degree in graph.degree():
-        if not node.startswith(ENTITY_LABEL) and degree > max_attribute_degree:
+        if node.startswith(ENTITY_LABEL) or is_value_hub(node):
+            continue
+        degree += hub_peers.get(node, 0)
+        if degree > max_attribute_degree:
             trimmed_degrees.add((node, degree))
 
     trimmed_nodes = {t[0] for t in trimmed_degrees}.union(additional_trimmed_attributes)
     return trimmed_degrees, trimmed_nodes
 
 
+class InferredAdjacency(dict):
+    """Inferred links indexed from both ends, so each node maps to all of its links."""
+
+
+def build_inferred_adjacency(inferred_links: dict[set] | None) -> InferredAdjacency:
+    # Links may be recorded in one direction only; index them once so neighbour
+    # lookups cost O(degree) instead of a scan over every inferred link
+    if isinstance(inferred_links, InferredAdjacency):
+        return inferred_links
+    adjacency = InferredAdjacency()
+    for node, links in (inferred_links or {}).items():
+        adjacency.setdefault(node, set()).update(links)
+        for link in links:
+            adjacency.setdefault(link, set()).add(node)
+    return adjacency
+
+
+def get_attribute_neighbors(graph: nx.Graph, node) -> set:
+    # Shared value hubs stand in for the attributes they join
+    neighbors = set()
+    for neighbor in graph.neighbors(node):
+        if is_value_hub(neighbor):
+            neighbors.update(graph.neighbors(neighbor))
+        else:
+            neighbors.add(neighbor)
+    neighbors.discard(node)
+    return neighbors
+
+
 def get_entity_neighbors(overall_graph, inferred_links, trimmed_nodeset, node) -> list:
     if not len(overall_graph.nodes()):
         return []
@@ -42,12 +88,8 @@ def get_entity_neighbors(overall_graph, inferred_links, trimmed_nodeset, node) -
 
     neighbors = set(overall_graph.neighbors(node))
     if inferred_links:
-        if node in inferred_links:
-            neighbors = neighbors.union(inferred_links[node])
-
-        for inferred_link in inferred_links:
-            if node in inferred_links[inferred_link]:
-                neighbors = neighbors.union([inferred_link])
+        inferred_links = build_inferred_adjacency(inferred_links)
+        neighbors = neighbors.union(inferred_links.get(node, ()))
 
     neighbors = neighbors.difference(trimmed_nodeset)
 
@@ -65,64 +107,104 @@ def neighbor_is_valid(
     return is_not_supported and not is_trimmed
 
 
+def _adjacency_matrix(
+    overall_graph: nx.Graph, inferred_links: InferredAdjacency
+) -> tuple[list[str], dict[str, int], csr_matrix]:
+    # Node IDs follow name order, so the columns of each row come out sorted
+    names = sorted(set(overall_graph.nodes()).union(inferred_links))
+    node_ids = {name: ix for ix, name in enumerate(names)}
+    edges = [(node_ids[u], node_ids[v]) for u, v in overall_graph.edges() if u != v]
+    edges.extend(
+        (node_ids[node], node_ids[link])
+        for node, links in inferred_links.items()
+        for link in links
+        if node != link
+    )
+    pairs = np.array(edges, dtype=np.int64).reshape(-1, 2)
+    rows = np.concatenate([pairs[:, 0], pairs[:, 1]])
+    cols = np.concatenate([pairs[:, 1], pairs[:, 0]])
+    adjacency = csr_matrix(
+        (np.ones(len(rows), dtype=np.float32), (rows, cols)),
+        shape=(len(names), len(names)),
+    )
+    adjacency.sum_duplicates()
+    return names, node_ids, adjacency
+
+
 def project_entity_graph(
     overall_graph: nx.Graph,
     trimmed_nodeset: set,
     inferred_links: dict[set] | None = None,
     supporting_attribute_types: list[str] | None = None,
 ) -> nx.Graph:
+    # Entities are linked directly, through a shared valid (neither trimmed nor
+    # supporting) attribute, or through two linked valid attributes. Each walk is a
+    # sparse product over the node adjacency matrix, with invalid nodes masked out
     P = nx.Graph()
     entity_nodes = [
         node for node in overall_graph.nodes() if node.startswith(ENTITY_LABEL)
     ]
+    if not entity_nodes:
+        return P
 
     if supporting_attribute_types is None:
         supporting_attribute_types = []
 
-    if inferred_links is None:
-        inferred_links = []
-
-    for node in entity_nodes:
-        neighbors = get_entity_neighbors(
-            overall_graph, inferred_links, trimmed_nodeset, node
-        )
+    inferred_links = build_inferred_adjacency(inferred_links)
+    names, node_ids, adjacency = _adjacency_matrix(overall_graph, inferred_links)
+
+    trimmed_nodeset = set(trimmed_nodeset)
+    supporting_attribute_types = set(supporting_attribute_types)
+    is_entity = np.array([name.startswith(ENTITY_LABEL) for name in names])
+    is_hub = np.array([is_value_hub(name) for name in names])
+    is_trimmed = np.array([name in trimmed_nodeset for name in names])
+    is_valid = ~is_trimmed & np.array(
+        [
+            name.split(ATTRIBUTE_VALUE_SEPARATOR)[0] not in supporting_attribute_types
+            for name in names
+        ]
+    )
+    attribute_ids = np.flatnonzero(is_valid & ~is_entity & ~is_hub)
+    hub_ids = np.flatnonzero(is_hub)
+
+    source_ids = np.array([node_ids[node] for node in entity_nodes], dtype=np.int64)
+    entity_rows = adjacency[source_ids]
+    direct = entity_rows.multiply((is_entity & ~is_trimmed).astype(np.float32))
+    entity_attributes = entity_rows[:, attribute_ids]
+    attribute_rows = adjacency[attribute_ids]
+    attribute_entities = csr_matrix(
+        attribute_rows.multiply((is_entity & is_valid).astype(np.float32))
+    )
+    via_attribute = entity_attributes @ attribute_entities
+    # Attributes sharing a value hub are linked as if directly
+    attribute_hubs = attribute_rows[:, hub_ids]
+    linked_attributes = (
+        attribute_rows[:, attribute_ids] + attribute_hubs @ attribute_hubs.T
+    )
+    linked_attributes = linked_attributes - diags(linked_attributes.diagonal())
+    via_linked_attribute = entity_attributes @ (linked_attributes @ attribute_entities)
+
+    # Keep the shortest walk to each entity, ranked 3 (direct) to 1 (two attributes)
+    ranked = (
+        csr_matrix(direct > 0) * 3.0
+    ).maximum(csr_matrix(via_attribute > 0) * 2.0).maximum(
+        csr_matrix(via_linked_attribute > 0) * 1.0
+    )
+    ranked = ranked.tocoo()
+    keep = source_ids[ranked.row] != ranked.col
+    rows, cols, rank = ranked.row[keep], ranked.col[keep], ranked.data[keep]
+    order = np.lexsort((cols, -rank, rows))
+    sources, targets = source_ids[rows[order]], cols[order]
+
+    # Each link is found from both ends; add it once, where it first appears
+    pair_keys = np.minimum(sources, targets) * len(names) + np.maximum(
+        sources, targets
+    )
+    _, first = np.unique(pair_keys, return_index=True)
+    first.sort()
 
-        for ent_neighbor in neighbors:
-            if ent_neighbor.startswith(ENTITY_LABEL):
-                P.add_edge(node, ent_neighbor)
-            elif neighbor_is_valid(
-                ent_neighbor, supporting_attribute_types, trimmed_nodeset
-            ):
-                att_neighbors = set(overall_graph.neighbors(ent_neighbor))
-                if ent_neighbor in inferred_links:
-                    att_neighbors = att_neighbors.union(inferred_links[ent_neighbor])
-                for att_neighbor in att_neighbors:
-                    if neighbor_is_valid(
-                        att_neighbor, supporting_attribute_types, trimmed_nodeset
-                    ):
-                        if att_neighbor.startswith(ENTITY_LABEL):
-                            if node != att_neighbor:
-                                P.add_edge(node, att_neighbor)
-                        else:  # fuzzy att link
-                            fuzzy_att_neighbors = set(
-                                overall_graph.neighbors(att_neighbor)
-                            )
-                            if att_neighbor in inferred_links:
-                                fuzzy_att_neighbors = fuzzy_att_neighbors.union(
-                                    inferred_links[att_neighbor]
-                                )
-                            for fuzzy_att_neighbor in fuzzy_att_neighbors:
-                                if neighbor_is_valid(
-                                    fuzzy_att_neighbor,
-                                    supporting_attribute_types,
-                                    trimmed_nodeset,
-                                ):
-                                    if fuzzy_att_neighbor.startswith(ENTITY_LABEL):
-                                        if node != fuzzy_att_neighbor:
-                                            P.add_edge(
-                                                node,
-                                                fuzzy_att_neighbor,
-                                            )
+    names = np.array(names, dtype=object)
+    P.add_edges_from(zip(names[sources[first]], names[targets[first]], strict=True))
     return P
 
 
@@ -217,49 +299,29 @@ def get_integrated_flags(
     integrated_flags: pl.DataFrame,
     entities: list[str],
     inferred_links: dict[set] | None = None,
+    flag_totals: dict[str, int] | None = None,
 ) -> tuple[Any, int, float, int, int]:
     total_entities = len(entities)
     if integrated_flags.is_empty():
         return 0, 0, 0, 0, total_entities
-    entities_processed = entities.copy()
-
-    flags_df = integrated_flags.filter(pl.col("qualified_entity").is_in(entities))
-    community_flags = flags_df.get_column("count").sum()
+    if flag_totals is None:
+        flag_totals = build_flag_totals(integrated_flags)
+    entities_processed = set(entities)
 
-    flagged = len(flags_df.filter(pl.col("count") > 0)["qualified_entity"].unique())
+    community_flags = sum(flag_totals.get(n, 0) for n in entities_processed)
+    flagged = sum(flag_totals.get(n, 0) > 0 for n in entities_processed)
 
-    for n in entities:  # entities from a network
-        if inferred_links:
-            if n in inferred_links:
-                if n not in entities_processed:
-                    flags = integrated_flags.filter(pl.col("qualified_entity") == n)[
-                        "count"
-                    ].sum()
+    if inferred_links:
+        inferred_links = build_inferred_adjacency(inferred_links)
+        for n in entities:  # entities from a network
+            for l in inferred_links.get(n, ()):
+                if l not in entities_processed:
+                    flags = flag_totals.get(l, 0)
                     community_flags += flags
                     total_entities += 1
-                else:
-                    for l in inferred_links[n]:
-                        if l not in entities_processed:
-                            flags = integrated_flags.filter(
-                                pl.col("qualified_entity") == l
-                            )["count"].sum()
-                            community_flags += flags
-                            total_entities += 1
-                            entities_processed.append(l)
-                            if flags > 0:
-                                flagged += 1
-
-            for i in inferred_links:
-                if n in inferred_links[i]:
-                    if i not in entities_processed:
-                        flags = integrated_flags.filter(
-                            pl.col("qualified_entity") == i
-                        )["count"].sum()
-                        community_flags += flags
-                        total_entities += 1
-                        entities_processed.append(i)
-                        if flags > 0:
-                            flagged += 1
+                    entities_processed.add(l)
+                    if flags > 0:
+                        flagged += 1
 
     unflagged = total_entities - flagged
     flagged_per_unflagged = flagged / unflagged if unflagged > 0 else 0
@@ -283,9 +345,13 @@ def build_entity_records(
     community_nodes: list[str],
     integrated_flags: pl.DataFrame | None = None,
     inferred_links: defaultdict[set] | None = None,
+    flag_totals: dict[str, int] | None = None,
 ) -> list[tuple[str, int, int, int, Any, int, float, float]]:
     if integrated_flags is None:
         integrated_flags = pl.DataFrame()
+    if flag_totals is None:
+        flag_totals = build_flag_totals(integrated_flags)
+    inferred_links = build_inferred_adjacency(inferred_links)
 
     entity_records = []
     for ix, entities in enumerate(community_nodes):
@@ -295,19 +361,15 @@ def build_entity_records(
             flagged_per_unflagged,
             flags_per_entity,
             total_entities,
-        ) = get_integrated_flags(integrated_flags, entities, inferred_links)
+        ) = get_integrated_flags(
+            integrated_flags, entities, inferred_links, flag_totals
+        )
 
         for n in entities:  # entities from a network
-            flags = 0
-            if not integrated_flags.is_empty():
-                flags = integrated_flags.filter(pl.col("qualified_entity") == n)[
-                    "count"
-                ].sum()
-
             entity_records.append(
                 (
                     n.split(ATTRIBUTE_VALUE_SEPARATOR)[1],
-                    flags,
+                    flag_totals.get(n, 0),
                     ix,
                     total_entities,
                     community_flags,
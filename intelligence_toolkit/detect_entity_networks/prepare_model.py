@@ -10,7 +10,10 @@ import networkx as nx
 import polars as pl
 
 from intelligence_toolkit.detect_entity_networks.classes import FlagAggregatorType
-from intelligence_toolkit.detect_entity_networks.config import ENTITY_LABEL
+from intelligence_toolkit.detect_entity_networks.config import (
+    ENTITY_LABEL,
+    VALUE_LABEL,
+)
 from intelligence_toolkit.helpers.constants import ATTRIBUTE_VALUE_SEPARATOR
 from intelligence_toolkit.helpers.texts import clean_text_for_csv
 
@@ -22,25 +25,41 @@ def clean_text(text: str | int) -> str:
     return re.sub(r"\s+", " ", cleaned_text)
 
 
+# clean_text as Polars regexes: Python's \w is letters, numbers and underscore,
+# and its \s also covers the \x1c-\x1f separators
+_PUNCTUATION_PATTERN = r"[^\p{L}\p{N}_\s\x1c-\x1f&@+]"
+_WHITESPACE_PATTERN = r"[\s\x1c-\x1f]+"
+
+
+def clean_text_expr(column: str, dtype: pl.DataType) -> pl.Expr:
+    """
+    Expression applying clean_text to a column. String and integer columns are
+    cleaned natively, any other type falls back to clean_text per value, since
+    Polars formats those differently from str().
+    """
+    if dtype == pl.Null:
+        return pl.col(column)
+    if dtype == pl.String or dtype.is_integer():
+        return (
+            pl.col(column)
+            .cast(pl.String)
+            .str.replace_all(_PUNCTUATION_PATTERN, "")
+            .str.replace_all(_WHITESPACE_PATTERN, " ")
+            .str.strip_chars(" ")
+        )
+    return pl.col(column).map_elements(clean_text, return_dtype=pl.String)
+
+
 def format_data_columns(
-    values_df: pl.DataFrame, columns_to_link: list[str], entity_id_column: str | int
-) -> pl.DataFrame:
-    values_df = values_df.with_columns(
-        [
-            pl.col(entity_id_column)
-            .map_elements(clean_text, return_dtype=pl.Utf8)
-            .alias(entity_id_column)
-        ]
+    values_df: pl.DataFrame | pl.LazyFrame,
+    columns_to_link: list[str],
+    entity_id_column: str | int,
+) -> pl.DataFrame | pl.LazyFrame:
+    schema = values_df.schema
+    columns = list(dict.fromkeys([entity_id_column, *columns_to_link]))
+    return values_df.with_columns(
+        [clean_text_expr(column, schema[column]) for column in columns]
     )
-    for value_col in columns_to_link:
-        values_df = values_df.with_columns(
-            [
-                pl.col(value_col)
-                .map_elements(clean_text, return_dtype=pl.Utf8)
-                .alias(value_col)
-            ]
-        )
-    return values_df
 
 
 def generate_attribute_links(
@@ -75,6 +94,10 @@ def generate_attribute_links(
     return attribute_links
 
 
+def is_value_hub(node: str) -> bool:
+    return node.startswith(f"{VALUE_LABEL}{ATTRIBUTE_VALUE_SEPARATOR}")
+
+
 def build_main_graph(
     attribute_links: list[Any] | None = None,
 ) -> nx.Graph:
@@ -82,23 +105,57 @@ def build_main_graph(
     if attribute_links is None:
         return graph
 
-    value_to_atts = defaultdict(set)
-    for link_list in attribute_links:
-        for link in link_list:
-            n1 = f"{ENTITY_LABEL}{ATTRIBUTE_VALUE_SEPARATOR}{link[0]}"
-            n2 = f"{link[1]}{ATTRIBUTE_VALUE_SEPARATOR}{link[2]}"
-            edge = (n1, n2) if n1 < n2 else (n2, n1)
-            graph.add_edge(edge[0], edge[1], type=link[1])
-            graph.add_node(n1, type=ENTITY_LABEL)
-            graph.add_node(n2, type=link[1])
-            value_to_atts[link[2]].add(n2)
-
-    for atts in value_to_atts.values():
-        att_list = list(atts)
-        for i, att1 in enumerate(att_list):
-            for att2 in att_list[i + 1 :]:
-                edge = (att1, att2) if att1 < att2 else (att2, att1)
-                graph.add_edge(edge[0], edge[1], type="equality")
+    links = pl.DataFrame(
+        [
+            (str(link[0]), str(link[1]), str(link[2]))
+            for link_list in attribute_links
+            for link in link_list
+        ],
+        schema=["entity", "type", "value"],
+        orient="row",
+    )
+    if links.is_empty():
+        return graph
+
+    links = links.with_columns(
+        (pl.lit(f"{ENTITY_LABEL}{ATTRIBUTE_VALUE_SEPARATOR}") + pl.col("entity")).alias(
+            "entity_node"
+        ),
+        (pl.col("type") + ATTRIBUTE_VALUE_SEPARATOR + pl.col("value")).alias(
+            "attribute_node"
+        ),
+    ).unique(["entity_node", "attribute_node"], maintain_order=True)
+    edges = links.select(
+        pl.min_horizontal("entity_node", "attribute_node").alias("source"),
+        pl.max_horizontal("entity_node", "attribute_node").alias("target"),
+        "type",
+    )
+    graph.add_edges_from(
+        (source, target, {"type": edge_type})
+        for source, target, edge_type in edges.iter_rows()
+    )
+    graph.add_nodes_from(links["entity_node"].unique(), type=ENTITY_LABEL)
+    graph.add_nodes_from(
+        (node, {"type": node_type})
+        for node, node_type in links.unique("attribute_node", keep="last")
+        .select("attribute_node", "type")
+        .iter_rows()
+    )
+
+    # Attributes of different types sharing a value link through one hub node
+    # for that value, rather than through an edge for every pair of them
+    shared = (
+        links.unique("attribute_node", maintain_order=True)
+        .filter(pl.len().over("value") > 1)
+        .select(
+            "attribute_node",
+            (pl.lit(f"{VALUE_LABEL}{ATTRIBUTE_VALUE_SEPARATOR}") + pl.col("value")).alias(
+                "value_node"
+            ),
+        )
+    )
+    graph.add_nodes_from(shared["value_node"].unique(), type=VALUE_LABEL)
+    graph.add_edges_from(shared.iter_rows(), type="equality")
     return graph
 
 
@@ -192,6 +249,14 @@ def build_flags(
     return flags, max_entity_flags, mean_flagged_flags
 
 
+def build_flag_totals(integrated_flags: pl.DataFrame | None = None) -> dict[str, int]:
+    # One pass over the flags, so reports look up each entity's total directly
+    if integrated_flags is None or integrated_flags.is_empty():
+        return {}
+    totals = integrated_flags.group_by("qualified_entity").agg(pl.sum("count"))
+    return dict(totals.iter_rows())
+
+
 def build_groups(
     value_cols: list[str],
     df_groups: pl.DataFrame,
@@ -19,3 +19,4 @@ if not os.path.exists(CACHE_PATH):
 
 VECTOR_STORE_MAX_RETRIES = 5
 VECTOR_STORE_MAX_RETRIES_WAIT_TIME = 1
+VECTOR_STORE_MAX_BACKOFF_TIME = 60
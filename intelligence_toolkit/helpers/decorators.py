@@ -1,35 +1,176 @@
 # Copyright (c) 2024 Microsoft Corporation. All rights reserved.
 # Licensed under the MIT license. See LICENSE file in the project.
 #
+import asyncio
+import inspect
+import logging
 import random
+import re
 import time
 from collections.abc import Callable
 from functools import wraps
 from typing import Any, TypeVar
 
 from intelligence_toolkit.helpers.constants import (
+    VECTOR_STORE_MAX_BACKOFF_TIME,
     VECTOR_STORE_MAX_RETRIES,
     VECTOR_STORE_MAX_RETRIES_WAIT_TIME,
 )
 
 T = TypeVar("T")
 
+logger = logging.getLogger(__name__)
+
+_duration_pattern = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_duration_units = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+class RetryStats:
+    """Counters for retries and time spent waiting on throttled requests."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self.retries = 0
+        self.throttled_retries = 0
+        self.wait_seconds = 0.0
+        self.throttled_seconds = 0.0
+
+    def record(self, wait: float, throttled: bool) -> None:
+        self.retries += 1
+        self.wait_seconds += wait
+        if throttled:
+            self.throttled_retries += 1
+            self.throttled_seconds += wait
+
+
+retry_stats = RetryStats()
+
+
+def _parse_duration(value: str) -> float | None:
+    """Parse `Retry-After` seconds or `x-ratelimit-reset-*` values such as `6m0s`."""
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _duration_pattern.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _duration_units[unit] for amount, unit in parts)
+
+
+def _is_too_many_requests(error: BaseException) -> bool:
+    response = getattr(error, "response", None)
+    status_code = getattr(error, "status_code", None)
+    if status_code is None:
+        status_code = getattr(response, "status_code", None)
+    return status_code == 429
+
+
+def _header_duration(headers, name: str) -> float | None:
+    value = headers.get(name)
+    if value is None:
+        return None
+    return _parse_duration(value)
+
+
+def get_retry_after(exception: BaseException) -> float | None:
+    """Return the server-requested wait in seconds, if any error in the chain has one.
+
+    `retry-after-ms` and `retry-after` are honoured for any response. The
+    `x-ratelimit-reset-*` headers only say when a quota refills, so they are
+    used as a fallback for 429 responses alone.
+    """
+    current = exception
+    while current is not None:
+        response = getattr(current, "response", None)
+        headers = getattr(response, "headers", None)
+        if headers is not None:
+            retry_after_ms = _header_duration(headers, "retry-after-ms")
+            if retry_after_ms is not None:
+                return retry_after_ms / 1000
+            retry_after = _header_duration(headers, "retry-after")
+            if retry_after is not None:
+                return retry_after
+            if _is_too_many_requests(current):
+                resets = [
+                    _header_duration(headers, name)
+                    for name in ("x-ratelimit-reset-requests", "x-ratelimit-reset-tokens")
+                ]
+                resets = [wait for wait in resets if wait is not None]
+                if resets:
+                    return max(resets)
+        current = current.__cause__ or current.__context__
+    return None
+
+
+def _backoff_seconds(
+    exception: BaseException,
+    attempt: int,
+    backoff_in_seconds: float,
+    max_backoff_in_seconds: float,
+) -> tuple[float, bool]:
+    jitter = random.uniform(0, 1)
+    retry_after = get_retry_after(exception)
+    if retry_after is not None:
+        wait, throttled = retry_after + jitter * backoff_in_seconds, True
+    else:
+        wait, throttled = backoff_in_seconds * 2**attempt + jitter, False
+    return min(wait, max_backoff_in_seconds), throttled
+
 
 def retry_with_backoff(
     retries=VECTOR_STORE_MAX_RETRIES,
     backoff_in_seconds=VECTOR_STORE_MAX_RETRIES_WAIT_TIME,
+    stats: RetryStats = retry_stats,
+    max_backoff_in_seconds=VECTOR_STORE_MAX_BACKOFF_TIME,
 ) -> Callable[[Callable[..., T]], Callable[..., T]]:
+    """Retry a function or coroutine with jittered exponential backoff.
+
+    Waits requested by the server through `Retry-After` headers, or for 429
+    responses without one through `x-ratelimit-reset-*`, take precedence over the
+    exponential schedule. No single wait exceeds `max_backoff_in_seconds`.
+    Coroutines sleep with `asyncio.sleep`, so other requests keep running while
+    one backs off.
+    """
+
     def decorator(func) -> Any:
+        if inspect.iscoroutinefunction(func):
+
+            @wraps(func)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> T:
+                x = 0
+                while True:
+                    try:
+                        return await func(*args, **kwargs)
+                    except Exception as e:
+                        if x == retries:
+                            raise
+                        sleep, throttled = _backoff_seconds(
+                            e, x, backoff_in_seconds, max_backoff_in_seconds
+                        )
+                        stats.record(sleep, throttled)
+                        logger.info("Retrying %s in %.2fs", func.__name__, sleep)
+                        await asyncio.sleep(sleep)
+                        x += 1
+
+            return async_wrapper
+
         @wraps(func)
         def wrapper(*args: Any, **kwargs: Any) -> T:
             x = 0
             while True:
                 try:
                     return func(*args, **kwargs)
-                except Exception:
+                except Exception as e:
                     if x == retries:
                         raise
-                    sleep = backoff_in_seconds * 2**x + random.uniform(0, 1)
+                    sleep, throttled = _backoff_seconds(
+                        e, x, backoff_in_seconds, max_backoff_in_seconds
+                    )
+                    stats.record(sleep, throttled)
                     time.sleep(sleep)
                     x += 1
 
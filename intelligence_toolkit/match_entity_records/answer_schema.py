@@ -0,0 +1,27 @@
+evaluation_format = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "group_evaluations",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "evaluations": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "group_id": {"type": "integer"},
+                            "relatedness": {"type": "integer"},
+                            "explanation": {"type": "string"},
+                        },
+                        "required": ["group_id", "relatedness", "explanation"],
+                        "additionalProperties": False,
+                    },
+                }
+            },
+            "required": ["evaluations"],
+            "additionalProperties": False,
+        },
+    },
+}
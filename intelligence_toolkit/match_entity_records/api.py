@@ -3,27 +3,35 @@
 #
 
 
-import io
+import json
+import logging
+from collections import OrderedDict
 from typing import ClassVar
 
 import numpy as np
 import polars as pl
 
 import intelligence_toolkit.AI.utils as utils
-from intelligence_toolkit.AI.classes import LLMCallback
-from intelligence_toolkit.AI.client import OpenAIClient
+from intelligence_toolkit.AI.base_chat import BaseChat
+from intelligence_toolkit.AI.openai_configuration import OpenAIConfiguration
 from intelligence_toolkit.helpers.classes import IntelligenceWorkflow
+from intelligence_toolkit.helpers.progress_batch_callback import ProgressBatchCallback
 from intelligence_toolkit.match_entity_records import prompts
+from intelligence_toolkit.match_entity_records.answer_schema import evaluation_format
 from intelligence_toolkit.match_entity_records.classes import (
     AttributeToMatch,
     RecordsModel,
 )
+from intelligence_toolkit.match_entity_records.config import (
+    DEFAULT_EVALUATION_CACHE_SIZE,
+    DEFAULT_GROUPS_PER_EVALUATION,
+)
 from intelligence_toolkit.match_entity_records.detect import (
     build_attributes_dataframe,
+    build_blocking_keys,
+    build_candidate_near_map,
     build_matches,
     build_matches_dataset,
-    build_near_map,
-    build_nearest_neighbors,
     build_sentence_pair_scores,
     convert_to_sentences,
 )
@@ -33,6 +41,8 @@ from intelligence_toolkit.match_entity_records.prepare_model import (
     format_model_df,
 )
 
+logger = logging.getLogger(__name__)
+
 
 class MatchEntityRecords(IntelligenceWorkflow):
     model_dfs: ClassVar[dict] = {}
@@ -40,6 +50,15 @@ class MatchEntityRecords(IntelligenceWorkflow):
     evaluations_df = pl.DataFrame()
     matches_df = pl.DataFrame()
 
+    def __init__(
+        self,
+        ai_configuration: OpenAIConfiguration | None = None,
+        evaluation_cache_size: int = DEFAULT_EVALUATION_CACHE_SIZE,
+    ) -> None:
+        super().__init__(ai_configuration)
+        self.evaluation_cache: OrderedDict[str, dict] = OrderedDict()
+        self.evaluation_cache_size = evaluation_cache_size
+
     @property
     def total_records(self) -> int:
         return sum(df.shape[0] for df in self.model_dfs.values())
@@ -75,28 +94,41 @@ class MatchEntityRecords(IntelligenceWorkflow):
         self.sentences_vector_data = convert_to_sentences(self.model_df)
         return self.model_df
 
-    async def embed_sentences(self) -> None:
+    async def embed_sentences(self, callbacks: list | None = None) -> None:
         sentences_data = await self.embedder.embed_store_many(
-            self.sentences_vector_data, cache_data=self.cache_embeddings
+            self.sentences_vector_data, callbacks, cache_data=self.cache_embeddings
         )
         self.all_sentences = [x["text"] for x in self.sentences_vector_data]
-        self.embeddings = [
-            np.array(next(d["vector"] for d in sentences_data if d["text"] == f))
-            for f in self.all_sentences
-        ]
+        text_to_vector = {d["text"]: d["vector"] for d in sentences_data}
+        # One row per sentence, aligned with all_sentences and model_df
+        self.embeddings = np.array(
+            [text_to_vector[text] for text in self.all_sentences], dtype=np.float32
+        )
 
     def detect_record_groups(
-        self, pair_embedding_threshold: int, pair_jaccard_threshold: int
+        self,
+        pair_embedding_threshold: int,
+        pair_jaccard_threshold: int,
+        blocking_columns: list[str] | None = None,
+        name_prefix_length: int = 0,
+        phonetic_blocking: bool = False,
+        name_similarity: str = "jaccard",
     ) -> pl.DataFrame:
-        distances, indices = build_nearest_neighbors(self.embeddings)
-        near_map = build_near_map(
-            distances,
-            indices,
-            self.all_sentences,
+        blocking_keys = build_blocking_keys(
+            self.model_df,
+            blocking_columns,
+            name_prefix_length=name_prefix_length,
+            phonetic_names=phonetic_blocking,
+        )
+        near_map = build_candidate_near_map(
+            self.embeddings,
             pair_embedding_threshold,
+            blocking_keys=blocking_keys,
         )
 
-        pair_scores = build_sentence_pair_scores(near_map, self.model_df)
+        pair_scores = build_sentence_pair_scores(
+            near_map, self.model_df, name_similarity
+        )
 
         entity_to_group, matches, pair_to_match = build_matches(
             pair_scores,
@@ -114,33 +146,178 @@ class MatchEntityRecords(IntelligenceWorkflow):
         )
         return self.matches_df
 
-    async def evaluate_groups(
-        self,
-        ai_instructions=prompts.list_prompts,
-        callbacks: list[LLMCallback] | None = None,
-    ) -> None:
-        data = self.model_df.drop(
+    def _group_evaluation_data(self) -> tuple[str, dict[int, str], dict[int, str]]:
+        """
+        The CSV header, the CSV rows of each group, and a canonical form of each
+        group for caching. The canonical form leaves out the group ID and sorts the
+        rows, as detection renumbers and reorders unchanged groups.
+        """
+        data = self.matches_df.drop(
             [
                 "Entity ID",
                 "Dataset",
                 "Name similarity",
             ]
         ).to_pandas()
-        data = data.head(500)
+        header = data.head(0).to_csv(index=False)
+        group_to_data = {}
+        group_to_content = {}
+        for group_id, group in data.groupby("Group ID", sort=False):
+            group_to_data[int(group_id)] = group.to_csv(index=False, header=False)
+            rows = group.drop(columns="Group ID").to_csv(index=False, header=False)
+            group_to_content[int(group_id)] = "".join(
+                sorted(rows.splitlines(keepends=True))
+            )
+        return header, group_to_data, group_to_content
 
-        batch_messages = utils.generate_batch_messages(
-            ai_instructions, batch_name="data", batch_value=data
+    async def evaluate_groups(
+        self,
+        ai_instructions=prompts.evaluation_prompts,
+        callbacks: list[ProgressBatchCallback] | None = None,
+        groups_per_request: int = DEFAULT_GROUPS_PER_EVALUATION,
+    ) -> str:
+        """
+        Rate the relatedness of every detected record group. Requests run
+        concurrently and return structured JSON. Evaluations are cached by group
+        content and instructions, so unchanged groups are never sent again, even
+        when a new detection run renumbers them, and
+        `evaluations_df` (and so `integrated_results`) fills in as requests complete.
+        """
+        if self.matches_df.is_empty():
+            self.evaluations_df = self._evaluations_to_df({})
+            return self.evaluations_df.write_csv()
+        full_prompt = " ".join(
+            [
+                ai_instructions["report_prompt"],
+                ai_instructions["user_prompt"],
+                ai_instructions["safety_prompt"],
+            ]
         )
-        prefix = "```\nGroup ID,Relatedness,Explanation\n"
+        header, group_to_data, group_to_content = self._group_evaluation_data()
+        # Keys ignore group IDs, so cached evaluations map back to renumbered groups
+        group_to_key = {
+            group_id: utils.hash_text(full_prompt + header + content)
+            for group_id, content in group_to_content.items()
+        }
+        evaluated = {}
+        for group_id, key in group_to_key.items():
+            evaluation = self._cached_evaluation(key)
+            if evaluation is not None:
+                evaluated[group_id] = evaluation
+        self.evaluations_df = self._evaluations_to_df(evaluated)
+
+        pending = [group_id for group_id in group_to_data if group_id not in evaluated]
+        batches = [
+            pending[start : start + groups_per_request]
+            for start in range(0, len(pending), groups_per_request)
+        ]
+        messages_list = [
+            utils.prepare_messages(
+                full_prompt,
+                {
+                    "data": header
+                    + "".join(group_to_data[group_id] for group_id in batch)
+                },
+            )
+            for batch in batches
+        ]
+
+        def on_result(index: int, response: str) -> None:
+            batch = set(batches[index])
+            try:
+                evaluations = json.loads(response)["evaluations"]
+            except (json.JSONDecodeError, KeyError, TypeError) as e:
+                logger.warning("Skipping unreadable evaluation response %d: %s", index, e)
+                return
+            if not isinstance(evaluations, list):
+                logger.warning("Skipping evaluation response %d without a list", index)
+                return
+            new_evaluations = {}
+            for evaluation in evaluations:
+                parsed = _parse_evaluation(evaluation)
+                if parsed is None:
+                    logger.warning(
+                        "Skipping malformed evaluation in response %d: %r",
+                        index,
+                        evaluation,
+                    )
+                    continue
+                group_id, new_evaluation = parsed
+                if group_id in batch and group_id not in new_evaluations:
+                    new_evaluations[group_id] = new_evaluation
+                    self._cache_evaluation(group_to_key[group_id], new_evaluation)
+            missing = batch.difference(new_evaluations)
+            if missing:
+                logger.warning(
+                    "Evaluation response %d left %d groups unevaluated",
+                    index,
+                    len(missing),
+                )
+            evaluated.update(new_evaluations)
+            self.evaluations_df = pl.concat(
+                [self.evaluations_df, self._evaluations_to_df(new_evaluations)]
+            )
 
-        for messages in batch_messages:
-            response = await OpenAIClient(self.ai_configuration).generate_chat_async(
-                messages, stream=False
+        if messages_list:
+            await BaseChat(self.ai_configuration).generate_texts_async(
+                messages_list,
+                callbacks,
+                on_result=on_result,
+                response_format=evaluation_format,
             )
-            prefix = prefix + response + "\n"
-        result = prefix.replace("```\n", "").strip()
-        self.evaluations_df = pl.read_csv(io.StringIO(result))
-        return result
+        self.evaluations_df = self._evaluations_to_df(
+            {
+                group_id: evaluated[group_id]
+                for group_id in group_to_data
+                if group_id in evaluated
+            }
+        )
+        return self.evaluations_df.write_csv()
+
+    def _cached_evaluation(self, key: str) -> dict | None:
+        evaluation = self.evaluation_cache.get(key)
+        if evaluation is not None:
+            self.evaluation_cache.move_to_end(key)
+        return evaluation
+
+    def _cache_evaluation(self, key: str, evaluation: dict) -> None:
+        self.evaluation_cache[key] = evaluation
+        self.evaluation_cache.move_to_end(key)
+        if len(self.evaluation_cache) > self.evaluation_cache_size:
+            self.evaluation_cache.popitem(last=False)
+
+    @staticmethod
+    def _evaluations_to_df(group_to_evaluation: dict[int, dict]) -> pl.DataFrame:
+        return pl.DataFrame(
+            {
+                "Group ID": list(group_to_evaluation.keys()),
+                "Relatedness": [e["Relatedness"] for e in group_to_evaluation.values()],
+                "Explanation": [e["Explanation"] for e in group_to_evaluation.values()],
+            },
+            schema={
+                "Group ID": pl.Int64,
+                "Relatedness": pl.Int64,
+                "Explanation": pl.Utf8,
+            },
+        )
 
     def clear_model_dfs(self) -> None:
         self.model_dfs = {}
+
+
+def _parse_evaluation(evaluation) -> tuple[int, dict] | None:
+    """The group ID and evaluation of one model item, or None if it is malformed."""
+    if not isinstance(evaluation, dict):
+        return None
+    group_id = evaluation.get("group_id")
+    relatedness = evaluation.get("relatedness")
+    explanation = evaluation.get("explanation")
+    if (
+        not isinstance(group_id, int)
+        or isinstance(group_id, bool)
+        or not isinstance(relatedness, int)
+        or isinstance(relatedness, bool)
+        or not isinstance(explanation, str)
+    ):
+        return None
+    return group_id, {"Relatedness": relatedness, "Explanation": explanation}
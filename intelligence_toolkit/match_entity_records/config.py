@@ -8,4 +8,13 @@ cache_name = "match_entity_records"
 
 DEFAULT_COLUMNS_DONT_CONVERT = ["Entity ID", "Entity name", "Dataset"]
 DEFAULT_SENTENCE_PAIR_JACCARD_THRESHOLD = 0.75
-DEFAULT_MAX_RECORD_DISTANCE = 0.05
\ No newline at end of file
+DEFAULT_MAX_RECORD_DISTANCE = 0.05
+DEFAULT_NEAREST_NEIGHBORS = 50
+# Rows per query batch and per corpus slice in candidate generation; each worker
+# holds one query batch x corpus slice similarity block (64 MB at these sizes)
+DEFAULT_KNN_QUERY_BATCH_SIZE = 1024
+DEFAULT_KNN_CORPUS_BATCH_SIZE = 16384
+# Record groups sent to the model per evaluation request
+DEFAULT_GROUPS_PER_EVALUATION = 20
+# Group evaluations kept per workflow instance, least recently used dropped first
+DEFAULT_EVALUATION_CACHE_SIZE = 10_000
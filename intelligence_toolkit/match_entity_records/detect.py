@@ -2,21 +2,27 @@
 # Licensed under the MIT license. See LICENSE file in the project.
 #
 
+import os
 import re
 from collections import defaultdict
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any
 
 import numpy as np
 import polars as pl
-from sklearn.neighbors import NearestNeighbors
 
 from intelligence_toolkit.AI.classes import VectorData
 from intelligence_toolkit.AI.utils import hash_text
 from intelligence_toolkit.match_entity_records.config import (
     DEFAULT_COLUMNS_DONT_CONVERT,
+    DEFAULT_KNN_CORPUS_BATCH_SIZE,
+    DEFAULT_KNN_QUERY_BATCH_SIZE,
     DEFAULT_MAX_RECORD_DISTANCE,
+    DEFAULT_NEAREST_NEIGHBORS,
     DEFAULT_SENTENCE_PAIR_JACCARD_THRESHOLD,
 )
+from intelligence_toolkit.match_entity_records.similarity import score_name_pairs
 
 
 def convert_to_sentences(
@@ -41,79 +47,226 @@ def convert_to_sentences(
     return sentences
 
 
-def build_nearest_neighbors(
-    embeddings: np.array,
-    n_neighbors: int = 50,
-    leaf_size: int = 20,
-    metric: str = "cosine",
-) -> tuple[np.array, np.array]:
-    if len(embeddings) < n_neighbors:
-        msg = f"Number of neighbors ({n_neighbors}) is greater than number of embeddings ({len(embeddings)})"
-        raise ValueError(msg)
-
-    nbrs = NearestNeighbors(
-        n_neighbors=n_neighbors,
-        n_jobs=1,
-        algorithm="auto",
-        leaf_size=leaf_size,
-        metric=metric,
-    ).fit(embeddings)
-
-    distances, indices = nbrs.kneighbors(embeddings)
-    return distances, indices
-
-
-def build_near_map(
-    distances: np.array,
-    indices: np.array,
-    all_sentences: list[str],
-    max_record_distance: int | None = DEFAULT_MAX_RECORD_DISTANCE,
+_soundex_codes = {
+    **dict.fromkeys("BFPV", "1"),
+    **dict.fromkeys("CGJKQSXZ", "2"),
+    **dict.fromkeys("DT", "3"),
+    "L": "4",
+    **dict.fromkeys("MN", "5"),
+    "R": "6",
+}
+
+
+def soundex(text: str) -> str:
+    letters = re.sub(r"[^A-Z]", "", text.upper())
+    if not letters:
+        return ""
+    code = letters[0]
+    previous = _soundex_codes.get(letters[0], "")
+    for letter in letters[1:]:
+        digit = _soundex_codes.get(letter, "")
+        if digit and digit != previous:
+            code += digit
+        # H and W do not separate letters with the same code
+        if letter not in "HW":
+            previous = digit
+    return (code + "000")[:4]
+
+
+def build_blocking_keys(
+    merged_df: pl.DataFrame,
+    blocking_columns: list[str] | None = None,
+    name_prefix_length: int = 0,
+    phonetic_names: bool = False,
+) -> list[list[str]] | None:
+    """
+    Blocking keys for each record. Records are only compared with records that
+    share at least one key; a record without keys has no candidates. Returns None
+    when no blocking is configured, meaning every record is compared with every other.
+    """
+    blocking_columns = blocking_columns or []
+    if not blocking_columns and name_prefix_length <= 0 and not phonetic_names:
+        return None
+
+    names = [
+        re.sub(r"[^\w]", "", name.upper()) for name in merged_df["Entity name"].to_list()
+    ]
+    row_keys = [[] for _ in names]
+    for column in blocking_columns:
+        for keys, value in zip(row_keys, merged_df[column].to_list(), strict=True):
+            if value is None:
+                continue
+            value = str(value).strip().upper()
+            if value not in ("", "NAN", "NONE"):
+                keys.append(f"{column}={value}")
+    for keys, name in zip(row_keys, names, strict=True):
+        if name_prefix_length > 0 and name:
+            keys.append(f"name_prefix={name[:name_prefix_length]}")
+        if phonetic_names and name:
+            keys.append(f"name_soundex={soundex(name)}")
+    return row_keys
+
+
+def _normalize_embeddings(embeddings) -> np.ndarray:
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return matrix / norms
+
+
+def _closest_hits(hit_queries, hit_positions, hit_sims, n_neighbors):
+    # Sort by query, then closest first, and keep the first n_neighbors of each query
+    order = np.lexsort((hit_positions, -hit_sims, hit_queries))
+    hit_queries = hit_queries[order]
+    hit_positions = hit_positions[order]
+    hit_sims = hit_sims[order]
+    _, starts, counts = np.unique(hit_queries, return_index=True, return_counts=True)
+    ranks = np.arange(len(hit_queries)) - np.repeat(starts, counts)
+    keep = ranks < n_neighbors
+    return hit_queries[keep], hit_positions[keep], hit_sims[keep]
+
+
+def _batch_neighbors(
+    matrix: np.ndarray,
+    rows: np.ndarray,
+    query_start: int,
+    query_end: int,
+    n_neighbors: int,
+    max_record_distance: float,
+    corpus_batch_size: int,
+) -> list[tuple[int, list[tuple[float, int]]]]:
+    """The closest rows within the block to each query in rows[query_start:query_end]."""
+    queries = matrix[rows[query_start:query_end]]
+    min_sim = np.float32(1 - max_record_distance)
+    hit_queries = np.empty(0, dtype=np.int64)
+    hit_positions = np.empty(0, dtype=np.int64)
+    hit_sims = np.empty(0, dtype=np.float32)
+    for corpus_start in range(0, len(rows), corpus_batch_size):
+        corpus_end = min(corpus_start + corpus_batch_size, len(rows))
+        sims = queries @ matrix[rows[corpus_start:corpus_end]].T
+        # Only pairs within the distance threshold are kept, so most slices add little
+        query_ix, corpus_ix = np.nonzero(sims >= min_sim)
+        positions = corpus_ix + corpus_start
+        # A record is never its own candidate
+        not_self = positions != query_ix + query_start
+        hit_queries = np.concatenate([hit_queries, query_ix[not_self]])
+        hit_positions = np.concatenate([hit_positions, positions[not_self]])
+        hit_sims = np.concatenate([hit_sims, sims[query_ix, corpus_ix][not_self]])
+        if len(hit_queries) > n_neighbors * len(queries):
+            hit_queries, hit_positions, hit_sims = _closest_hits(
+                hit_queries, hit_positions, hit_sims, n_neighbors
+            )
+    hit_queries, hit_positions, hit_sims = _closest_hits(
+        hit_queries, hit_positions, hit_sims, n_neighbors
+    )
+
+    results = []
+    _, starts, counts = np.unique(hit_queries, return_index=True, return_counts=True)
+    for start, count in zip(starts.tolist(), counts.tolist(), strict=True):
+        group = slice(start, start + count)
+        neighbors = list(
+            zip(
+                (1 - hit_sims[group]).tolist(),
+                rows[hit_positions[group]].tolist(),
+                strict=True,
+            )
+        )
+        results.append((int(rows[query_start + hit_queries[start]]), neighbors))
+    return results
+
+
+def build_candidate_near_map(
+    embeddings,
+    max_record_distance: float | None = DEFAULT_MAX_RECORD_DISTANCE,
+    n_neighbors: int = DEFAULT_NEAREST_NEIGHBORS,
+    blocking_keys: list[list[str]] | None = None,
+    query_batch_size: int = DEFAULT_KNN_QUERY_BATCH_SIZE,
+    corpus_batch_size: int = DEFAULT_KNN_CORPUS_BATCH_SIZE,
+    max_workers: int | None = None,
 ) -> defaultdict[Any, list]:
-    near_map = defaultdict(list)
+    """
+    Candidate pairs for matching: for each record, up to `n_neighbors - 1` other
+    records within `max_record_distance` cosine distance, closest first. Exact
+    cosine kNN run in query batches against corpus slices, so memory stays bounded
+    by the batch sizes, with batches spread over a thread pool.
+
+    Every record is compared with every other record in its block, so the work
+    grows with the square of the largest block. Without blocking keys the whole
+    dataset is one block; large datasets need blocking keys that keep blocks small.
+    """
+    if max_record_distance is None:
+        max_record_distance = 2.0
+    matrix = _normalize_embeddings(embeddings)
+    num_records = len(matrix)
+    if blocking_keys is None:
+        blocks = [np.arange(num_records)]
+    else:
+        key_to_rows = defaultdict(list)
+        for ix, keys in enumerate(blocking_keys):
+            for key in set(keys):
+                key_to_rows[key].append(ix)
+        blocks = [np.array(rows) for rows in key_to_rows.values() if len(rows) > 1]
+
+    tasks = [
+        (rows, start, min(start + query_batch_size, len(rows)))
+        for rows in blocks
+        for start in range(0, len(rows), query_batch_size)
+    ]
+    k = max(0, n_neighbors - 1)
+    if k == 0 or not tasks:
+        return defaultdict(list)
+
+    def run(task):
+        rows, start, end = task
+        return _batch_neighbors(
+            matrix,
+            rows,
+            start,
+            end,
+            min(k, len(rows) - 1),
+            max_record_distance,
+            corpus_batch_size,
+        )
 
-    for ix in range(len(all_sentences)):
-        n = all_sentences[ix]
-        near_is = indices[ix][1:]
-        near_ds = distances[ix][1:]
-        near_ns = all_sentences[ix]
-        nearest = zip(near_is, near_ds, near_ns, strict=False)
-        for near_i, near_d, near_n in nearest:
-            if near_d <= max_record_distance:
-                near_map[ix].append(near_i)
+    workers = max_workers or min(32, os.cpu_count() or 1)
+    row_to_neighbors = defaultdict(dict)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for results in executor.map(run, tasks):
+            for ix, neighbors in results:
+                found = row_to_neighbors[ix]
+                for distance, neighbor in neighbors:
+                    if distance < found.get(neighbor, np.inf):
+                        found[neighbor] = distance
 
+    near_map = defaultdict(list)
+    for ix in sorted(row_to_neighbors):
+        found = row_to_neighbors[ix]
+        closest = sorted((distance, neighbor) for neighbor, distance in found.items())
+        near_map[ix] = [neighbor for _, neighbor in closest[:k]]
     return near_map
 
 
 def build_sentence_pair_scores(
-    near_map: defaultdict[Any, list], merged_df: pl.DataFrame
+    near_map: defaultdict[Any, list],
+    merged_df: pl.DataFrame,
+    similarity: str | Callable = "jaccard",
 ) -> list:
-    sentence_pair_scores = []
-    for ix, nx_list in near_map.items():
-        ixrec = merged_df.row(ix, named=True)
-        for nx in nx_list:
-            nxrec = merged_df.row(nx, named=True)
-            ixn = ixrec["Entity name"].upper()
-            nxn = nxrec["Entity name"].upper()
-            if ixn == nxn:
-                score = 1
-            else:
-                ixn_c = re.sub(r"[^\w\s]", "", ixn)
-                nxn_c = re.sub(r"[^\w\s]", "", nxn)
-                N = 3
-                igrams = {ixn_c[i : i + N] for i in range(len(ixn_c) - N + 1)}
-                ngrams = {nxn_c[i : i + N] for i in range(len(nxn_c) - N + 1)}
-                inter = len(igrams.intersection(ngrams))
-                union = len(igrams.union(ngrams))
-                score = inter / union if union > 0 else 0
-
-            sentence_pair_scores.append(
-                (
-                    ix,
-                    nx,
-                    score,
-                )
-            )
-    return sentence_pair_scores
+    ix = [ix for ix, nx_list in near_map.items() for _ in nx_list]
+    nx = [nx for nx_list in near_map.values() for nx in nx_list]
+    if not ix:
+        return []
+    scores = score_name_pairs(merged_df["Entity name"].to_list(), ix, nx, similarity)
+    return list(zip(ix, nx, scores.tolist(), strict=True))
+
+
+def _find_group(group_to_parent: dict[int, int], group: int) -> int:
+    root = group
+    while group_to_parent[root] != root:
+        root = group_to_parent[root]
+    # Path compression: point every group on the way straight at the root
+    while group_to_parent[group] != root:
+        group_to_parent[group], group = root, group_to_parent[group]
+    return root
 
 
 def build_matches(
@@ -122,10 +275,14 @@ def build_matches(
     sentence_pair_jaccard_threshold: float = DEFAULT_SENTENCE_PAIR_JACCARD_THRESHOLD,
 ) -> tuple[dict, set, dict]:
     entity_to_group = {}
+    group_to_parent = {}
     group_id = 0
-    matches = set()
+    matched_rows = set()
     pair_to_match = {}
 
+    names = merged_df["Entity name"].to_list()
+    datasets = merged_df["Dataset"].to_list()
+
     for ix, nx, score in sorted(
         sentence_pair_scores,
         key=lambda x: x[2],
@@ -134,23 +291,14 @@ def build_matches(
         if score < sentence_pair_jaccard_threshold:
             continue
 
-        ixrec = merged_df.row(ix, named=True)
-        nxrec = merged_df.row(nx, named=True)
-        ixn = ixrec["Entity name"]
-        nxn = nxrec["Entity name"]
-        ixp = ixrec["Dataset"]
-        nxp = nxrec["Dataset"]
-
-        ix_id = f"{ixn}::{ixp}"
-        nx_id = f"{nxn}::{nxp}"
+        ix_id = f"{names[ix]}::{datasets[ix]}"
+        nx_id = f"{names[nx]}::{datasets[nx]}"
 
         if ix_id in entity_to_group and nx_id in entity_to_group:
-            ig = entity_to_group[ix_id]
-            ng = entity_to_group[nx_id]
+            ig = _find_group(group_to_parent, entity_to_group[ix_id])
+            ng = _find_group(group_to_parent, entity_to_group[nx_id])
             if ig != ng:
-                for k, v in list(entity_to_group.items()):
-                    if v == ig:
-                        entity_to_group[k] = ng
+                group_to_parent[ig] = ng
         elif ix_id in entity_to_group:
             entity_to_group[nx_id] = entity_to_group[ix_id]
         elif nx_id in entity_to_group:
@@ -158,12 +306,23 @@ def build_matches(
         else:
             entity_to_group[ix_id] = group_id
             entity_to_group[nx_id] = group_id
+            group_to_parent[group_id] = group_id
             group_id += 1
 
-        matches.add((entity_to_group[ix_id], *list(merged_df.row(ix))))
-        matches.add((entity_to_group[nx_id], *list(merged_df.row(nx))))
+        matched_rows.add(ix)
+        matched_rows.add(nx)
 
         pair_to_match[tuple(sorted([ix_id, nx_id]))] = score
+
+    entity_to_group = {
+        entity: _find_group(group_to_parent, group)
+        for entity, group in entity_to_group.items()
+    }
+    rows = merged_df.rows()
+    matches = {
+        (entity_to_group[f"{names[ix]}::{datasets[ix]}"], *rows[ix])
+        for ix in matched_rows
+    }
     return entity_to_group, matches, pair_to_match
 
 
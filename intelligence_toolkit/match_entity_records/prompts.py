@@ -20,6 +20,18 @@ Group data:
 {data}
 """
 
+evaluation_report_prompt = """\
+Goal: evaluate the overall RELATEDNESS of the records in each record group provided on a scale of 0-10, where 0 is definitively different entities and 10 is definitivly the same entity or entity group (e.g., branches of a company).
+
+Return one evaluation per Group ID, with the Group ID, Relatedness, and a short Explanation.
+
+=== TASK ===
+
+Group data:
+
+{data}
+"""
+
 user_prompt = """\
 Factors indicating unrelatedness: multiple fields having values that are different across grouped records, have no similarity, and are unrelated in the real-world.
 
@@ -41,3 +53,9 @@ list_prompts = {
     "user_prompt": user_prompt,
     "safety_prompt": f"{do_not_harm} {do_not_disrespect_context}",
 }
+
+evaluation_prompts = {
+    "report_prompt": evaluation_report_prompt,
+    "user_prompt": user_prompt,
+    "safety_prompt": f"{do_not_harm} {do_not_disrespect_context}",
+}
@@ -0,0 +1,144 @@
+# Copyright (c) 2024 Microsoft Corporation. All rights reserved.
+# Licensed under the MIT license. See LICENSE file in the project.
+#
+
+import re
+from collections.abc import Callable
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+# Pairs scored per sparse product, to bound memory on large match jobs
+PAIR_BATCH_SIZE = 1_000_000
+
+
+def clean_name(name: str) -> str:
+    return re.sub(r"[^\w\s]", "", name.upper())
+
+
+def _set_matrix(sets: list[set[str]]) -> csr_matrix:
+    """Binary record x element matrix, one row per set."""
+    vocabulary: dict[str, int] = {}
+    indices = []
+    indptr = [0]
+    for elements in sets:
+        indices.extend(vocabulary.setdefault(e, len(vocabulary)) for e in elements)
+        indptr.append(len(indices))
+    return csr_matrix(
+        (np.ones(len(indices), dtype=np.float32), indices, indptr),
+        shape=(len(sets), max(1, len(vocabulary))),
+    )
+
+
+def _set_jaccard(
+    sets: list[set[str]], ix: np.ndarray, nx: np.ndarray
+) -> np.ndarray:
+    matrix = _set_matrix(sets)
+    sizes = np.diff(matrix.indptr)
+    scores = np.zeros(len(ix), dtype=np.float64)
+    for start in range(0, len(ix), PAIR_BATCH_SIZE):
+        batch = slice(start, start + PAIR_BATCH_SIZE)
+        inter = np.asarray(
+            matrix[ix[batch]].multiply(matrix[nx[batch]]).sum(axis=1)
+        ).ravel()
+        union = sizes[ix[batch]] + sizes[nx[batch]] - inter
+        np.divide(inter, union, out=scores[batch], where=union > 0)
+    return scores
+
+
+def trigram_jaccard(names: list[str], ix: np.ndarray, nx: np.ndarray) -> np.ndarray:
+    """Jaccard similarity of the character trigrams of each name."""
+    cleaned = [clean_name(name) for name in names]
+    trigrams = [{c[i : i + 3] for i in range(len(c) - 2)} for c in cleaned]
+    return _set_jaccard(trigrams, ix, nx)
+
+
+def token_set(names: list[str], ix: np.ndarray, nx: np.ndarray) -> np.ndarray:
+    """Jaccard similarity of the words in each name, ignoring order and repeats."""
+    return _set_jaccard([set(clean_name(name).split()) for name in names], ix, nx)
+
+
+def _jaro_winkler(first: str, second: str) -> float:
+    if first == second:
+        return 1.0
+    if not first or not second:
+        return 0.0
+    window = max(0, max(len(first), len(second)) // 2 - 1)
+    first_matched = [False] * len(first)
+    second_matched = [False] * len(second)
+    matches = 0
+    for i, char in enumerate(first):
+        for j in range(max(0, i - window), min(len(second), i + window + 1)):
+            if not second_matched[j] and second[j] == char:
+                first_matched[i] = second_matched[j] = True
+                matches += 1
+                break
+    if matches == 0:
+        return 0.0
+    first_chars = [c for c, m in zip(first, first_matched, strict=True) if m]
+    second_chars = [c for c, m in zip(second, second_matched, strict=True) if m]
+    transpositions = sum(
+        a != b for a, b in zip(first_chars, second_chars, strict=True)
+    ) / 2
+    jaro = (
+        matches / len(first)
+        + matches / len(second)
+        + (matches - transpositions) / matches
+    ) / 3
+    prefix = 0
+    for a, b in zip(first[:4], second[:4], strict=False):
+        if a != b:
+            break
+        prefix += 1
+    return jaro + prefix * 0.1 * (1 - jaro)
+
+
+def jaro_winkler(names: list[str], ix: np.ndarray, nx: np.ndarray) -> np.ndarray:
+    """Jaro-Winkler similarity of each cleaned name, computed once per distinct pair."""
+    cleaned = [clean_name(name) for name in names]
+    cache: dict[tuple[str, str], float] = {}
+    scores = np.empty(len(ix), dtype=np.float64)
+    for k, (i, n) in enumerate(zip(ix.tolist(), nx.tolist(), strict=True)):
+        key = (cleaned[i], cleaned[n])
+        if key[1] < key[0]:
+            key = (key[1], key[0])
+        if key not in cache:
+            cache[key] = _jaro_winkler(*key)
+        scores[k] = cache[key]
+    return scores
+
+
+NAME_SIMILARITY_FUNCTIONS: dict[
+    str, Callable[[list[str], np.ndarray, np.ndarray], np.ndarray]
+] = {
+    "jaccard": trigram_jaccard,
+    "jaro_winkler": jaro_winkler,
+    "token_set": token_set,
+}
+
+
+def score_name_pairs(
+    names: list[str],
+    ix: np.ndarray,
+    nx: np.ndarray,
+    similarity: str | Callable = "jaccard",
+) -> np.ndarray:
+    """
+    Score every candidate pair in one pass. `similarity` is the name of one of
+    NAME_SIMILARITY_FUNCTIONS, or a function taking the record names and the two
+    index arrays and returning one score per pair. Names that match exactly,
+    ignoring case, always score 1.
+    """
+    if isinstance(similarity, str):
+        if similarity not in NAME_SIMILARITY_FUNCTIONS:
+            msg = f"Unknown name similarity: {similarity}"
+            raise ValueError(msg)
+        similarity = NAME_SIMILARITY_FUNCTIONS[similarity]
+    ix = np.asarray(ix, dtype=np.int64)
+    nx = np.asarray(nx, dtype=np.int64)
+    if len(ix) == 0:
+        return np.zeros(0, dtype=np.float64)
+    upper = np.array([name.upper() for name in names], dtype=object)
+    scores = np.asarray(similarity(names, ix, nx), dtype=np.float64)
+    scores[upper[ix] == upper[nx]] = 1
+    return scores
@@ -8,22 +8,28 @@ import pandas as pd
 
 import intelligence_toolkit.AI.utils as utils
 import intelligence_toolkit.query_text_data.answer_builder as answer_builder
+import intelligence_toolkit.query_text_data.config as config
 import intelligence_toolkit.query_text_data.graph_builder as graph_builder
 import intelligence_toolkit.query_text_data.helper_functions as helper_functions
 import intelligence_toolkit.query_text_data.input_processor as input_processor
 import intelligence_toolkit.query_text_data.prompts as prompts
 import intelligence_toolkit.query_text_data.query_rewriter as query_rewriter
 import intelligence_toolkit.query_text_data.relevance_assessor as relevance_assessor
+import intelligence_toolkit.query_text_data.snapshot as snapshot
 import intelligence_toolkit.helpers.document_processor as document_processor
 from intelligence_toolkit.AI.base_embedder import BaseEmbedder
 from intelligence_toolkit.AI.client import OpenAIClient
 from intelligence_toolkit.AI.openai_configuration import OpenAIConfiguration
+from intelligence_toolkit.helpers.constants import CACHE_PATH
 from intelligence_toolkit.query_text_data.classes import (
     AnswerObject,
     ChunkSearchConfig,
+    ChunkVectors,
+    CommunityIndex,
     ProcessedChunks,
 )
 from intelligence_toolkit.query_text_data.commentary import Commentary
+from intelligence_toolkit.query_text_data.vector_index import ChunkVectorIndex
 
 class QueryTextDataStage(Enum):
     """
@@ -70,7 +76,12 @@ class QueryTextData:
         self.stage = QueryTextDataStage.INITIAL
         self.label_to_chunks = None
         self.processed_chunks = None
+        self.concept_graph_params = (25, 2, 2)
         self.cid_to_vector = None
+        self.chunk_vectors = None
+        self._chunk_vectors_source = None
+        self.community_index = None
+        self._community_index_source = None
         self.query = None
         self.expanded_query = None
         self.chunk_search_config = None
@@ -141,9 +152,102 @@ class QueryTextData:
             min_node_degree,
             callbacks=callbacks,
         )
+        self.concept_graph_params = (max_cluster_size, min_edge_weight, min_node_degree)
         self.stage = QueryTextDataStage.CHUNKS_PROCESSED
         return self.processed_chunks
 
+    async def add_data_from_files(
+        self,
+        input_files: list[str],
+        chunk_size: int = 1000,
+        callbacks: list = [],
+        drift_threshold: float = config.community_drift_threshold,
+    ) -> list[int]:
+        """
+        Add files to an existing corpus, processing and embedding only the new chunks.
+
+        Args:
+            input_files (list[str]): The list of input files
+            chunk_size (int): The chunk size
+            callbacks (list): The list of callbacks
+            drift_threshold (float): The share of concepts without a community that triggers recomputing communities
+
+        Returns:
+            list[int]: The new chunk IDs
+        """
+        label_to_chunks = document_processor.convert_files_to_chunks(
+            input_files, chunk_size=chunk_size, callbacks=callbacks
+        )
+        return await self.add_text_chunks(label_to_chunks, callbacks, drift_threshold)
+
+    async def add_text_chunks(
+        self,
+        label_to_chunks: dict[str, list[str]],
+        callbacks: list = [],
+        drift_threshold: float = config.community_drift_threshold,
+    ) -> list[int]:
+        """
+        Add chunked files to an existing corpus. Concepts are extracted and embeddings
+        computed for the new chunks only, and the processed chunks are updated in
+        place. Labels already in the corpus are skipped.
+
+        Args:
+            label_to_chunks (dict[str, list[str]]): The label to chunks mapping of the new files
+            callbacks (list): The list of callbacks
+            drift_threshold (float): The share of concepts without a community that triggers recomputing communities
+
+        Returns:
+            list[int]: The new chunk IDs
+        """
+        if self.label_to_chunks is None:
+            self.label_to_chunks = defaultdict(list)
+        new_label_to_chunks = {
+            label: chunks
+            for label, chunks in label_to_chunks.items()
+            if label not in self.label_to_chunks
+        }
+        self.label_to_chunks.update(new_label_to_chunks)
+        if self.processed_chunks is None:
+            self.stage = QueryTextDataStage.CHUNKS_CREATED
+            return []
+
+        max_cluster_size, min_edge_weight, min_node_degree = self.concept_graph_params
+        new_cids, _ = input_processor.update_processed_chunks(
+            self.processed_chunks,
+            new_label_to_chunks,
+            max_cluster_size,
+            min_edge_weight,
+            min_node_degree,
+            drift_threshold=drift_threshold,
+            callbacks=callbacks,
+        )
+        # Indexes over the processed chunks are rebuilt on next use
+        self._community_index_source = None
+        self.level_to_label_to_network = None
+
+        if self.cid_to_vector is not None and len(new_cids) > 0:
+            new_vectors = await helper_functions.embed_texts(
+                {cid: self.processed_chunks.cid_to_text[cid] for cid in new_cids},
+                self.text_embedder,
+                cache_data=self.embedding_cache,
+                callbacks=callbacks,
+            )
+            self.cid_to_vector.update(new_vectors)
+            if isinstance(self.chunk_vectors, ChunkVectorIndex):
+                index = self.chunk_vectors
+                # Only the new chunks are written to the corpus table
+                self.create_vector_index(
+                    index.db_path,
+                    candidates=index.candidates,
+                    nprobes=index.nprobes,
+                    refine_factor=index.refine_factor,
+                    min_rows=index.min_rows,
+                    name=index.name,
+                )
+            else:
+                self._chunk_vectors_source = None
+        return new_cids
+
     async def embed_text_chunks(self, callbacks: list = []) -> dict[int, list[float]]:
         """
         Embed text chunks.
@@ -160,9 +264,64 @@ class QueryTextData:
             cache_data=self.embedding_cache,
             callbacks=callbacks,
         )
+        self.chunk_vectors = self._get_chunk_vectors()
         self.stage = QueryTextDataStage.CHUNKS_EMBEDDED
         return self.cid_to_vector
 
+    def create_vector_index(
+        self,
+        db_path: str = CACHE_PATH,
+        candidates: int = config.vector_index_candidates,
+        nprobes: int = config.vector_index_nprobes,
+        refine_factor: int = config.vector_index_refine_factor,
+        min_rows: int = config.vector_index_min_rows,
+        name: str = config.vector_index_table,
+    ) -> ChunkVectorIndex:
+        """
+        Build an approximate nearest-neighbour index over the embedded chunks, or reopen
+        and extend the one persisted for this corpus, and use it for chunk search instead
+        of exhaustive ranking. Rows are keyed by chunk text and embedding model, so
+        reopening does not read the vectors back.
+
+        Args:
+            db_path (str): The LanceDB directory, shared with the embedding cache by default
+            candidates (int): How many of the closest chunks each query considers
+            nprobes (int): How many index partitions each query searches
+            refine_factor (int): How many extra candidates are re-ranked exactly
+            min_rows (int): Corpora smaller than this are searched exhaustively
+            name (str): The corpus table name
+
+        Returns:
+            ChunkVectorIndex: The chunk vector index
+        """
+        cid_to_key = None
+        text_embedder = getattr(self, "text_embedder", None)
+        if self.processed_chunks is not None and text_embedder is not None:
+            cid_to_key = {
+                cid: f"{text_embedder.model}:"
+                + utils.hash_text(self.processed_chunks.cid_to_text[cid])
+                for cid in self.cid_to_vector
+            }
+        self.chunk_vectors = ChunkVectorIndex(
+            self.cid_to_vector,
+            db_path,
+            candidates=candidates,
+            nprobes=nprobes,
+            refine_factor=refine_factor,
+            min_rows=min_rows,
+            cid_to_key=cid_to_key,
+            name=name,
+        )
+        self._chunk_vectors_source = self.cid_to_vector
+        return self.chunk_vectors
+
+    def _get_chunk_vectors(self) -> ChunkVectors | ChunkVectorIndex:
+        # Built once per set of embeddings and reused by every query, as is the community index
+        if self.chunk_vectors is None or self._chunk_vectors_source is not self.cid_to_vector:
+            self.chunk_vectors = ChunkVectors(self.cid_to_vector)
+            self._chunk_vectors_source = self.cid_to_vector
+        return self.chunk_vectors
+
     async def anchor_query_to_concepts(
         self, query: str, top_concepts: int = 100
     ) -> str:
@@ -212,6 +371,10 @@ class QueryTextData:
             analysis_callback,
             commentary_callback
         )
+        self.chunk_vectors = self._get_chunk_vectors()
+        if self._community_index_source is not self.processed_chunks:
+            self.community_index = CommunityIndex(self.processed_chunks)
+            self._community_index_source = self.processed_chunks
         (
             self.relevant_cids,
             self.search_summary,
@@ -226,6 +389,8 @@ class QueryTextData:
             chunk_progress_callback=chunk_progress_callback,
             chunk_callback=chunk_callback,
             commentary=self.commentary,
+            chunk_vectors=self.chunk_vectors,
+            community_index=self.community_index,
         )
         self.stage = QueryTextDataStage.CHUNKS_MINED
         return self.relevant_cids, self.search_summary
@@ -322,13 +487,57 @@ class QueryTextData:
     def import_chunks_from_str(self, data: str) -> None:
         chunks_df = pd.read_csv(data)
         data_imported = defaultdict(list)
-        for _, row in chunks_df.iterrows():
-            key = row["file_name"]
-            row_data = row["text_to_label_str"]
+        for key, row_data in zip(
+            chunks_df["file_name"], chunks_df["text_to_label_str"]
+        ):
             data_imported[key].append(row_data)
 
         self.label_to_chunks = data_imported
 
+    def save_snapshot(self, path: str) -> None:
+        """
+        Save the processed chunks, embeddings and community structure, so a later
+        session can reopen the corpus without reprocessing it.
+
+        Args:
+            path (str): The snapshot directory
+        """
+        snapshot.save_snapshot(
+            path,
+            snapshot.Snapshot(
+                self.processed_chunks,
+                cid_to_vector=self.cid_to_vector,
+                label_to_chunks=self.label_to_chunks,
+                metadata={"concept_graph_params": list(self.concept_graph_params)},
+            ),
+        )
+
+    def load_snapshot(self, path: str) -> ProcessedChunks:
+        """
+        Reopen a corpus saved with `save_snapshot`. Embeddings are memory-mapped
+        rather than read into memory, and chunks are ranked over the mapped matrix.
+
+        Args:
+            path (str): The snapshot directory
+
+        Returns:
+            ProcessedChunks: The processed chunks
+        """
+        loaded = snapshot.load_snapshot(path)
+        self.reset_workflow()
+        self.processed_chunks = loaded.processed_chunks
+        self.label_to_chunks = loaded.label_to_chunks
+        self.cid_to_vector = loaded.cid_to_vector
+        if "concept_graph_params" in loaded.metadata:
+            self.concept_graph_params = tuple(loaded.metadata["concept_graph_params"])
+        if self.cid_to_vector is not None:
+            self.chunk_vectors = loaded.chunk_vectors
+            self._chunk_vectors_source = self.cid_to_vector
+            self.stage = QueryTextDataStage.CHUNKS_EMBEDDED
+        else:
+            self.stage = QueryTextDataStage.CHUNKS_PROCESSED
+        return self.processed_chunks
+
     async def generate_analysis_commentary(self) -> None:
         return await self.commentary.generate_commentary()
 
@@ -1,8 +1,11 @@
 # Copyright (c) 2024 Microsoft Corporation. All rights reserved.
 # Licensed under the MIT license. See LICENSE file in the project.
 
+from collections import defaultdict
+
 import networkx as nx
 import graspologic as gc
+import numpy as np
 
 class ProcessedChunks:
     def __init__(
@@ -18,7 +21,8 @@ class ProcessedChunks:
         next_cid: dict[int, int],
         period_to_cids: dict[str, list[int]],
         node_period_counts: dict[str, dict[str, int]],
-        edge_period_counts: dict[tuple[str, str], dict[str, int]]
+        edge_period_counts: dict[tuple[str, str], dict[str, int]],
+        inferred_concepts: set[str] | None = None,
     ):
         """
         Represents the results of processing text chunks into concepts and communities.
@@ -36,6 +40,7 @@ class ProcessedChunks:
             period_to_cids (dict[str, list[int]]): A dictionary of period to chunk IDs
             node_period_counts (dict[str, dict[str, int]]): A dictionary of period to node to count
             edge_period_counts (dict[tuple[str, str], dict[str, int]]): A dictionary of period to edge to count
+            inferred_concepts (set[str] | None): Concepts added to the communities by their neighbours since detection
         """
         self.cid_to_text = cid_to_text
         self.text_to_cid = text_to_cid
@@ -49,10 +54,220 @@ class ProcessedChunks:
         self.period_to_cids = period_to_cids
         self.node_period_counts = node_period_counts
         self.edge_period_counts = edge_period_counts
+        self.inferred_concepts = inferred_concepts if inferred_concepts is not None else set()
 
     def __repr__(self):
         return f"ProcessedChunks(num_chunks={len(self.cid_to_text.keys())})"
     
+class ChunkVectors:
+    def __init__(self, cid_to_vector: dict[int, list[float]]) -> None:
+        """
+        Chunk embeddings held as one float32 matrix with the inverse norm of each
+        row, so a query is ranked against every chunk by cosine similarity with a
+        single matrix-vector product.
+
+        Args:
+            cid_to_vector (dict[int, list[float]]): A dictionary of chunk ID to vector
+        """
+        cids = np.array(sorted(cid_to_vector.keys()), dtype=np.int64)
+        if len(cids) == 0:
+            matrix = np.zeros((0, 0), dtype=np.float32)
+        else:
+            matrix = np.stack(
+                [np.asarray(cid_to_vector[cid], dtype=np.float32) for cid in cids]
+            )
+        self._set_matrix(cids, matrix)
+
+    @classmethod
+    def from_matrix(cls, cids: np.ndarray, matrix: np.ndarray) -> "ChunkVectors":
+        """
+        Rank over an existing matrix without copying it, such as one memory-mapped
+        from a snapshot. Only the row norms are computed.
+
+        Args:
+            cids (np.ndarray): The chunk IDs of the matrix rows, in ascending order
+            matrix (np.ndarray): The float32 chunk embeddings, one row per chunk
+
+        Returns:
+            ChunkVectors: The chunk vectors
+        """
+        chunk_vectors = cls.__new__(cls)
+        chunk_vectors._set_matrix(np.asarray(cids, dtype=np.int64), matrix)
+        return chunk_vectors
+
+    def _set_matrix(self, cids: np.ndarray, matrix: np.ndarray) -> None:
+        # Rows are left as stored and scaled after the product, so the matrix is
+        # never rewritten
+        self.cids = cids
+        self.matrix = matrix
+        norms = np.linalg.norm(matrix, axis=1) if len(cids) > 0 else np.zeros(0)
+        norms[norms == 0] = 1
+        self.inverse_norms = (1 / norms).astype(np.float32)
+
+    def rank(self, query_vector, exclude=()) -> list[int]:
+        """
+        Rank chunk IDs by cosine distance to the query, closest first.
+
+        Args:
+            query_vector: The query embedding
+            exclude: Chunk IDs to leave out of the ranking
+
+        Returns:
+            list[int]: The ranked chunk IDs; ties keep chunk ID order
+        """
+        if len(self.cids) == 0:
+            return []
+        query_vector = np.asarray(query_vector, dtype=np.float32)
+        norm = np.linalg.norm(query_vector)
+        similarities = (
+            self.matrix @ (query_vector / norm if norm > 0 else query_vector)
+        ) * self.inverse_norms
+        order = np.argsort(-similarities, kind="stable")
+        ranked = self.cids[order].tolist()
+        if len(exclude) > 0:
+            exclude = set(exclude)
+            ranked = [cid for cid in ranked if cid not in exclude]
+        return ranked
+
+    def __len__(self):
+        return len(self.cids)
+
+    def __repr__(self):
+        return f"ChunkVectors(num_chunks={len(self.cids)})"
+
+
+class CommunityIndex:
+    def __init__(self, processed_chunks: ProcessedChunks) -> None:
+        """
+        Query-independent chunk-to-community structure for each community level,
+        stored as (chunk, community) pair arrays so every query can rank
+        communities with array operations.
+
+        Args:
+            processed_chunks (ProcessedChunks): The processed chunks
+        """
+        concept_to_level_to_community = defaultdict(dict)
+        self.community_to_parent = {}
+        for hc in processed_chunks.hierarchical_communities:
+            concept_to_level_to_community[hc.node][hc.level] = (
+                processed_chunks.community_to_label[hc.cluster]
+            )
+            if hc.parent_cluster is not None:
+                self.community_to_parent[
+                    processed_chunks.community_to_label[hc.cluster]
+                ] = processed_chunks.community_to_label[hc.parent_cluster]
+        max_level = max(
+            [hc.level for hc in processed_chunks.hierarchical_communities], default=-1
+        )
+
+        self.cids = np.array(sorted(processed_chunks.cid_to_concepts.keys()), dtype=np.int64)
+        cid_to_index = {cid: ix for ix, cid in enumerate(self.cids.tolist())}
+        # level -> (community labels in first-seen order, pair chunk indices, pair community codes)
+        self.level_to_pairs = {}
+        for level in range(0, max_level + 1):
+            community_codes = {}
+            pairs = set()
+            pair_cids = []
+            pair_codes = []
+            for cid, concepts in processed_chunks.cid_to_concepts.items():
+                for concept in concepts:
+                    level_to_community = concept_to_level_to_community.get(concept)
+                    if level_to_community is None:
+                        continue
+                    if level in level_to_community:
+                        community = level_to_community[level]
+                    elif level - 1 in level_to_community:
+                        # use the community from the previous level
+                        community = level_to_community[level - 1]
+                    else:
+                        continue
+                    code = community_codes.setdefault(community, len(community_codes))
+                    if (cid, code) not in pairs:
+                        pairs.add((cid, code))
+                        pair_cids.append(cid_to_index[cid])
+                        pair_codes.append(code)
+            self.level_to_pairs[level] = (
+                list(community_codes.keys()),
+                np.array(pair_cids, dtype=np.int64),
+                np.array(pair_codes, dtype=np.int64),
+            )
+
+    def rank(
+        self, semantic_search_cids: list[int], community_ranking_chunks: int
+    ) -> tuple[dict[int, list[str]], dict[int, dict[str, list[int]]]]:
+        """
+        Order communities at each level by the mean semantic rank of their best
+        chunks, and assign each chunk to its highest-ranked community.
+
+        Args:
+            semantic_search_cids (list[int]): Chunk IDs in semantic rank order
+            community_ranking_chunks (int): How many chunks to use to rank each community
+
+        Returns:
+            tuple: level to community sequence, and level to community to chunk IDs in rank order
+        """
+        ranked = np.asarray(semantic_search_cids, dtype=np.int64)
+        num_ranked = len(ranked)
+        rank_of = np.full(len(self.cids), -1, dtype=np.int64)
+        if num_ranked > 0 and len(self.cids) > 0:
+            positions = np.searchsorted(self.cids, ranked).clip(max=len(self.cids) - 1)
+            indexed = self.cids[positions] == ranked
+            rank_of[positions[indexed]] = np.flatnonzero(indexed)
+
+        level_to_community_sequence = {}
+        level_to_community_to_cids = defaultdict(lambda: defaultdict(list))
+        for level, (communities, pair_cids, pair_codes) in self.level_to_pairs.items():
+            pair_ranks = rank_of[pair_cids]
+            ranked_pairs = pair_ranks >= 0
+            pair_ranks = pair_ranks[ranked_pairs]
+            pair_codes = pair_codes[ranked_pairs]
+
+            # Mean of each community's best ranks; communities without ranked chunks go last.
+            # Pairs are unique, so one sort on a packed (community, rank) key groups them.
+            order = np.argsort(pair_codes * num_ranked + pair_ranks)
+            sorted_codes = pair_codes[order]
+            group_starts = np.flatnonzero(np.diff(sorted_codes, prepend=-1))
+            group_sizes = np.diff(group_starts, append=len(order))
+            within_group = np.arange(len(order)) - np.repeat(group_starts, group_sizes)
+            best = within_group < community_ranking_chunks
+            totals = np.bincount(
+                sorted_codes[best],
+                weights=pair_ranks[order][best],
+                minlength=len(communities),
+            )
+            counts = np.bincount(sorted_codes[best], minlength=len(communities))
+            with np.errstate(invalid="ignore", divide="ignore"):
+                mean_ranks = totals / counts
+            sequence_codes = np.argsort(mean_ranks, kind="stable")
+            level_to_community_sequence[level] = [
+                communities[code] for code in sequence_codes
+            ]
+
+            # Each chunk goes to its earliest community in the sequence
+            position = np.empty(len(communities), dtype=np.int64)
+            position[sequence_codes] = np.arange(len(communities))
+            pair_positions = position[pair_codes]
+            order = np.argsort(pair_ranks * len(communities) + pair_positions)
+            sorted_ranks = pair_ranks[order]
+            first = np.diff(sorted_ranks, prepend=-1) != 0
+            assigned_ranks = sorted_ranks[first]
+            assigned_positions = pair_positions[order][first]
+            order = np.argsort(assigned_positions * num_ranked + assigned_ranks)
+            assigned_ranks = assigned_ranks[order]
+            assigned_positions = assigned_positions[order]
+            splits = np.flatnonzero(np.diff(assigned_positions)) + 1
+            community_to_cids = level_to_community_to_cids[level]
+            for start, end in zip(
+                np.concatenate(([0], splits)),
+                np.concatenate((splits, [len(assigned_ranks)])),
+            ):
+                if start == end:
+                    continue
+                community = communities[sequence_codes[assigned_positions[start]]]
+                community_to_cids[community] = ranked[assigned_ranks[start:end]].tolist()
+        return level_to_community_sequence, level_to_community_to_cids
+
+
 class ChunkSearchConfig:
     def __init__(
         self,
@@ -2,3 +2,23 @@
 # Licensed under the MIT license. See LICENSE file in the project.
 
 cache_name = "query_text_data"
+
+# Approximate nearest-neighbour chunk search
+vector_index_candidates = 5000
+vector_index_nprobes = 32
+vector_index_refine_factor = 5
+# Smaller corpora are searched exhaustively, which is already fast
+vector_index_min_rows = 50000
+# One table per corpus; chunks added later are appended, and the index is
+# retrained once this share of the rows is not yet in it
+vector_index_table = "chunks"
+vector_index_retrain_share = 0.2
+
+# Noun-phrase extraction fans out to worker processes in batches of chunks;
+# smaller inputs are not worth the process start-up cost
+concept_extraction_batch_size = 100
+concept_extraction_min_parallel_chunks = 1000
+
+# Appending files recomputes concept communities once more than this share of
+# graph concepts has no community
+community_drift_threshold = 0.1
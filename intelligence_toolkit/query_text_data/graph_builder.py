@@ -2,12 +2,13 @@
 # Licensed under the MIT license. See LICENSE file in the project.
 
 import re
-from collections import defaultdict
+from collections import Counter, defaultdict
 
 import nltk
 import numpy as np
 import networkx as nx
 from graspologic import partition
+from graspologic.partition import HierarchicalClusters
 from nltk.data import find
 from textblob import TextBlob
 
@@ -49,8 +50,16 @@ def prepare_concept_graphs(period_concept_graphs, max_cluster_size, min_edge_wei
     hierarchical_communities, community_to_label = (
         detect_concept_communities(period_concept_graphs["ALL"], max_cluster_size)
     )
+    apply_concept_communities(period_concept_graphs, hierarchical_communities)
+    return hierarchical_communities, community_to_label
+
+
+def apply_concept_communities(period_concept_graphs, hierarchical_communities):
     if hierarchical_communities is not None:
         concept_to_community = hierarchical_communities.final_level_hierarchical_clustering()
+        concept_to_community.update(
+            infer_concept_communities(period_concept_graphs["ALL"], concept_to_community)
+        )
         for period, G in period_concept_graphs.items():
             for node in list(G.nodes()):
                 if node not in concept_to_community:
@@ -60,8 +69,77 @@ def prepare_concept_graphs(period_concept_graphs, max_cluster_size, min_edge_wei
                 G.add_edge(highest_degree_node, 'dummynode', weight=1)
             for node, data in G.nodes(data=True):
                 data['community'] = concept_to_community[node] if node in concept_to_community else -1
-    
-    return hierarchical_communities, community_to_label
+
+
+def infer_concept_communities(G, concept_to_community):
+    """
+    Fit concepts added since communities were detected into the existing ones.
+    Each takes the most common community among its neighbours that have one,
+    in rounds outward from the detected concepts, or -1 if it is not connected
+    to any of them.
+    """
+    known = dict(concept_to_community)
+    pending = [
+        node for node in G.nodes() if node != "dummynode" and node not in known
+    ]
+    inferred = {}
+    while len(pending) > 0:
+        assigned = {}
+        for node in pending:
+            neighbour_communities = Counter(
+                known[neighbour]
+                for neighbour in G.neighbors(node)
+                if neighbour != "dummynode" and neighbour in known
+            )
+            if len(neighbour_communities) > 0:
+                assigned[node] = neighbour_communities.most_common(1)[0][0]
+        if len(assigned) == 0:
+            break
+        known.update(assigned)
+        inferred.update(assigned)
+        pending = [node for node in pending if node not in assigned]
+    inferred.update({node: -1 for node in pending})
+    return inferred
+
+
+def extend_concept_communities(hierarchical_communities, concept_to_community):
+    """
+    Add inferred concepts to the hierarchical communities. Each copies the entries
+    of a detected member of its community, so it takes the same community, parent
+    chain and level at every level of the hierarchy. Concepts inferred as -1 are
+    left out.
+    """
+    node_to_entries = defaultdict(list)
+    community_to_member = {}
+    for hc in hierarchical_communities:
+        node_to_entries[hc.node].append(hc)
+        if hc.is_final_cluster:
+            community_to_member.setdefault(hc.cluster, hc.node)
+    added = [
+        hc._replace(node=concept)
+        for concept, community in concept_to_community.items()
+        if community in community_to_member
+        for hc in node_to_entries[community_to_member[community]]
+    ]
+    if len(added) == 0:
+        return hierarchical_communities
+    return HierarchicalClusters([*hierarchical_communities, *added])
+
+
+def concept_community_drift(G, hierarchical_communities, inferred_concepts=()):
+    """
+    Share of the concepts in a prepared concept graph that have no detected
+    community yet, counting concepts whose community was only inferred.
+    """
+    concepts = [node for node in G.nodes() if node != "dummynode"]
+    if len(concepts) == 0:
+        return 0.0
+    if hierarchical_communities is None or len(hierarchical_communities) == 0:
+        return 1.0
+    clustered = {hc.node for hc in hierarchical_communities}.difference(
+        inferred_concepts
+    )
+    return sum(1 for node in concepts if node not in clustered) / len(concepts)
     
 def build_meta_graph(G, hierarchical_communities):
     level_to_communities = {}
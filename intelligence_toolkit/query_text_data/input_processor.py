@@ -2,13 +2,18 @@
 # Licensed under the MIT license. See LICENSE file in the project.
 
 import io
+import math
+import multiprocessing
+import os
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from enum import Enum
 from json import dumps, loads
 
 import networkx as nx
 
+import intelligence_toolkit.query_text_data.config as config
 import intelligence_toolkit.query_text_data.graph_builder as graph_builder
 from intelligence_toolkit.AI.text_splitter import TextSplitter
 from intelligence_toolkit.query_text_data.classes import ProcessedChunks
@@ -70,53 +75,13 @@ def process_json_texts(file_to_text_jsons, period: PeriodOption):
     return file_to_chunks
 
 
-def process_chunks(
-    file_to_chunks, max_cluster_size, min_edge_weight, min_node_degree, callbacks=[]
-):
-    period_concept_graphs = defaultdict(nx.Graph)
-    period_concept_graphs["ALL"] = nx.Graph()
+def _count_chunk_concepts(batch):
+    """Extract the concepts of (cid, periods, chunk) items into partial counts."""
     node_period_counts = defaultdict(lambda: defaultdict(int))
     edge_period_counts = defaultdict(lambda: defaultdict(int))
-    previous_chunk = {}
-    next_chunk = {}
     concept_to_cids = defaultdict(list)
-    cid_to_concepts = defaultdict(list)
-    period_to_cids = defaultdict(list)
-    file_cids = []
-    cid_to_text = {}
-    text_to_cid = {}
-    chunk_id = 1
-    file_to_cids = defaultdict(list)
-    for file, chunks in file_to_chunks.items():
-        for chunk in chunks:
-            cid_to_text[chunk_id] = chunk
-            text_to_cid[chunk] = chunk_id
-            file_to_cids[file].append(chunk_id)
-            chunk_id += 1
-    for file, cids in file_to_cids.items():
-        for cx, cid in enumerate(cids):
-            file_cids.append((file, cid))
-            if cx > 0:
-                previous_chunk[cid] = cid - 1
-            if cx < len(chunks) - 1:
-                next_chunk[cid] = cid + 1
-    for cx, (file, cid) in enumerate(file_cids):
-        for cb in callbacks:
-            cb.on_batch_change(cx + 1, len(file_cids))
-        period = None
-        chunk = cid_to_text[cid]
-        try:
-            chunk_json = loads(chunk)
-            if "period" in chunk_json:
-                period = chunk_json["period"]
-        except Exception as e:
-            print(e)
-            pass
-        periods = ["ALL"]
-        period_to_cids["ALL"].append(cid)
-        if period is not None:
-            periods.append(period)
-            period_to_cids[period].append(cid)
+    cid_to_concepts = {}
+    for cid, periods, chunk in batch:
         graph_builder.update_concept_graph_edges(
             node_period_counts,
             edge_period_counts,
@@ -126,36 +91,339 @@ def process_chunks(
             concept_to_cids,
             cid_to_concepts,
         )
+    # Plain dicts so the counts can be returned from a worker process
+    return (
+        {node: dict(counts) for node, counts in node_period_counts.items()},
+        {edge: dict(counts) for edge, counts in edge_period_counts.items()},
+        dict(concept_to_cids),
+        cid_to_concepts,
+    )
+
+
+class ConceptGraphBuilder:
+    def __init__(
+        self,
+        max_workers: int | None = None,
+        batch_size: int = config.concept_extraction_batch_size,
+        min_parallel_chunks: int = config.concept_extraction_min_parallel_chunks,
+    ) -> None:
+        """
+        Accumulates chunks into concept counts as they arrive. Noun-phrase
+        extraction runs in batches across a process pool, and each batch's partial
+        node and edge counts are merged into the running totals.
+
+        Args:
+            max_workers (int | None): The number of worker processes; defaults to the CPU count, 1 runs in-process
+            batch_size (int): The minimum number of chunks per worker task
+            min_parallel_chunks (int): Fewer new chunks than this are processed in-process
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.min_parallel_chunks = min_parallel_chunks
+        self.node_period_counts = defaultdict(lambda: defaultdict(int))
+        self.edge_period_counts = defaultdict(lambda: defaultdict(int))
+        self.previous_cid = {}
+        self.next_cid = {}
+        self.concept_to_cids = defaultdict(list)
+        self.cid_to_concepts = defaultdict(list)
+        self.period_to_cids = defaultdict(list)
+        self.cid_to_text = {}
+        self.text_to_cid = {}
+        self.next_chunk_id = 1
+
+    @classmethod
+    def from_processed_chunks(
+        cls, processed_chunks: ProcessedChunks, max_workers: int | None = None
+    ) -> "ConceptGraphBuilder":
+        """
+        Resume from existing processed chunks, sharing their maps so chunks added
+        to the builder update them in place.
+
+        Args:
+            processed_chunks (ProcessedChunks): The processed chunks
+            max_workers (int | None): The number of worker processes
+
+        Returns:
+            ConceptGraphBuilder: The builder
+        """
+        builder = cls(max_workers)
+        # Maps loaded from elsewhere may be plain dicts; the builder needs defaults
+        for name, factory in (
+            ("concept_to_cids", list),
+            ("cid_to_concepts", list),
+            ("period_to_cids", list),
+        ):
+            values = getattr(processed_chunks, name)
+            if not isinstance(values, defaultdict):
+                values = defaultdict(factory, values)
+                setattr(processed_chunks, name, values)
+            setattr(builder, name, values)
+        for name in ("node_period_counts", "edge_period_counts"):
+            counts = getattr(processed_chunks, name)
+            if not isinstance(counts, defaultdict):
+                nested = defaultdict(lambda: defaultdict(int))
+                for key, period_counts in counts.items():
+                    nested[key] = defaultdict(int, period_counts)
+                counts = nested
+                setattr(processed_chunks, name, counts)
+            setattr(builder, name, counts)
+        builder.cid_to_text = processed_chunks.cid_to_text
+        builder.text_to_cid = processed_chunks.text_to_cid
+        builder.previous_cid = processed_chunks.previous_cid
+        builder.next_cid = processed_chunks.next_cid
+        builder.next_chunk_id = max(processed_chunks.cid_to_text.keys(), default=0) + 1
+        return builder
+
+    def add_chunks(self, file_to_chunks, callbacks=[]) -> list[int]:
+        """
+        Add the chunks of one or more files and count their concepts.
+
+        Args:
+            file_to_chunks (dict[str, list[str]]): The file to chunks mapping
+            callbacks (list): The list of callbacks
+
+        Returns:
+            list[int]: The IDs assigned to the new chunks
+        """
+        new_cids = []
+        for file, chunks in file_to_chunks.items():
+            cids = []
+            for chunk in chunks:
+                cid = self.next_chunk_id
+                self.next_chunk_id += 1
+                self.cid_to_text[cid] = chunk
+                self.text_to_cid[chunk] = cid
+                cids.append(cid)
+            for cx, cid in enumerate(cids):
+                if cx > 0:
+                    self.previous_cid[cid] = cid - 1
+                if cx < len(cids) - 1:
+                    self.next_cid[cid] = cid + 1
+            new_cids.extend(cids)
+
+        items = []
+        for cid in new_cids:
+            period = None
+            chunk = self.cid_to_text[cid]
+            try:
+                chunk_json = loads(chunk)
+                if "period" in chunk_json:
+                    period = chunk_json["period"]
+            except Exception as e:
+                print(e)
+                pass
+            periods = ["ALL"]
+            self.period_to_cids["ALL"].append(cid)
+            if period is not None:
+                periods.append(period)
+                self.period_to_cids[period].append(cid)
+            items.append((cid, periods, chunk))
+
+        done = 0
+        if self.max_workers > 1 and len(items) >= self.min_parallel_chunks:
+            # A few batches per worker keeps progress moving without re-merging
+            # the same concepts from many small partial counts
+            batch_size = max(
+                self.batch_size, math.ceil(len(items) / (self.max_workers * 4))
+            )
+            batches = [
+                items[i : i + batch_size] for i in range(0, len(items), batch_size)
+            ]
+            # Thread pools already running in the caller (Polars, for one) do
+            # not survive a fork, so workers are spawned
+            with ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            ) as executor:
+                for batch, counts in zip(
+                    batches, executor.map(_count_chunk_concepts, batches)
+                ):
+                    self._merge_counts(*counts)
+                    done += len(batch)
+                    for cb in callbacks:
+                        cb.on_batch_change(done, len(items))
+        else:
+            for cid, periods, chunk in items:
+                graph_builder.update_concept_graph_edges(
+                    self.node_period_counts,
+                    self.edge_period_counts,
+                    periods,
+                    chunk,
+                    cid,
+                    self.concept_to_cids,
+                    self.cid_to_concepts,
+                )
+                done += 1
+                for cb in callbacks:
+                    cb.on_batch_change(done, len(items))
+        return new_cids
+
+    def _merge_counts(
+        self, node_period_counts, edge_period_counts, concept_to_cids, cid_to_concepts
+    ) -> None:
+        # Batches arrive in chunk order, so concept chunk lists stay sorted
+        for concept, cids in concept_to_cids.items():
+            self.concept_to_cids[concept].extend(cids)
+        self.cid_to_concepts.update(cid_to_concepts)
+        for counts, partial_counts in (
+            (self.node_period_counts, node_period_counts),
+            (self.edge_period_counts, edge_period_counts),
+        ):
+            for key, period_counts in partial_counts.items():
+                key_counts = counts[key]
+                for period, count in period_counts.items():
+                    key_counts[period] += count
+
+    def concept_graphs(self) -> dict[str, nx.Graph]:
+        """
+        Build the period concept graphs from the counts so far.
+
+        Returns:
+            dict[str, nx.Graph]: The period to concept graph mapping
+        """
+        period_concept_graphs = defaultdict(nx.Graph)
+        period_concept_graphs["ALL"] = nx.Graph()
+        for node, period_counts in self.node_period_counts.items():
+            for period, count in period_counts.items():
+                period_concept_graphs[period].add_node(node, count=count)
+        for edge, period_counts in self.edge_period_counts.items():
+            for period, count in period_counts.items():
+                period_concept_graphs[period].add_edge(edge[0], edge[1], weight=count)
+        return period_concept_graphs
+
+    def build(self, max_cluster_size, min_edge_weight, min_node_degree) -> ProcessedChunks:
+        """
+        Detect concept communities over the chunks added so far.
+
+        Args:
+            max_cluster_size (int): The maximum cluster size
+            min_edge_weight (int): The minimum edge weight
+            min_node_degree (int): The minimum node degree
+
+        Returns:
+            ProcessedChunks: The processed chunks
+        """
+        period_concept_graphs = self.concept_graphs()
+        hierarchical_communities = {}
+        community_to_label = {}
+        if len(period_concept_graphs["ALL"].nodes()) > 0:
+            (hierarchical_communities, community_to_label) = (
+                graph_builder.prepare_concept_graphs(
+                    period_concept_graphs,
+                    max_cluster_size=max_cluster_size,
+                    min_edge_weight=min_edge_weight,
+                    min_node_degree=min_node_degree,
+                )
+            )
+        return ProcessedChunks(
+            cid_to_text=self.cid_to_text,
+            text_to_cid=self.text_to_cid,
+            period_concept_graphs=period_concept_graphs,
+            hierarchical_communities=hierarchical_communities,
+            community_to_label=community_to_label,
+            concept_to_cids=self.concept_to_cids,
+            cid_to_concepts=self.cid_to_concepts,
+            previous_cid=self.previous_cid,
+            next_cid=self.next_cid,
+            period_to_cids=self.period_to_cids,
+            node_period_counts=self.node_period_counts,
+            edge_period_counts=self.edge_period_counts,
+        )
+
 
-    for node, period_counts in node_period_counts.items():
-        for period, count in period_counts.items():
-            period_concept_graphs[period].add_node(node, count=count)
-    for edge, period_counts in edge_period_counts.items():
-        for period, count in period_counts.items():
-            period_concept_graphs[period].add_edge(edge[0], edge[1], weight=count)
+def process_chunks(
+    file_to_chunks,
+    max_cluster_size,
+    min_edge_weight,
+    min_node_degree,
+    callbacks=[],
+    max_workers=None,
+):
+    builder = ConceptGraphBuilder(max_workers)
+    builder.add_chunks(file_to_chunks, callbacks)
+    return builder.build(max_cluster_size, min_edge_weight, min_node_degree)
+
+
+def process_chunk_stream(
+    file_chunk_stream,
+    max_cluster_size,
+    min_edge_weight,
+    min_node_degree,
+    callbacks=[],
+    graph_callback=None,
+    max_workers=None,
+):
+    """
+    Process (file, chunks) pairs as they arrive, e.g. while later files are still
+    being read or chunked. `graph_callback` receives the period concept graphs
+    built from the chunks so far after each file.
+    """
+    builder = ConceptGraphBuilder(max_workers)
+    for file, chunks in file_chunk_stream:
+        builder.add_chunks({file: chunks}, callbacks)
+        if graph_callback is not None:
+            graph_callback(builder.concept_graphs())
+    return builder.build(max_cluster_size, min_edge_weight, min_node_degree)
 
-    hierarchical_communities = {}
-    community_to_label = {}
+
+def update_processed_chunks(
+    processed_chunks,
+    file_to_chunks,
+    max_cluster_size,
+    min_edge_weight,
+    min_node_degree,
+    drift_threshold=config.community_drift_threshold,
+    callbacks=[],
+    max_workers=None,
+):
+    """
+    Add new files to processed chunks in place, extracting concepts only for the
+    new chunks. Concept communities are recomputed only when the share of graph
+    concepts without a detected community exceeds `drift_threshold`; otherwise new
+    concepts join the most common community of their neighbours, and are added to
+    the hierarchical communities so community ranking and networks include them.
+
+    Returns:
+        tuple[list[int], bool]: The new chunk IDs, and whether communities were recomputed
+    """
+    builder = ConceptGraphBuilder.from_processed_chunks(processed_chunks, max_workers)
+    new_cids = builder.add_chunks(file_to_chunks, callbacks)
+    period_concept_graphs = builder.concept_graphs()
+    recomputed = False
     if len(period_concept_graphs["ALL"].nodes()) > 0:
-        (hierarchical_communities, community_to_label) = (
-            graph_builder.prepare_concept_graphs(
-                period_concept_graphs,
-                max_cluster_size=max_cluster_size,
-                min_edge_weight=min_edge_weight,
-                min_node_degree=min_node_degree,
+        graph_builder.prepare_concept_graph(
+            period_concept_graphs["ALL"], min_edge_weight, min_node_degree
+        )
+        hierarchical_communities = processed_chunks.hierarchical_communities
+        drift = graph_builder.concept_community_drift(
+            period_concept_graphs["ALL"],
+            hierarchical_communities,
+            processed_chunks.inferred_concepts,
+        )
+        if drift > drift_threshold:
+            hierarchical_communities, processed_chunks.community_to_label = (
+                graph_builder.detect_concept_communities(
+                    period_concept_graphs["ALL"], max_cluster_size
+                )
             )
+            processed_chunks.inferred_concepts = set()
+            recomputed = True
+        elif hierarchical_communities:
+            # New concepts join their neighbours' communities at every level, so
+            # community ranking and the community networks reach their chunks
+            inferred = graph_builder.infer_concept_communities(
+                period_concept_graphs["ALL"],
+                hierarchical_communities.final_level_hierarchical_clustering(),
+            )
+            hierarchical_communities = graph_builder.extend_concept_communities(
+                hierarchical_communities, inferred
+            )
+            processed_chunks.inferred_concepts.update(
+                concept for concept, community in inferred.items() if community != -1
+            )
+        processed_chunks.hierarchical_communities = hierarchical_communities
+        graph_builder.apply_concept_communities(
+            period_concept_graphs, hierarchical_communities or None
         )
-    return ProcessedChunks(
-        cid_to_text=cid_to_text,
-        text_to_cid=text_to_cid,
-        period_concept_graphs=period_concept_graphs,
-        hierarchical_communities=hierarchical_communities,
-        community_to_label=community_to_label,
-        concept_to_cids=concept_to_cids,
-        cid_to_concepts=cid_to_concepts,
-        previous_cid=previous_chunk,
-        next_cid=next_chunk,
-        period_to_cids=period_to_cids,
-        node_period_counts=node_period_counts,
-        edge_period_counts=edge_period_counts,
-    )
+    processed_chunks.period_concept_graphs = period_concept_graphs
+    return new_cids, recomputed
@@ -3,13 +3,12 @@
 
 import asyncio
 from json import loads
-from collections import defaultdict
 import numpy as np
-import scipy.spatial.distance
 import tiktoken
 import intelligence_toolkit.AI.utils as utils
 import intelligence_toolkit.query_text_data.helper_functions as helper_functions
 import intelligence_toolkit.query_text_data.prompts as prompts
+from intelligence_toolkit.query_text_data.classes import ChunkVectors, CommunityIndex
 
 async def assess_relevance(
     ai_configuration,
@@ -107,13 +106,16 @@ async def detect_relevant_chunks(
     chunk_search_config,
     chunk_progress_callback=None,
     chunk_callback=None,
-    commentary=None
+    commentary=None,
+    chunk_vectors=None,
+    community_index=None,
 ):
     
     test_history = []
-    all_units = sorted(
-        [(cid, vector) for cid, vector in (cid_to_vector.items())], key=lambda x: x[0]
-    )
+    if chunk_vectors is None:
+        chunk_vectors = ChunkVectors(cid_to_vector)
+    if community_index is None:
+        community_index = CommunityIndex(processed_chunks)
 
     yes_id = tiktoken.get_encoding("o200k_base").encode("Yes")[0]
     no_id = tiktoken.get_encoding("o200k_base").encode("No")[0]
@@ -130,92 +132,15 @@ async def detect_relevant_chunks(
         processed_chunks.next_cid,
         chunk_search_config.adjacent_test_steps,
     )
-    cosine_distances = sorted(
-        [
-            (cid, scipy.spatial.distance.cosine(aq_embedding, vector))
-            for (cid, vector) in all_units
-            if cid not in seen
-        ],
-        key=lambda x: x[1],
-        reverse=False,
+    semantic_search_cids = chunk_vectors.rank(aq_embedding, exclude=seen)
+    level_to_community_sequence, level_to_community_to_cids = community_index.rank(
+        semantic_search_cids, chunk_search_config.community_ranking_chunks
     )
-    semantic_search_cids = [x[0] for x in cosine_distances]
-    # print(f"Top semantic search cids: {semantic_search_cids[:100]}")
-    level_to_community_sequence = {}
-    max_level = max([hc.level for hc in processed_chunks.hierarchical_communities])
-    concept_to_level_to_community = defaultdict(dict)
-    level_to_community_to_candidate_cids = defaultdict(lambda: defaultdict(set))
-    level_to_community_to_cids = defaultdict(lambda: defaultdict(list))
-    level_to_cid_to_communities = defaultdict(lambda: defaultdict(set))
-    community_to_parent = {}
-    for hc in processed_chunks.hierarchical_communities:
-        concept_to_level_to_community[hc.node][hc.level] = (
-            processed_chunks.community_to_label[hc.cluster]
-        )
-        if hc.parent_cluster is not None:
-            community_to_parent[processed_chunks.community_to_label[hc.cluster]] = (
-                processed_chunks.community_to_label[hc.parent_cluster]
-            )
-    cid_to_level_to_communities = defaultdict(lambda: defaultdict(set))
-    for level in range(0, max_level + 1):
-        for cid, concepts in processed_chunks.cid_to_concepts.items():
-            for concept in concepts:
-                if concept in concept_to_level_to_community.keys():
-                    if level in concept_to_level_to_community[concept].keys():
-                        community = concept_to_level_to_community[concept][level]
-                        cid_to_level_to_communities[cid][level].add(community)
-                        level_to_cid_to_communities[level][cid].add(community)
-                        level_to_community_to_candidate_cids[level][community].add(cid)
-                    else:
-                        # use the community from the previous level
-                        if level - 1 in concept_to_level_to_community[concept].keys():
-                            community = concept_to_level_to_community[concept][
-                                level - 1
-                            ]
-                            cid_to_level_to_communities[cid][level].add(community)
-                            level_to_cid_to_communities[level][cid].add(community)
-                            level_to_community_to_candidate_cids[level][community].add(
-                                cid
-                            )
-
-        community_sequence = []
-        community_mean_rank = []
-
-        for community, cids in level_to_community_to_candidate_cids[level].items():
-            filtered_cids = [c for c in cids if c in semantic_search_cids]
-            mean_rank = np.mean(
-                sorted([semantic_search_cids.index(c) for c in filtered_cids])[
-                    : chunk_search_config.community_ranking_chunks
-                ]
-            )
-            community_mean_rank.append((community, mean_rank))
-        community_sequence = [
-            x[0] for x in sorted(community_mean_rank, key=lambda x: x[1])
-        ]
-        # print(f"Level {level} community sequence: {community_sequence}")
-        level_to_community_sequence[level] = community_sequence
-
-        for cid in semantic_search_cids:
-            chunk_communities = cid_to_level_to_communities[cid][level]
-            if len(chunk_communities) > 0:
-                assigned_community = sorted(
-                    chunk_communities, key=lambda x: community_sequence.index(x)
-                )[0]
-                if cid not in level_to_community_to_cids[level][assigned_community]:
-                    level_to_community_to_cids[level][assigned_community].append(cid)
-
-    for level, community_to_cids in level_to_community_to_cids.items():
-        for community, cids in community_to_cids.items():
-            cids.sort(key=lambda x: semantic_search_cids.index(x))
+    community_to_parent = community_index.community_to_parent
 
     # Set level -1 as everything in the dataset
     level_to_community_sequence[-1] = ["1"]
     level_to_community_to_cids[-1]["1"] = semantic_search_cids
-    for concept, level_to_community in concept_to_level_to_community.items():
-        level_to_community[-1] = "1"
-
-    for cid, level_to_community in cid_to_level_to_communities.items():
-        level_to_community[-1] = "1"
 
     successive_irrelevant = 0
     eliminated_communities = set()
@@ -0,0 +1,465 @@
+# Copyright (c) 2024 Microsoft Corporation. All rights reserved.
+# Licensed under the MIT license. See LICENSE file in the project.
+
+import json
+import os
+from collections import defaultdict
+
+import networkx as nx
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from graspologic.partition import HierarchicalCluster, HierarchicalClusters
+
+from intelligence_toolkit.query_text_data.classes import ChunkVectors, ProcessedChunks
+
+snapshot_format = "query_text_data_snapshot"
+snapshot_version = 1
+
+_manifest_file = "manifest.json"
+_chunks_file = "chunks.parquet"
+_files_file = "files.parquet"
+_periods_file = "periods.parquet"
+_node_counts_file = "node_counts.parquet"
+_edge_counts_file = "edge_counts.parquet"
+_graph_nodes_file = "graph_nodes.parquet"
+_graph_edges_file = "graph_edges.parquet"
+_communities_file = "communities.parquet"
+_community_labels_file = "community_labels.parquet"
+_vectors_file = "vectors.arrow"
+
+
+class Snapshot:
+    def __init__(
+        self,
+        processed_chunks: ProcessedChunks,
+        cid_to_vector: dict[int, list[float]] | None = None,
+        label_to_chunks: dict[str, list[str]] | None = None,
+        metadata: dict | None = None,
+        chunk_vectors: ChunkVectors | None = None,
+    ) -> None:
+        """
+        The saved state of a Query Text Data workspace.
+
+        Args:
+            processed_chunks (ProcessedChunks): The processed chunks
+            cid_to_vector (dict[int, list[float]] | None): The chunk embeddings, if computed
+            label_to_chunks (dict[str, list[str]] | None): The raw chunks of each file
+            metadata (dict | None): Extra JSON-serializable settings to keep with the snapshot
+            chunk_vectors (ChunkVectors | None): Ranking over the loaded embeddings, sharing their memory
+        """
+        self.processed_chunks = processed_chunks
+        self.cid_to_vector = cid_to_vector
+        self.label_to_chunks = label_to_chunks
+        self.metadata = metadata or {}
+        self.chunk_vectors = chunk_vectors
+
+    def __repr__(self):
+        return f"Snapshot(num_chunks={len(self.processed_chunks.cid_to_text)})"
+
+
+def _write_parquet(path: str, columns: dict, schema: pa.Schema) -> None:
+    pq.write_table(pa.table(columns, schema=schema), path)
+
+
+def _read_parquet(path: str) -> dict:
+    return pq.read_table(path, memory_map=True).to_pydict()
+
+
+def save_snapshot(path: str, snapshot: Snapshot) -> None:
+    """
+    Write a snapshot directory. Tables are stored as Parquet, concept graphs as
+    edge lists and embeddings as an uncompressed Arrow file that loads
+    memory-mapped. The manifest is written last, so a directory without one is
+    an incomplete snapshot.
+
+    Args:
+        path (str): The snapshot directory, created if needed
+        snapshot (Snapshot): The workspace state to save
+    """
+    if snapshot.processed_chunks is None:
+        msg = "No processed chunks to save; process chunks before saving a snapshot"
+        raise ValueError(msg)
+    os.makedirs(path, exist_ok=True)
+    manifest_path = os.path.join(path, _manifest_file)
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)
+    pc = snapshot.processed_chunks
+
+    cids = sorted(pc.cid_to_text.keys())
+    _write_parquet(
+        os.path.join(path, _chunks_file),
+        {
+            "cid": cids,
+            "text": [pc.cid_to_text[cid] for cid in cids],
+            "previous_cid": [pc.previous_cid.get(cid) for cid in cids],
+            "next_cid": [pc.next_cid.get(cid) for cid in cids],
+            "concepts": [pc.cid_to_concepts.get(cid, []) for cid in cids],
+        },
+        pa.schema(
+            [
+                pa.field("cid", pa.int64()),
+                pa.field("text", pa.large_string()),
+                pa.field("previous_cid", pa.int64()),
+                pa.field("next_cid", pa.int64()),
+                pa.field("concepts", pa.list_(pa.string())),
+            ]
+        ),
+    )
+
+    period_rows = [
+        (period, cid) for period, period_cids in pc.period_to_cids.items() for cid in period_cids
+    ]
+    _write_parquet(
+        os.path.join(path, _periods_file),
+        {
+            "period": [period for period, _ in period_rows],
+            "cid": [cid for _, cid in period_rows],
+        },
+        pa.schema([pa.field("period", pa.string()), pa.field("cid", pa.int64())]),
+    )
+
+    node_rows = [
+        (node, period, count)
+        for node, period_counts in pc.node_period_counts.items()
+        for period, count in period_counts.items()
+    ]
+    _write_parquet(
+        os.path.join(path, _node_counts_file),
+        {
+            "concept": [row[0] for row in node_rows],
+            "period": [row[1] for row in node_rows],
+            "count": [row[2] for row in node_rows],
+        },
+        pa.schema(
+            [
+                pa.field("concept", pa.string()),
+                pa.field("period", pa.string()),
+                pa.field("count", pa.int64()),
+            ]
+        ),
+    )
+
+    edge_rows = [
+        (edge[0], edge[1], period, count)
+        for edge, period_counts in pc.edge_period_counts.items()
+        for period, count in period_counts.items()
+    ]
+    _write_parquet(
+        os.path.join(path, _edge_counts_file),
+        {
+            "source": [row[0] for row in edge_rows],
+            "target": [row[1] for row in edge_rows],
+            "period": [row[2] for row in edge_rows],
+            "count": [row[3] for row in edge_rows],
+        },
+        pa.schema(
+            [
+                pa.field("source", pa.string()),
+                pa.field("target", pa.string()),
+                pa.field("period", pa.string()),
+                pa.field("count", pa.int64()),
+            ]
+        ),
+    )
+
+    graph_nodes = [
+        (period, node, data.get("count"), data.get("community"))
+        for period, G in pc.period_concept_graphs.items()
+        for node, data in G.nodes(data=True)
+    ]
+    _write_parquet(
+        os.path.join(path, _graph_nodes_file),
+        {
+            "period": [row[0] for row in graph_nodes],
+            "node": [row[1] for row in graph_nodes],
+            "count": [row[2] for row in graph_nodes],
+            "community": [row[3] for row in graph_nodes],
+        },
+        pa.schema(
+            [
+                pa.field("period", pa.string()),
+                pa.field("node", pa.string()),
+                pa.field("count", pa.int64()),
+                pa.field("community", pa.int64()),
+            ]
+        ),
+    )
+    graph_edges = [
+        (period, source, target, data.get("weight"))
+        for period, G in pc.period_concept_graphs.items()
+        for source, target, data in G.edges(data=True)
+    ]
+    _write_parquet(
+        os.path.join(path, _graph_edges_file),
+        {
+            "period": [row[0] for row in graph_edges],
+            "source": [row[1] for row in graph_edges],
+            "target": [row[2] for row in graph_edges],
+            "weight": [row[3] for row in graph_edges],
+        },
+        pa.schema(
+            [
+                pa.field("period", pa.string()),
+                pa.field("source", pa.string()),
+                pa.field("target", pa.string()),
+                pa.field("weight", pa.int64()),
+            ]
+        ),
+    )
+
+    communities = list(pc.hierarchical_communities or [])
+    _write_parquet(
+        os.path.join(path, _communities_file),
+        {
+            "node": [hc.node for hc in communities],
+            "cluster": [hc.cluster for hc in communities],
+            "parent_cluster": [hc.parent_cluster for hc in communities],
+            "level": [hc.level for hc in communities],
+            "is_final_cluster": [hc.is_final_cluster for hc in communities],
+            "inferred": [hc.node in pc.inferred_concepts for hc in communities],
+        },
+        pa.schema(
+            [
+                pa.field("node", pa.string()),
+                pa.field("cluster", pa.int64()),
+                pa.field("parent_cluster", pa.int64()),
+                pa.field("level", pa.int64()),
+                pa.field("is_final_cluster", pa.bool_()),
+                pa.field("inferred", pa.bool_()),
+            ]
+        ),
+    )
+    _write_parquet(
+        os.path.join(path, _community_labels_file),
+        {
+            "community": list(pc.community_to_label.keys()),
+            "label": list(pc.community_to_label.values()),
+        },
+        pa.schema([pa.field("community", pa.int64()), pa.field("label", pa.string())]),
+    )
+
+    if snapshot.label_to_chunks is not None:
+        file_rows = [
+            (label, chunk)
+            for label, chunks in snapshot.label_to_chunks.items()
+            for chunk in chunks
+        ]
+        _write_parquet(
+            os.path.join(path, _files_file),
+            {
+                "file_name": [row[0] for row in file_rows],
+                "chunk": [row[1] for row in file_rows],
+            },
+            pa.schema(
+                [pa.field("file_name", pa.string()), pa.field("chunk", pa.large_string())]
+            ),
+        )
+
+    dimensions = 0
+    if snapshot.cid_to_vector is not None:
+        vector_cids = np.array(sorted(snapshot.cid_to_vector.keys()), dtype=np.int64)
+        if len(vector_cids) > 0:
+            matrix = np.stack(
+                [
+                    np.asarray(snapshot.cid_to_vector[cid], dtype=np.float32)
+                    for cid in vector_cids
+                ]
+            )
+        else:
+            matrix = np.zeros((0, 1), dtype=np.float32)
+        dimensions = matrix.shape[1]
+        table = pa.table(
+            {
+                "cid": vector_cids,
+                "vector": pa.FixedSizeListArray.from_arrays(
+                    pa.array(matrix.ravel()), dimensions
+                ),
+            }
+        )
+        with pa.OSFile(os.path.join(path, _vectors_file), "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+
+    manifest = {
+        "format": snapshot_format,
+        "version": snapshot_version,
+        "num_chunks": len(cids),
+        "has_communities": pc.hierarchical_communities is not None,
+        "has_files": snapshot.label_to_chunks is not None,
+        "has_vectors": snapshot.cid_to_vector is not None,
+        "vector_dimensions": dimensions,
+        "metadata": snapshot.metadata,
+    }
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+
+
+def _load_vectors(path: str) -> tuple[np.ndarray, np.ndarray]:
+    # The matrix is a view of the memory-mapped file, so nothing is copied up front
+    source = pa.memory_map(path, "r")
+    table = pa.ipc.open_file(source).read_all()
+    cids = table.column("cid").to_numpy()
+    vectors = table.column("vector").combine_chunks()
+    dimensions = vectors.type.list_size
+    matrix = vectors.values.to_numpy(zero_copy_only=True).reshape(-1, dimensions)
+    return cids, matrix
+
+
+def load_snapshot(path: str) -> Snapshot:
+    """
+    Read a snapshot directory written by `save_snapshot`.
+
+    Args:
+        path (str): The snapshot directory
+
+    Returns:
+        Snapshot: The saved workspace state
+    """
+    manifest_path = os.path.join(path, _manifest_file)
+    if not os.path.exists(manifest_path):
+        msg = f"No snapshot manifest found in {path}"
+        raise FileNotFoundError(msg)
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    if manifest.get("format") != snapshot_format:
+        msg = f"{path} is not a Query Text Data snapshot"
+        raise ValueError(msg)
+    if manifest.get("version", 0) > snapshot_version:
+        msg = (
+            f"Snapshot version {manifest['version']} is newer than the supported "
+            f"version {snapshot_version}"
+        )
+        raise ValueError(msg)
+
+    chunks = _read_parquet(os.path.join(path, _chunks_file))
+    cid_to_text = dict(zip(chunks["cid"], chunks["text"]))
+    text_to_cid = {}
+    previous_cid = {}
+    next_cid = {}
+    concept_to_cids = defaultdict(list)
+    cid_to_concepts = defaultdict(list)
+    for cid, text, previous, following, concepts in zip(
+        chunks["cid"],
+        chunks["text"],
+        chunks["previous_cid"],
+        chunks["next_cid"],
+        chunks["concepts"],
+    ):
+        text_to_cid[text] = cid
+        if previous is not None:
+            previous_cid[cid] = previous
+        if following is not None:
+            next_cid[cid] = following
+        cid_to_concepts[cid] = concepts
+        for concept in concepts:
+            concept_to_cids[concept].append(cid)
+
+    period_to_cids = defaultdict(list)
+    periods = _read_parquet(os.path.join(path, _periods_file))
+    for period, cid in zip(periods["period"], periods["cid"]):
+        period_to_cids[period].append(cid)
+
+    node_period_counts = defaultdict(lambda: defaultdict(int))
+    node_counts = _read_parquet(os.path.join(path, _node_counts_file))
+    for concept, period, count in zip(
+        node_counts["concept"], node_counts["period"], node_counts["count"]
+    ):
+        node_period_counts[concept][period] = count
+    edge_period_counts = defaultdict(lambda: defaultdict(int))
+    edge_counts = _read_parquet(os.path.join(path, _edge_counts_file))
+    for source, target, period, count in zip(
+        edge_counts["source"],
+        edge_counts["target"],
+        edge_counts["period"],
+        edge_counts["count"],
+    ):
+        edge_period_counts[(source, target)][period] = count
+
+    period_concept_graphs = defaultdict(nx.Graph)
+    period_concept_graphs["ALL"] = nx.Graph()
+    graph_nodes = _read_parquet(os.path.join(path, _graph_nodes_file))
+    for period, node, count, community in zip(
+        graph_nodes["period"],
+        graph_nodes["node"],
+        graph_nodes["count"],
+        graph_nodes["community"],
+    ):
+        attributes = {}
+        if count is not None:
+            attributes["count"] = count
+        if community is not None:
+            attributes["community"] = community
+        period_concept_graphs[period].add_node(node, **attributes)
+    graph_edges = _read_parquet(os.path.join(path, _graph_edges_file))
+    for period, source, target, weight in zip(
+        graph_edges["period"],
+        graph_edges["source"],
+        graph_edges["target"],
+        graph_edges["weight"],
+    ):
+        period_concept_graphs[period].add_edge(source, target, weight=weight)
+
+    hierarchical_communities = None
+    inferred_concepts = set()
+    if manifest["has_communities"]:
+        communities = _read_parquet(os.path.join(path, _communities_file))
+        # Snapshots written before communities were extended have no inferred column
+        inferred_concepts = {
+            node
+            for node, inferred in zip(
+                communities["node"],
+                communities.get("inferred", [False] * len(communities["node"])),
+            )
+            if inferred
+        }
+        hierarchical_communities = HierarchicalClusters(
+            HierarchicalCluster(*row)
+            for row in zip(
+                communities["node"],
+                communities["cluster"],
+                communities["parent_cluster"],
+                communities["level"],
+                communities["is_final_cluster"],
+            )
+        )
+    labels = _read_parquet(os.path.join(path, _community_labels_file))
+    community_to_label = dict(zip(labels["community"], labels["label"]))
+
+    label_to_chunks = None
+    if manifest["has_files"]:
+        label_to_chunks = defaultdict(list)
+        files = _read_parquet(os.path.join(path, _files_file))
+        for label, chunk in zip(files["file_name"], files["chunk"]):
+            label_to_chunks[label].append(chunk)
+
+    cid_to_vector = None
+    chunk_vectors = None
+    if manifest["has_vectors"]:
+        # Vectors are saved in chunk ID order, so the mapped matrix is ranked as is
+        cids, matrix = _load_vectors(os.path.join(path, _vectors_file))
+        cid_to_vector = dict(zip(cids.tolist(), matrix))
+        chunk_vectors = ChunkVectors.from_matrix(cids, matrix)
+
+    processed_chunks = ProcessedChunks(
+        cid_to_text=cid_to_text,
+        text_to_cid=text_to_cid,
+        period_concept_graphs=period_concept_graphs,
+        hierarchical_communities=hierarchical_communities,
+        community_to_label=community_to_label,
+        concept_to_cids=concept_to_cids,
+        cid_to_concepts=cid_to_concepts,
+        previous_cid=previous_cid,
+        next_cid=next_cid,
+        period_to_cids=period_to_cids,
+        node_period_counts=node_period_counts,
+        edge_period_counts=edge_period_counts,
+        inferred_concepts=inferred_concepts,
+    )
+    return Snapshot(
+        processed_chunks,
+        cid_to_vector=cid_to_vector,
+        label_to_chunks=label_to_chunks,
+        metadata=manifest.get("metadata", {}),
+        chunk_vectors=chunk_vectors,
+    )
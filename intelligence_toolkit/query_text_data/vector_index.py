@@ -0,0 +1,182 @@
+# Copyright (c) 2024 Microsoft Corporation. All rights reserved.
+# Licensed under the MIT license. See LICENSE file in the project.
+
+import hashlib
+import logging
+import math
+import re
+
+import numpy as np
+import pyarrow as pa
+
+import intelligence_toolkit.query_text_data.config as config
+from intelligence_toolkit.AI.vector_store import VectorStore
+from intelligence_toolkit.helpers.constants import CACHE_PATH
+
+logger = logging.getLogger(__name__)
+
+_fingerprint_table = re.compile(rf"{config.cache_name}_chunks_[0-9a-f]{{32}}")
+
+
+def _num_sub_vectors(dimensions: int) -> int:
+    # PQ needs a divisor of the dimension count; aim for 16 dimensions per sub-vector
+    num_sub_vectors = max(1, dimensions // 16)
+    while dimensions % num_sub_vectors != 0:
+        num_sub_vectors -= 1
+    return num_sub_vectors
+
+
+def _vector_key(vector) -> str:
+    return hashlib.blake2b(
+        np.asarray(vector, dtype=np.float32).tobytes(), digest_size=16
+    ).hexdigest()
+
+
+def _drop_fingerprint_tables(vector_store: VectorStore) -> None:
+    # Earlier versions wrote a new table per set of embeddings; they are never read again
+    for table_name in vector_store.db_connection.table_names():
+        if _fingerprint_table.fullmatch(table_name):
+            vector_store.db_connection.drop_table(table_name)
+
+
+class ChunkVectorIndex:
+    def __init__(
+        self,
+        cid_to_vector: dict[int, list[float]],
+        db_path: str = CACHE_PATH,
+        candidates: int = config.vector_index_candidates,
+        nprobes: int = config.vector_index_nprobes,
+        refine_factor: int = config.vector_index_refine_factor,
+        min_rows: int = config.vector_index_min_rows,
+        cid_to_key: dict[int, str] | None = None,
+        name: str = config.vector_index_table,
+        retrain_share: float = config.vector_index_retrain_share,
+    ) -> None:
+        """
+        Approximate nearest-neighbour index over chunk embeddings, stored in LanceDB
+        next to the embedding cache. Each corpus keeps one table, and each row keeps
+        the key of the embedding it holds. Reopening the corpus appends only chunks
+        the table does not have yet. A table holding other or changed embeddings is
+        rebuilt. The IVF-PQ index is retrained once more than `retrain_share` of the
+        rows were appended after it was built; until then appended rows are searched
+        exhaustively. Ranks the same way as ChunkVectors, but only returns the
+        closest `candidates` chunks and does not hold the vectors in memory.
+
+        Args:
+            cid_to_vector (dict[int, list[float]]): A dictionary of chunk ID to vector
+            db_path (str): The LanceDB directory
+            candidates (int): How many chunks each query retrieves
+            nprobes (int): How many IVF partitions each query searches
+            refine_factor (int): How many extra candidates are re-ranked exactly
+            min_rows (int): Corpora smaller than this are searched exhaustively
+            cid_to_key (dict[int, str] | None): An embedding cache key per chunk; vectors are hashed if not given
+            name (str): The corpus table name
+            retrain_share (float): The share of unindexed rows that retrains the index
+        """
+        self.db_path = db_path
+        self.min_rows = min_rows
+        self.candidates = candidates
+        self.nprobes = nprobes
+        self.refine_factor = refine_factor
+        self.name = name
+        self.retrain_share = retrain_share
+        self.num_chunks = len(cid_to_vector)
+        self.vector_store = None
+        self.indexed = False
+        if self.num_chunks == 0:
+            return
+
+        cids = sorted(cid_to_vector.keys())
+        if cid_to_key is None:
+            cid_to_key = {cid: _vector_key(cid_to_vector[cid]) for cid in cids}
+        dimensions = len(cid_to_vector[cids[0]])
+        schema = pa.schema(
+            [
+                pa.field("cid", pa.int64()),
+                pa.field("key", pa.string()),
+                pa.field("vector", pa.list_(pa.float32(), dimensions)),
+            ]
+        )
+        self.vector_store = VectorStore(
+            f"{config.cache_name}_{name}", db_path, schema
+        )
+        _drop_fingerprint_tables(self.vector_store)
+
+        stored = self.vector_store.table.to_lance().to_table(columns=["cid", "key"])
+        stored_keys = dict(
+            zip(stored.column("cid").to_pylist(), stored.column("key").to_pylist())
+        )
+        if len(stored_keys) != stored.num_rows or any(
+            cid_to_key.get(cid) != key for cid, key in stored_keys.items()
+        ):
+            # Another corpus, changed embeddings or a duplicated write
+            logger.info("Rebuilding vector table %s", self.vector_store.table_name)
+            self.vector_store.drop_table()
+            self.vector_store = VectorStore(
+                self.vector_store.table_name, db_path, schema
+            )
+            stored_keys = {}
+
+        new_cids = [cid for cid in cids if cid not in stored_keys]
+        if len(new_cids) > 0:
+            matrix = np.stack(
+                [np.asarray(cid_to_vector[cid], dtype=np.float32) for cid in new_cids]
+            )
+            self.vector_store.save(
+                pa.table(
+                    {
+                        "cid": np.array(new_cids, dtype=np.int64),
+                        "key": [cid_to_key[cid] for cid in new_cids],
+                        "vector": pa.FixedSizeListArray.from_arrays(
+                            pa.array(matrix.ravel()), dimensions
+                        ),
+                    },
+                    schema=schema,
+                )
+            )
+            del matrix
+
+        self.indexed = self.vector_store.has_vector_index()
+        if self.num_chunks >= max(min_rows, 256) and (
+            not self.indexed
+            or self.vector_store.count_unindexed_rows()
+            > retrain_share * self.num_chunks
+        ):
+            logger.info("Building vector index for %s chunks", self.num_chunks)
+            self.vector_store.create_vector_index(
+                num_partitions=max(1, min(4096, int(math.sqrt(self.num_chunks)))),
+                num_sub_vectors=_num_sub_vectors(dimensions),
+            )
+            self.indexed = True
+
+    def rank(self, query_vector, exclude=()) -> list[int]:
+        """
+        Return the closest chunk IDs to the query by cosine distance, closest first.
+
+        Args:
+            query_vector: The query embedding
+            exclude: Chunk IDs to leave out of the ranking
+
+        Returns:
+            list[int]: Up to `candidates` ranked chunk IDs
+        """
+        if self.num_chunks == 0:
+            return []
+        exclude = set(exclude)
+        rows = self.vector_store.search_by_vector(
+            np.asarray(query_vector, dtype=np.float32),
+            k=min(self.num_chunks, self.candidates + len(exclude)),
+            column="vector",
+            metric="cosine",
+            nprobes=self.nprobes if self.indexed else None,
+            refine_factor=self.refine_factor if self.indexed else None,
+            columns=["cid"],
+        )
+        ranked = [row["cid"] for row in rows if row["cid"] not in exclude]
+        return ranked[: self.candidates]
+
+    def __len__(self):
+        return self.num_chunks
+
+    def __repr__(self):
+        return f"ChunkVectorIndex(num_chunks={self.num_chunks}, indexed={self.indexed})"
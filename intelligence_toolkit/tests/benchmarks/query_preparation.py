@@ -0,0 +1,88 @@
+# Copyright (c) 2024 Microsoft Corporation. All rights reserved.
+# Licensed under the MIT license. See LICENSE file in the project.
+#
+"""
+Times Query Text Data query preparation: ranking every chunk against the query
+embedding and ordering communities, before any relevance test is sent.
+
+    python -m intelligence_toolkit.tests.benchmarks.query_preparation --sizes 10000 100000 1000000
+"""
+
+import argparse
+import tempfile
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+from intelligence_toolkit.query_text_data.classes import ChunkVectors, CommunityIndex
+from intelligence_toolkit.query_text_data.vector_index import ChunkVectorIndex
+
+
+def synthetic_chunks(num_chunks, dimensions, num_concepts, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(num_chunks, dimensions)).astype(np.float32)
+    cid_to_vector = dict(enumerate(vectors))
+    hierarchical_communities = []
+    community_to_label = {}
+    for concept in range(num_concepts):
+        top = concept % 50
+        child = 50 + concept % 500
+        community_to_label[top] = str(top)
+        community_to_label[child] = str(child)
+        hierarchical_communities.append(
+            SimpleNamespace(node=concept, level=0, cluster=top, parent_cluster=None)
+        )
+        hierarchical_communities.append(
+            SimpleNamespace(node=concept, level=1, cluster=child, parent_cluster=top)
+        )
+    concepts = rng.integers(0, num_concepts, size=(num_chunks, 3)).tolist()
+    processed_chunks = SimpleNamespace(
+        hierarchical_communities=hierarchical_communities,
+        community_to_label=community_to_label,
+        cid_to_concepts=dict(enumerate(concepts)),
+    )
+    return cid_to_vector, processed_chunks, rng.normal(size=dimensions)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--dimensions", type=int, default=256)
+    parser.add_argument("--concepts", type=int, default=5000)
+    parser.add_argument("--ranking-chunks", type=int, default=10)
+    parser.add_argument(
+        "--vector-index",
+        action="store_true",
+        help="Rank with the persisted ANN index instead of exhaustive search",
+    )
+    args = parser.parse_args()
+    db_path = tempfile.mkdtemp()
+
+    # Index builds happen once per corpus; the query columns are paid on every query
+    print("chunks\tvectors_build_s\tcommunities_build_s\trank_s\tcommunities_s\tquery_total_s")
+    for size in args.sizes:
+        cid_to_vector, processed_chunks, query = synthetic_chunks(
+            size, args.dimensions, args.concepts
+        )
+        start = time.perf_counter()
+        chunk_vectors = (
+            ChunkVectorIndex(cid_to_vector, db_path, min_rows=0)
+            if args.vector_index
+            else ChunkVectors(cid_to_vector)
+        )
+        vectors_built = time.perf_counter()
+        community_index = CommunityIndex(processed_chunks)
+        built = time.perf_counter()
+        semantic_search_cids = chunk_vectors.rank(query)
+        ranked = time.perf_counter()
+        community_index.rank(semantic_search_cids, args.ranking_chunks)
+        done = time.perf_counter()
+        print(
+            f"{size}\t{vectors_built - start:.3f}\t{built - vectors_built:.3f}\t"
+            f"{ranked - built:.3f}\t{done - ranked:.3f}\t{done - built:.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
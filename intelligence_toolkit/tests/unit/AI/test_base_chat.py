@@ -1,6 +1,7 @@
 # Copyright (c) 2024 Microsoft Corporation. All rights reserved.
 # Licensed under the MIT license. See LICENSE file in the project.
 #
+import asyncio
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
@@ -32,7 +33,7 @@ def test_base_chat_initialization(base_chat_config):
         chat = BaseChat(base_chat_config, concurrent_coroutines=10)
         
         assert chat.configuration is not None
-        assert chat.semaphore._value == 10
+        assert chat.rate_limiter.max_concurrency == 10
 
 
 def test_base_chat_initialization_default_coroutines(base_chat_config):
@@ -42,7 +43,17 @@ def test_base_chat_initialization_default_coroutines(base_chat_config):
         from intelligence_toolkit.AI.defaults import DEFAULT_CONCURRENT_COROUTINES
         
         chat = BaseChat(base_chat_config)
-        assert chat.semaphore._value == DEFAULT_CONCURRENT_COROUTINES
+        assert chat.rate_limiter.max_concurrency == DEFAULT_CONCURRENT_COROUTINES
+
+
+def test_base_chat_shares_rate_limiter_per_deployment(base_chat_config):
+    with patch("intelligence_toolkit.AI.client.OpenAI"), \
+         patch("intelligence_toolkit.AI.client.AsyncOpenAI"):
+
+        first = BaseChat(base_chat_config, concurrent_coroutines=10)
+        second = BaseChat(base_chat_config, concurrent_coroutines=10)
+
+        assert first.rate_limiter is second.rate_limiter
 
 
 @pytest.mark.asyncio
@@ -78,12 +89,16 @@ async def test_generate_text_async_with_callbacks(base_chat):
 async def test_generate_text_async_exception(base_chat):
     messages = [{"role": "user", "content": "Hello"}]
     
-    with patch.object(base_chat, 'generate_chat_async', new_callable=AsyncMock) as mock_chat:
+    with patch.object(base_chat, 'generate_chat_async', new_callable=AsyncMock) as mock_chat, \
+         patch("intelligence_toolkit.helpers.decorators.asyncio.sleep", new_callable=AsyncMock):
         mock_chat.side_effect = Exception("API Error")
         
         with pytest.raises(Exception, match="Problem in OpenAI response"):
             await base_chat.generate_text_async(messages, None, False)
 
+        # Each request is retried on its own before the error surfaces
+        assert mock_chat.call_count == 6
+
 
 @pytest.mark.asyncio
 async def test_generate_texts_async_multiple_messages(base_chat):
@@ -125,6 +140,33 @@ async def test_generate_texts_async_with_callbacks(base_chat):
         mock_track.assert_called_once()
 
 
+@pytest.mark.asyncio
+async def test_generate_texts_async_on_result(base_chat):
+    messages_list = [
+        [{"role": "user", "content": "Slow"}],
+        [{"role": "user", "content": "Fast"}],
+        [{"role": "user", "content": "Fails"}],
+    ]
+    delays = {"Slow": 0.05, "Fast": 0, "Fails": 0}
+    completed = []
+
+    async def generate(messages, callbacks, stream, **kwargs):
+        content = messages[0]["content"]
+        await asyncio.sleep(delays[content])
+        if content == "Fails":
+            raise Exception("failed")
+        return content
+
+    with patch.object(base_chat, "generate_text_async", side_effect=generate):
+        with pytest.raises(Exception, match="failed"):
+            await base_chat.generate_texts_async(
+                messages_list, on_result=lambda index, result: completed.append((index, result))
+            )
+        await asyncio.sleep(0.1)
+
+    assert completed == [(1, "Fast"), (0, "Slow")]
+
+
 @pytest.mark.asyncio
 async def test_generate_texts_async_with_kwargs(base_chat):
     messages_list = [
@@ -1,7 +1,8 @@
 # Copyright (c) 2024 Microsoft Corporation. All rights reserved.
 # Licensed under the MIT license. See LICENSE file in the project.
 #
-from unittest.mock import AsyncMock, MagicMock, patch
+import asyncio
+from unittest.mock import ANY, AsyncMock, MagicMock, patch
 
 import pytest
 
@@ -38,8 +39,8 @@ def test_openai_client_initialization_openai(openai_config):
         
         client = OpenAIClient(openai_config)
         
-        mock_openai.assert_called_once_with(api_key="test_key")
-        mock_async_openai.assert_called_once_with(api_key="test_key")
+        mock_openai.assert_called_once_with(api_key="test_key", http_client=ANY)
+        mock_async_openai.assert_called_once_with(api_key="test_key", http_client=ANY)
         assert client.configuration == openai_config
 
 
@@ -53,11 +54,13 @@ def test_openai_client_initialization_azure_with_key(azure_openai_config):
             api_version="2024-02-01",
             azure_endpoint="https://test.openai.azure.com",
             api_key="test_key",
+            http_client=ANY,
         )
         mock_async_azure.assert_called_once_with(
             api_version="2024-02-01",
             azure_endpoint="https://test.openai.azure.com",
             api_key="test_key",
+            http_client=ANY,
         )
 
 
@@ -102,6 +105,7 @@ def test_openai_client_initialization_azure_managed_identity():
             api_version="2024-02-01",
             azure_ad_token_provider="mock_token_provider",
             azure_endpoint="https://test.openai.azure.com",
+            http_client=ANY,
         )
 
 
@@ -253,3 +257,77 @@ async def test_openai_client_generate_embedding_async(openai_config):
         result = await client.generate_embedding_async("test text")
         
         assert result == [0.4, 0.5, 0.6]
+
+
+def test_openai_clients_share_pooled_connection(openai_config):
+    with patch("intelligence_toolkit.AI.client.OpenAI") as mock_openai, \
+         patch("intelligence_toolkit.AI.client.AsyncOpenAI") as mock_async_openai:
+
+        first = OpenAIClient(openai_config)
+        second = OpenAIClient(OpenAIConfiguration({
+            "api_key": "test_key",
+            "model": "gpt-4o",
+            "api_type": "OpenAI",
+        }))
+
+        assert first._client is second._client
+        mock_openai.assert_called_once()
+        mock_async_openai.assert_called_once()
+
+        OpenAIClient(OpenAIConfiguration({"api_key": "other_key", "api_type": "OpenAI"}))
+        assert mock_openai.call_count == 2
+
+
+def test_managed_identity_credential_is_reused():
+    config = OpenAIConfiguration({
+        "api_type": "Azure OpenAI",
+        "api_base": "https://test.openai.azure.com",
+        "api_version": "2024-02-01",
+        "az_auth_type": "Managed Identity",
+    })
+
+    with patch("intelligence_toolkit.AI.client.DefaultAzureCredential") as mock_cred, \
+         patch("intelligence_toolkit.AI.client.get_bearer_token_provider"), \
+         patch("intelligence_toolkit.AI.client.AzureOpenAI"), \
+         patch("intelligence_toolkit.AI.client.AsyncAzureOpenAI"):
+
+        OpenAIClient(config)
+        OpenAIClient(config)
+
+        mock_cred.assert_called_once()
+
+
+def test_async_clients_are_pooled_per_event_loop(openai_config):
+    with patch("intelligence_toolkit.AI.client.OpenAI"), \
+         patch("intelligence_toolkit.AI.client.AsyncOpenAI") as mock_async_openai:
+        mock_async_openai.side_effect = lambda **kwargs: MagicMock(close=AsyncMock())
+        client = OpenAIClient(openai_config)
+        unbound = client._async_client
+
+        async def get_clients():
+            return client._async_client, OpenAIClient(openai_config)._async_client
+
+        first_loop = asyncio.run(get_clients())
+        second_loop = asyncio.run(get_clients())
+
+        # The client created outside a loop is adopted by the first loop only
+        assert first_loop == (unbound, unbound)
+        assert second_loop[0] is second_loop[1]
+        assert second_loop[0] is not unbound
+        assert mock_async_openai.call_count == 2
+
+
+def test_async_clients_close_when_their_loop_ends(openai_config):
+    client = OpenAIClient(openai_config)
+
+    async def use_client():
+        async_client = client._async_client
+        assert not async_client.is_closed()
+        return async_client
+
+    first = asyncio.run(use_client())
+    second = asyncio.run(use_client())
+
+    assert first is not second
+    assert first.is_closed()
+    assert second.is_closed()
@@ -0,0 +1,209 @@
+# Copyright (c) 2024 Microsoft Corporation. All rights reserved.
+# Licensed under the MIT license. See LICENSE file in the project.
+#
+import tempfile
+
+import numpy as np
+import pytest
+
+from intelligence_toolkit.AI.base_embedder import BaseEmbedder
+from intelligence_toolkit.AI.embedding_cache import EmbeddingCache
+from intelligence_toolkit.AI.utils import hash_text
+
+
+class CountingEmbedder(BaseEmbedder):
+    def __init__(self, db_path, model="test-model", max_cached_embeddings=0):
+        super().__init__(
+            "test_embeddings",
+            db_path,
+            check_token_count=False,
+            model=model,
+            max_cached_embeddings=max_cached_embeddings,
+        )
+        self.calls = []
+
+    def _generate_embedding(self, text):
+        self.calls.append(text)
+        return [float(len(text)), 1.0, 0.0]
+
+    async def _generate_embedding_async(self, text):
+        return self._generate_embedding(text)
+
+
+@pytest.fixture
+def temp_db_path():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        yield tmpdir
+
+
+def _items(texts):
+    return [
+        {"hash": hash_text(text), "text": text, "vector": [float(i), 0.5, 0.25]}
+        for i, text in enumerate(texts)
+    ]
+
+
+def test_get_many_empty(temp_db_path):
+    cache = EmbeddingCache("test_cache", temp_db_path)
+    assert cache.get_many([hash_text("missing")], "model") == {}
+
+
+def test_put_and_get_many(temp_db_path):
+    cache = EmbeddingCache("test_cache", temp_db_path)
+    items = _items(["a", "b", "c"])
+    cache.put_many(items, "model")
+
+    result = cache.get_many([items[0]["hash"], items[2]["hash"]], "model")
+
+    assert set(result.keys()) == {items[0]["hash"], items[2]["hash"]}
+    assert result[items[2]["hash"]].dtype == np.float32
+    np.testing.assert_allclose(result[items[2]["hash"]], [2.0, 0.5, 0.25])
+
+
+def test_get_many_is_keyed_on_model(temp_db_path):
+    cache = EmbeddingCache("test_cache", temp_db_path)
+    items = _items(["a"])
+    cache.put_many(items, "model-a")
+
+    assert cache.get_many([items[0]["hash"]], "model-b") == {}
+    assert items[0]["hash"] in cache.get_many([items[0]["hash"]], "model-a")
+
+
+def test_put_many_evicts_least_recently_used(temp_db_path):
+    cache = EmbeddingCache("test_cache", temp_db_path, max_size=2)
+    first, second, third = _items(["a", "b", "c"])
+    cache.put_many([first], "model")
+    cache.put_many([second], "model")
+    # Touch the first entry so the second becomes the oldest
+    cache.get_many([first["hash"]], "model")
+    cache.put_many([third], "model")
+
+    result = cache.get_many([first["hash"], second["hash"], third["hash"]], "model")
+
+    assert set(result.keys()) == {first["hash"], third["hash"]}
+
+
+def test_put_many_evicts_rows_touched_together(temp_db_path):
+    cache = EmbeddingCache("test_cache", temp_db_path, max_size=3)
+    items = _items(["a", "b", "c", "d"])
+    cache.put_many(items[:3], "model")
+    # One flush stamps all three hits with the same access time
+    cache.get_many([item["hash"] for item in items[:3]], "model")
+    cache.put_many(items[3:], "model")
+
+    assert cache.vector_store.table.count_rows() == 3
+    result = cache.get_many([item["hash"] for item in items], "model")
+    assert items[3]["hash"] in result
+
+
+def test_get_many_batches_access_updates(temp_db_path):
+    cache = EmbeddingCache("test_cache", temp_db_path, access_flush_size=3)
+    first, second = _items(["a", "b"])
+    cache.put_many([first, second], "model")
+    version = cache.vector_store.table.version
+
+    cache.get_many([first["hash"]], "model")
+    cache.get_many([first["hash"], second["hash"]], "model")
+
+    assert cache.vector_store.table.version == version
+    assert cache.pending_accesses == {"model": {first["hash"], second["hash"]}}
+
+    cache.put_many(_items(["c"]), "other-model")
+    cache.get_many([first["hash"]], "model")
+    cache.get_many([_items(["c"])[0]["hash"]], "other-model")
+
+    assert cache.pending_accesses == {}
+    assert cache.vector_store.table.version > version
+
+
+def test_cache_persists_across_instances(temp_db_path):
+    items = _items(["a"])
+    EmbeddingCache("test_cache", temp_db_path).put_many(items, "model")
+
+    reopened = EmbeddingCache("test_cache", temp_db_path)
+
+    assert items[0]["hash"] in reopened.get_many([items[0]["hash"]], "model")
+
+
+@pytest.mark.asyncio
+async def test_embed_store_many_warm_run_makes_no_calls(temp_db_path):
+    embedder = CountingEmbedder(temp_db_path)
+    texts = ["alpha", "beta", "gamma"]
+
+    cold = await embedder.embed_store_many(
+        [{"hash": "", "text": t, "additional_details": {"cid": i}} for i, t in enumerate(texts)]
+    )
+    assert sorted(embedder.calls) == sorted(texts)
+
+    embedder.calls.clear()
+    warm = await embedder.embed_store_many(
+        [{"hash": "", "text": t, "additional_details": {"cid": i + 10}} for i, t in enumerate(texts)]
+    )
+
+    assert embedder.calls == []
+    assert [item["text"] for item in warm] == texts
+    assert [item["additional_details"] for item in warm] == [
+        '{"cid": 10}',
+        '{"cid": 11}',
+        '{"cid": 12}',
+    ]
+    for cold_item, warm_item in zip(cold, warm):
+        np.testing.assert_allclose(warm_item["vector"], cold_item["vector"])
+
+
+@pytest.mark.asyncio
+async def test_embed_store_many_embeds_duplicates_once(temp_db_path):
+    embedder = CountingEmbedder(temp_db_path)
+
+    result = await embedder.embed_store_many(
+        [{"hash": "", "text": "same"}, {"hash": "", "text": "same"}], cache_data=False
+    )
+
+    assert embedder.calls == ["same"]
+    assert len(result) == 2
+    np.testing.assert_allclose(result[1]["vector"], result[0]["vector"])
+
+
+def test_pack_batches_respects_input_and_token_limits(temp_db_path):
+    embedder = CountingEmbedder(temp_db_path)
+    embedder.max_batch_inputs = 3
+    embedder.max_batch_tokens = 10
+    items = [{"hash": "", "text": "x" * 8} for _ in range(7)]
+
+    batches = embedder._pack_batches(items)
+
+    # Each text is estimated at 3 tokens, so the input limit is reached first
+    assert [len(batch) for batch in batches] == [3, 3, 1]
+
+    embedder.max_batch_tokens = 7
+    assert [len(batch) for batch in embedder._pack_batches(items)] == [2, 2, 2, 1]
+
+
+@pytest.mark.asyncio
+async def test_embed_store_many_sends_packed_batches(temp_db_path):
+    embedder = CountingEmbedder(temp_db_path)
+    embedder.max_batch_inputs = 2
+    requests = []
+
+    async def generate_embeddings_async(texts):
+        requests.append(list(texts))
+        return np.ones((len(texts), 3), dtype=np.float32)
+
+    embedder._generate_embeddings_async = generate_embeddings_async
+
+    result = await embedder.embed_store_many(
+        [{"hash": "", "text": t} for t in ["a", "b", "c"]], cache_data=False
+    )
+
+    assert requests == [["a", "b"], ["c"]]
+    assert all(item["vector"].dtype == np.float32 for item in result)
+
+
+def test_embed_store_one_uses_cache(temp_db_path):
+    embedder = CountingEmbedder(temp_db_path)
+
+    first = embedder.embed_store_one("query")
+    second = embedder.embed_store_one("query")
+
+    assert embedder.calls == ["query"]
+    np.testing.assert_allclose(second, first)
@@ -148,3 +148,24 @@ def test_local_embedder_check_token_count_disabled(temp_db_path):
         
         # Verify check_token_count is disabled for local embedder
         assert embedder.check_token_count == False
+
+
+@pytest.mark.asyncio
+async def test_local_embedder_generate_embeddings_async_encodes_batch(temp_db_path):
+    with patch("intelligence_toolkit.AI.local_embedder.SentenceTransformer") as mock_st:
+        mock_model = MagicMock()
+        mock_st.return_value = mock_model
+
+        import numpy as np
+        mock_model.encode.return_value = np.array([[0.1, 0.2], [0.3, 0.4]])
+
+        embedder = LocalEmbedder(
+            db_name="test_embeddings",
+            db_path=temp_db_path,
+        )
+
+        result = await embedder._generate_embeddings_async(["text1", "text2"])
+
+        assert result.dtype == np.float32
+        assert result.shape == (2, 2)
+        mock_model.encode.assert_called_once_with(["text1", "text2"])
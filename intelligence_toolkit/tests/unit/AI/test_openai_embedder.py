@@ -1,13 +1,16 @@
 # Copyright (c) 2024 Microsoft Corporation. All rights reserved.
 # Licensed under the MIT license. See LICENSE file in the project.
 #
+import asyncio
 import tempfile
 from unittest.mock import AsyncMock, MagicMock, patch
 
+import numpy as np
 import pytest
 
 from intelligence_toolkit.AI.openai_configuration import OpenAIConfiguration
 from intelligence_toolkit.AI.openai_embedder import OpenAIEmbedder
+from intelligence_toolkit.AI.rate_limiter import reset_rate_limiters
 
 
 @pytest.fixture
@@ -112,3 +115,82 @@ def test_openai_embedder_uses_configured_model(openai_config, temp_db_path):
         
         call_kwargs = mock_client.embeddings.create.call_args[1]
         assert call_kwargs["model"] == "text-embedding-3-small"
+
+
+@pytest.mark.asyncio
+async def test_openai_embedder_generate_embeddings_async_single_request(
+    openai_config, temp_db_path
+):
+    with patch("intelligence_toolkit.AI.client.OpenAI"), \
+         patch("intelligence_toolkit.AI.client.AsyncOpenAI") as mock_async_openai:
+
+        mock_async_client = MagicMock()
+        mock_async_openai.return_value = mock_async_client
+
+        first, second = MagicMock(), MagicMock()
+        first.index, first.embedding = 0, [0.1, 0.2]
+        second.index, second.embedding = 1, [0.3, 0.4]
+        mock_embedding_response = MagicMock()
+        # The API does not guarantee ordering, so results are sorted by index
+        mock_embedding_response.data = [second, first]
+        mock_async_client.embeddings.create = AsyncMock(return_value=mock_embedding_response)
+
+        embedder = OpenAIEmbedder(
+            openai_config,
+            db_name="test_embeddings",
+            db_path=temp_db_path
+        )
+
+        result = await embedder._generate_embeddings_async(["text1", "text2"])
+
+        assert result.dtype == np.float32
+        assert result.shape == (2, 2)
+        np.testing.assert_allclose(result, [[0.1, 0.2], [0.3, 0.4]])
+        mock_async_client.embeddings.create.assert_called_once()
+        call_kwargs = mock_async_client.embeddings.create.call_args[1]
+        assert call_kwargs["input"] == ["text1", "text2"]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("concurrency", [1, 3])
+async def test_openai_embedder_batches_share_one_limiter_slot(
+    openai_config, temp_db_path, concurrency
+):
+    # The embedder and its client share one limiter; each request must take a
+    # single slot, or more batches than slots deadlock until the timeout
+    reset_rate_limiters()
+    with patch("intelligence_toolkit.AI.client.OpenAI"), \
+         patch("intelligence_toolkit.AI.client.AsyncOpenAI") as mock_async_openai:
+
+        async def create(input, model):
+            await asyncio.sleep(0.01)
+            response = MagicMock()
+            response.data = [
+                MagicMock(index=i, embedding=[float(i), 1.0]) for i in range(len(input))
+            ]
+            return response
+
+        mock_async_client = MagicMock()
+        mock_async_client.embeddings.create = AsyncMock(side_effect=create)
+        mock_async_openai.return_value = mock_async_client
+
+        embedder = OpenAIEmbedder(
+            openai_config,
+            db_name="test_embeddings",
+            db_path=temp_db_path,
+            concurrent_coroutines=concurrency,
+        )
+        embedder.max_batch_inputs = 1
+        assert embedder.rate_limiter is embedder.openai_client.embedding_rate_limiter
+
+        data = [
+            {"hash": "", "text": f"text {i}", "additional_details": {}}
+            for i in range(6)
+        ]
+        result = await asyncio.wait_for(
+            embedder.embed_store_many(data, cache_data=False), timeout=5
+        )
+
+        assert len(result) == 6
+        assert mock_async_client.embeddings.create.call_count == 6
+    reset_rate_limiters()
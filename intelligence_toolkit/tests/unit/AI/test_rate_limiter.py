@@ -0,0 +1,141 @@
+# Copyright (c) 2024 Microsoft Corporation. All rights reserved.
+# Licensed under the MIT license. See LICENSE file in the project.
+#
+import asyncio
+from unittest.mock import MagicMock
+
+import pytest
+
+from intelligence_toolkit.AI.rate_limiter import (
+    RateLimiter,
+    TokenBucket,
+    get_rate_limiter,
+    is_rate_limit_error,
+)
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+
+def test_token_bucket_wait_time():
+    bucket = TokenBucket(60)
+    assert bucket.wait_time(60) == 0
+    bucket.consume(60)
+    # One unit refills per second
+    assert bucket.wait_time(1) == pytest.approx(1, abs=0.05)
+
+
+def test_token_bucket_clamps_oversized_requests():
+    bucket = TokenBucket(10)
+    assert bucket.wait_time(1000) == 0
+
+
+@pytest.mark.asyncio
+async def test_limit_caps_concurrency():
+    limiter = RateLimiter(max_concurrency=2)
+    peak = 0
+
+    async def work():
+        nonlocal peak
+        async with limiter.limit():
+            peak = max(peak, limiter.in_flight)
+            await asyncio.sleep(0.02)
+
+    await asyncio.gather(*[work() for _ in range(6)])
+
+    assert peak == 2
+    assert limiter.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_limit_waits_for_token_budget():
+    limiter = RateLimiter(max_concurrency=10, tokens_per_minute=600)
+    async with limiter.limit(600):
+        pass
+
+    assert limiter._try_acquire(10) == pytest.approx(1, abs=0.05)
+
+
+@pytest.mark.asyncio
+async def test_limit_halves_concurrency_when_throttled():
+    limiter = RateLimiter(max_concurrency=8)
+    error = Exception("Problem in OpenAI response")
+    error.__cause__ = RateLimitError()
+
+    with pytest.raises(Exception, match="Problem in OpenAI response"):
+        async with limiter.limit():
+            raise error
+
+    assert limiter.concurrency_limit == 4
+    assert limiter.throttled_requests == 1
+
+
+@pytest.mark.asyncio
+async def test_limit_grows_concurrency_additively():
+    limiter = RateLimiter(max_concurrency=8)
+    limiter.concurrency_limit = 4
+
+    for _ in range(4):
+        async with limiter.limit():
+            pass
+
+    assert 4.9 < limiter.concurrency_limit < 5.1
+
+
+@pytest.mark.asyncio
+async def test_limit_other_errors_do_not_reduce_concurrency():
+    limiter = RateLimiter(max_concurrency=8)
+
+    with pytest.raises(ValueError):
+        async with limiter.limit():
+            raise ValueError
+
+    assert limiter.concurrency_limit == 8
+
+
+@pytest.mark.asyncio
+async def test_limit_is_reentrant_within_a_task():
+    limiter = RateLimiter(max_concurrency=1)
+    token_count = MagicMock(return_value=5)
+
+    async with limiter.limit(), limiter.limit(token_count):
+        assert limiter.in_flight == 1
+
+    token_count.assert_not_called()
+    assert limiter.in_flight == 0
+
+
+def test_limit_sync():
+    limiter = RateLimiter(max_concurrency=1, requests_per_minute=60)
+
+    with limiter.limit_sync(), limiter.limit_sync():
+        assert limiter.in_flight == 1
+
+    assert limiter.in_flight == 0
+    assert limiter.request_bucket.available < 60
+
+
+def test_get_rate_limiter_shares_by_key():
+    first = get_rate_limiter(("chat", "OpenAI", None, "gpt-4"), 10)
+    second = get_rate_limiter(("chat", "OpenAI", None, "gpt-4"), 20, tokens_per_minute=1000)
+    other = get_rate_limiter(("chat", "OpenAI", None, "gpt-4o"), 10)
+
+    assert first is second
+    assert first is not other
+    assert first.max_concurrency == 20
+    assert first.token_bucket.capacity == 1000
+
+
+def test_get_rate_limiter_keeps_existing_budget():
+    limiter = get_rate_limiter(("embedding",), 10, tokens_per_minute=1000)
+    limiter.token_bucket.consume(1000)
+
+    get_rate_limiter(("embedding",), 10, tokens_per_minute=1000)
+
+    assert limiter.token_bucket.available < 1000
+
+
+def test_is_rate_limit_error():
+    assert is_rate_limit_error(RateLimitError())
+    assert not is_rate_limit_error(ValueError())
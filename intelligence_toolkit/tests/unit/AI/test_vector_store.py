@@ -5,6 +5,7 @@ import tempfile
 from pathlib import Path
 from unittest.mock import MagicMock, patch
 
+import numpy as np
 import pyarrow as pa
 import pytest
 
@@ -195,3 +196,89 @@ def test_vector_store_drop_table_without_table():
         
         with pytest.raises(ValueError, match="Table not initialized"):
             store.drop_table()
+
+
+def test_vector_store_create_vector_index(temp_db_path):
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(300, 8)).astype(np.float32)
+    index_schema = pa.schema(
+        [pa.field("cid", pa.int64()), pa.field("vector", pa.list_(pa.float32(), 8))]
+    )
+    vector_store = VectorStore("test_index_table", temp_db_path, index_schema)
+    vector_store.save(
+        pa.table(
+            {
+                "cid": list(range(300)),
+                "vector": pa.FixedSizeListArray.from_arrays(pa.array(vectors.ravel()), 8),
+            },
+            schema=index_schema,
+        )
+    )
+    assert not vector_store.has_vector_index()
+
+    vector_store.create_vector_index(num_partitions=4, num_sub_vectors=2)
+
+    assert vector_store.has_vector_index()
+    result = vector_store.search_by_vector(
+        vectors[7],
+        k=3,
+        metric="cosine",
+        nprobes=4,
+        refine_factor=10,
+        columns=["cid"],
+    )
+    assert result[0]["cid"] == 7
+    assert "vector" not in result[0]
+
+
+access_schema = pa.schema(
+    [
+        pa.field("hash", pa.string()),
+        pa.field("model", pa.string()),
+        pa.field("accessed_at", pa.int64()),
+    ]
+)
+
+
+def test_vector_store_update_by_keys(temp_db_path):
+    store = VectorStore("test_access_table", temp_db_path, access_schema)
+    hashes = [f"h{i}" for i in range(20000)]
+    store.save(
+        pa.table(
+            {
+                "hash": hashes + ["h0"],
+                "model": ["a"] * len(hashes) + ["b"],
+                "accessed_at": [0] * (len(hashes) + 1),
+            },
+            schema=access_schema,
+        )
+    )
+    version = store.table.version
+
+    store.update_by_keys(hashes[::2], "hash", {"accessed_at": 7}, {"model": "a"})
+
+    assert store.table.version == version + 1
+    assert store.table.count_rows() == len(hashes) + 1
+    updated = store.table.to_lance().to_table(filter="accessed_at = 7")
+    assert sorted(updated.column("hash").to_pylist()) == sorted(hashes[::2])
+    assert set(updated.column("model").to_pylist()) == {"a"}
+
+
+def test_vector_store_evict_oldest_splits_ties(temp_db_path):
+    store = VectorStore("test_access_table", temp_db_path, access_schema)
+    store.save(
+        pa.table(
+            {
+                "hash": ["d", "c", "b", "a", "e"],
+                "model": ["a"] * 5,
+                "accessed_at": [1, 1, 1, 1, 2],
+            },
+            schema=access_schema,
+        )
+    )
+
+    evicted = store.evict_oldest(3, ["accessed_at", "hash"])
+
+    assert evicted == 2
+    kept = store.table.to_arrow().column("hash").to_pylist()
+    assert sorted(kept) == ["c", "d", "e"]
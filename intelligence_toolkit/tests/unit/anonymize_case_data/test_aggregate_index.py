@@ -0,0 +1,60 @@
+# Copyright (c) 2024 Microsoft Corporation. All rights reserved.
+# Licensed under the MIT license. See LICENSE file in the project.
+
+import pandas as pd
+
+from intelligence_toolkit.anonymize_case_data.aggregate_index import AggregateIndex
+
+
+def _adf():
+    return pd.DataFrame(
+        {
+            "selections": [
+                "record_count",
+                "Color:Red",
+                "Color:Red;Size:Large",
+                "Size:Small;Color:Blue",
+                "Color:Red;Size:Large",
+                "Color:Red;Size:Large;Year:2020",
+            ],
+            "protected_count": [100, 40, 25, 10, 99, 5],
+        }
+    )
+
+
+def test_count_ignores_selection_order():
+    aggregates = AggregateIndex(_adf())
+
+    assert aggregates.count(["Size:Large", "Color:Red"]) == 25
+    assert aggregates.count(["Color:Blue", "Size:Small"]) == 10
+    assert aggregates.count(["record_count"]) == 100
+
+
+def test_count_of_unreported_combination_is_zero():
+    aggregates = AggregateIndex(_adf())
+
+    assert aggregates.count(["Color:Green"]) == 0
+
+
+def test_containing_intersects_postings():
+    aggregates = AggregateIndex(_adf())
+
+    assert aggregates.containing({"Color", "Size"}, set()).tolist() == [2, 3, 4, 5]
+    assert aggregates.containing({"Size"}, {"Color:Red"}).tolist() == [2, 4, 5]
+    assert aggregates.containing({"Year"}, {"Color:Blue"}).tolist() == []
+    assert aggregates.containing(set(), set()).tolist() == list(range(6))
+
+
+def test_custom_separators():
+    adf = pd.DataFrame({"selections": ["Size=Large|Color=Red"], "protected_count": [3]})
+    aggregates = AggregateIndex(adf, att_separator="|", val_separator="=")
+
+    assert aggregates.count(["Color=Red", "Size=Large"]) == 3
+    assert aggregates.containing({"Color"}, set()).tolist() == [0]
+
+
+def test_empty_aggregates():
+    aggregates = AggregateIndex(pd.DataFrame())
+
+    assert aggregates.count(["Color:Red"]) == 0
+    assert aggregates.containing({"Color"}, set()).tolist() == []
@@ -5,7 +5,10 @@ import pytest
 import pandas as pd
 import math
 from unittest.mock import MagicMock, patch, Mock
-from intelligence_toolkit.anonymize_case_data.api import AnonymizeCaseData
+from intelligence_toolkit.anonymize_case_data.api import (
+    DEFAULT_SWEEP_WORKERS,
+    AnonymizeCaseData,
+)
 from intelligence_toolkit.anonymize_case_data.synthesizability_statistics import (
     SynthesizabilityStatistics,
 )
@@ -182,6 +185,33 @@ def test_get_data_schema():
     assert "Size" in schema
 
 
+def test_synthetic_index_rebuilt_when_data_replaced():
+    acd = AnonymizeCaseData()
+    acd.synthetic_df = pd.DataFrame({"Color": ["Red", "Blue"]})
+
+    index = acd.get_synthetic_index()
+    assert acd.get_synthetic_index() is index
+
+    acd.synthetic_df = pd.DataFrame({"Color": ["Green"]})
+    rebuilt = acd.get_synthetic_index()
+
+    assert rebuilt is not index
+    assert rebuilt.sdf is acd.synthetic_df
+
+
+def test_aggregate_index_rebuilt_when_aggregates_replaced():
+    acd = AnonymizeCaseData()
+    acd.aggregate_df = pd.DataFrame({"selections": ["A:1"], "protected_count": [5]})
+
+    index = acd.get_aggregate_index()
+    assert acd.get_aggregate_index() is index
+    assert acd.get_aggregate_index(val_separator="=") is not index
+
+    acd.aggregate_df = pd.DataFrame({"selections": ["A:2"], "protected_count": [7]})
+
+    assert acd.get_aggregate_index().count(["A:2"]) == 7
+
+
 @patch("intelligence_toolkit.anonymize_case_data.api.queries.compute_aggregate_graph")
 def test_compute_aggregate_graph_df(mock_compute):
     mock_compute.return_value = pd.DataFrame({"Source": ["A"], "Target": ["B"]})
@@ -320,3 +350,90 @@ def test_analyze_synthesizability_single_row():
 
     assert stats.num_cols == 2
     assert stats.possible_combinations_per_row == 1.0  # 1 combination / 1 row
+
+
+def test_sweep_epsilons():
+    acd = AnonymizeCaseData()
+    df = pd.DataFrame(
+        {
+            "A": [str(i % 3) for i in range(200)],
+            "B": [str(i % 4) for i in range(200)],
+            "C": [str(i % 5) for i in range(200)],
+        }
+    )
+    strategies = [
+        AnonymizeCaseData.FabricationStrategy.BALANCED,
+        AnonymizeCaseData.FabricationStrategy.MINIMIZED,
+    ]
+
+    result = acd.sweep_epsilons(df, [6.0, 12.0], strategies, max_workers=1)
+
+    assert result["Epsilon"].tolist() == [6.0, 12.0, 6.0, 12.0]
+    assert result["Fabrication Strategy"].tolist() == [
+        "BALANCED",
+        "BALANCED",
+        "MINIMIZED",
+        "MINIMIZED",
+    ]
+    assert (result["Protected Records"] > 0).all()
+    assert result["Synthetic Suppressed %"].between(0, 100).all()
+    # The sweep leaves the workflow state alone
+    assert acd.synthetic_df.empty
+
+
+@patch("intelligence_toolkit.anonymize_case_data.api.ProcessPoolExecutor")
+def test_sweep_epsilons_shares_sensitive_aggregates(mock_executor_class):
+    mock_executor = mock_executor_class.return_value.__enter__.return_value
+    mock_executor.map.return_value = []
+
+    acd = AnonymizeCaseData()
+    df = pd.DataFrame({"A": ["1", "2"], "B": ["3", "4"]})
+
+    result = acd.sweep_epsilons(df, [1.0, 2.0], reporting_length=2, max_workers=2)
+
+    kwargs = mock_executor_class.call_args.kwargs
+    raw_data, sensitive_aggregates, parameters = kwargs["initargs"]
+    assert kwargs["max_workers"] == 2
+    assert raw_data == [["A", "B"], ["1", "3"], ["2", "4"]]
+    assert sensitive_aggregates.filter(key="A:1")["count"].to_list() == [1]
+    assert parameters["reporting_length"] == 2
+    assert list(mock_executor.map.call_args.args[1]) == [
+        (1.0, "BALANCED"),
+        (2.0, "BALANCED"),
+    ]
+    assert len(result) == 0
+
+
+def test_sweep_epsilons_in_spawned_workers():
+    acd = AnonymizeCaseData()
+    df = pd.DataFrame(
+        {
+            "A": [str(i % 3) for i in range(200)],
+            "B": [str(i % 4) for i in range(200)],
+        }
+    )
+
+    result = acd.sweep_epsilons(df, [6.0, 12.0], reporting_length=2, max_workers=2)
+
+    assert result["Epsilon"].tolist() == [6.0, 12.0]
+    assert result["Fabrication Strategy"].tolist() == ["BALANCED", "BALANCED"]
+    assert (result["Protected Records"] > 0).all()
+    assert result["Aggregate Suppressed %"].between(0, 100).all()
+
+
+@patch("intelligence_toolkit.anonymize_case_data.api.ProcessPoolExecutor")
+def test_sweep_epsilons_defaults_to_few_workers(mock_executor_class):
+    mock_executor_class.return_value.__enter__.return_value.map.return_value = []
+    acd = AnonymizeCaseData()
+    df = pd.DataFrame({"A": ["1", "2"], "B": ["3", "4"]})
+
+    acd.sweep_epsilons(df, [1.0, 2.0, 4.0, 8.0], reporting_length=2)
+
+    assert mock_executor_class.call_args.kwargs["max_workers"] == DEFAULT_SWEEP_WORKERS
+
+
+def test_sweep_epsilons_unknown_accuracy_mode():
+    acd = AnonymizeCaseData()
+
+    with pytest.raises(ValueError, match="Unknown accuracy mode"):
+        acd.sweep_epsilons(pd.DataFrame({"A": ["1"]}), [1.0], accuracy_mode="fast")
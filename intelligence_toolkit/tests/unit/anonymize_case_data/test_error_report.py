@@ -5,7 +5,10 @@ import pytest
 import pandas as pd
 import numpy as np
 from collections import defaultdict
-from intelligence_toolkit.anonymize_case_data.error_report import ErrorReport
+from intelligence_toolkit.anonymize_case_data.error_report import (
+    ErrorReport,
+    aggregate_frame,
+)
 
 
 def test_error_report_initialization():
@@ -161,3 +164,32 @@ def test_calc_errors_with_no_overlap():
     # No common keys, so errors list is empty - mean of empty is nan
     assert np.isnan(report.mean_error)
     assert len(report.mean_error_by_len) == 0
+
+
+def test_aggregate_frame_measures_string_keys():
+    frame = aggregate_frame({"A:1;B:2": 10, "C:3": 5})
+
+    assert frame["key"].to_list() == ["A:1;B:2", "C:3"]
+    assert frame["length"].to_list() == [2, 1]
+    assert frame["count"].to_list() == [10, 5]
+
+
+def test_gen_same_for_string_and_tuple_keys():
+    src_aggs = {("A:1",): 100, ("A:1", "B:2"): 40, ("C:3",): 8}
+    target_aggs = {("A:1",): 97, ("A:1", "B:2"): 44, ("D:4",): 2}
+
+    expected = ErrorReport(src_aggs, target_aggs).gen()
+    joined_src = {";".join(k): v for k, v in src_aggs.items()}
+    joined_target = {";".join(k): v for k, v in target_aggs.items()}
+
+    pd.testing.assert_frame_equal(
+        ErrorReport(joined_src, joined_target).gen(), expected
+    )
+    pd.testing.assert_frame_equal(
+        ErrorReport(aggregate_frame(joined_src), joined_target).gen(), expected
+    )
+    assert expected["Count +/- Error"].tolist() == [
+        "54.00 +/- 3.00",
+        "40.00 +/- 4.00",
+        "49.33 +/- 3.50",
+    ]
@@ -408,6 +408,63 @@ def test_compute_time_series_query_filters_empty_times():
     assert "" not in result["Year"].values
 
 
+def test_compute_time_series_query_uses_period_aggregates():
+    sdf = pd.DataFrame(
+        {
+            "Year": ["2020", "2020", "2021", "2022"],
+            "Color": ["Red", "Blue", "Red", "Blue"],
+        }
+    )
+    adf = pd.DataFrame(
+        {"selections": ["Color:Red;Year:2021"], "protected_count": [7]}
+    )
+
+    result = compute_time_series_query([], sdf, adf, "Year", ["Color"])
+
+    assert list(result.index) == list(range(6))
+    assert result[["Year", "Attribute Value", "Count", "Dataset"]].values.tolist() == [
+        ["2020", "Color:Blue", 1, "Synthetic"],
+        ["2020", "Color:Red", 1, "Synthetic"],
+        ["2021", "Color:Blue", 0, "Aggregate"],
+        ["2021", "Color:Red", 7, "Aggregate"],
+        ["2022", "Color:Blue", 1, "Synthetic"],
+        ["2022", "Color:Red", 0, "Aggregate"],
+    ]
+
+
+def test_compute_time_series_query_with_period_in_query():
+    sdf = pd.DataFrame(
+        {
+            "Year": ["2020", "2020", "2021"],
+            "Color": ["Red", "Blue", "Red"],
+        }
+    )
+    adf = pd.DataFrame({"selections": [], "protected_count": []})
+    query = [{"attribute": "Year", "value": "2020"}]
+
+    result = compute_time_series_query(query, sdf, adf, "Year", ["Color"])
+
+    # 2021 is combined with the selected 2020 records
+    red = result[result["Attribute Value"] == "Color:Red"]
+    assert red["Count"].tolist() == [1, 2]
+
+
+def test_compute_time_series_query_without_times():
+    sdf = pd.DataFrame({"Year": ["", ""], "Color": ["Red", "Blue"]})
+    adf = pd.DataFrame({"selections": [], "protected_count": []})
+
+    result = compute_time_series_query([], sdf, adf, "Year", ["Color"])
+
+    assert len(result) == 0
+    assert list(result.columns) == [
+        "Year",
+        "Attribute",
+        "Attribute Value",
+        "Count",
+        "Dataset",
+    ]
+
+
 def test_compute_top_attributes_query_with_selection():
     sdf = pd.DataFrame(
         {
@@ -475,3 +532,28 @@ def test_compute_top_attributes_query_with_aggregate_counts():
 
     # Should include both Synthetic and Aggregate datasets
     assert "Aggregate" in result["Dataset"].values or "Synthetic" in result["Dataset"].values
+
+
+def test_queries_share_synthetic_index():
+    from intelligence_toolkit.anonymize_case_data.synthetic_index import (
+        SyntheticIndex,
+    )
+
+    sdf = pd.DataFrame(
+        {
+            "Color": ["Red", "Blue", "Red", "Red"],
+            "Size": ["Large", "Small", "Small", "Large"],
+            "Year": ["2020", "2020", "2021", "2021"],
+        }
+    )
+    adf = pd.DataFrame({"selections": [], "protected_count": []})
+    index = SyntheticIndex(sdf)
+    query = [{"attribute": "Color", "value": "Red"}]
+
+    graph = compute_synthetic_graph(sdf, [], "Color", "Size", "Year:2021", index=index)
+    top = compute_top_attributes_query(query, sdf, adf, [], 0, index=index)
+    series = compute_time_series_query(query, sdf, adf, "Year", ["Size"], index=index)
+
+    assert graph.equals(compute_synthetic_graph(sdf, [], "Color", "Size", "Year:2021"))
+    assert top.equals(compute_top_attributes_query(query, sdf, adf, [], 0))
+    assert series.equals(compute_time_series_query(query, sdf, adf, "Year", ["Size"]))
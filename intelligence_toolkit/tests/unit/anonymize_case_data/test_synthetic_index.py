@@ -0,0 +1,68 @@
+# Copyright (c) 2024 Microsoft Corporation. All rights reserved.
+# Licensed under the MIT license. See LICENSE file in the project.
+
+import numpy as np
+import pandas as pd
+
+import intelligence_toolkit.anonymize_case_data.synthetic_index as synthetic_index
+from intelligence_toolkit.anonymize_case_data.synthetic_index import SyntheticIndex
+
+
+def _sdf():
+    return pd.DataFrame(
+        {
+            "Color": ["Red", "Blue", "Red", "Green", "Red", "", "Blue", "Red", "Blue"],
+            "Size": ["L", "S", "S", "L", "", "L", "S", "L", "L"],
+        }
+    )
+
+
+def test_select_matches_data_frame_filters():
+    sdf = _sdf()
+    index = SyntheticIndex(sdf)
+
+    selected = index.select({"Color": ["Red", "Blue"], "Size": ["L"]})
+
+    expected = sdf["Color"].isin(["Red", "Blue"]) & (sdf["Size"] == "L")
+    np.testing.assert_array_equal(index.rows(selected), expected.to_numpy())
+    assert index.count(selected) == expected.sum()
+
+
+def test_select_without_filters_keeps_all_rows():
+    index = SyntheticIndex(_sdf())
+
+    assert index.count(index.select({})) == 9
+
+
+def test_unknown_value_selects_nothing():
+    index = SyntheticIndex(_sdf())
+
+    assert index.count(index.bitmap("Color", ["Purple"])) == 0
+
+
+def test_value_counts_and_first_codes():
+    index = SyntheticIndex(_sdf())
+    rows = index.rows(index.bitmap("Size", ["L"]))
+
+    counts = index.value_counts("Color", rows)
+    order = [index.values["Color"][c] for c in index.first_codes("Color", rows)]
+
+    assert dict(zip(index.values["Color"], counts.tolist())) == {
+        "Red": 2,
+        "Blue": 1,
+        "Green": 1,
+        "": 1,
+    }
+    assert order == ["Red", "Green", "", "Blue"]
+
+
+def test_value_bitmaps_are_cached(monkeypatch):
+    monkeypatch.setattr(synthetic_index, "BITMAP_CACHE_SIZE", 2)
+    index = SyntheticIndex(_sdf())
+
+    first = index._value_bitmap("Color", 0)
+    assert index._value_bitmap("Color", 0) is first
+    index._value_bitmap("Color", 1)
+    index._value_bitmap("Color", 2)
+
+    assert list(index._bitmaps) == [("Color", 1), ("Color", 2)]
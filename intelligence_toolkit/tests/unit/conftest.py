@@ -0,0 +1,17 @@
+# Copyright (c) 2024 Microsoft Corporation. All rights reserved.
+# Licensed under the MIT license. See LICENSE file in the project.
+#
+import pytest
+
+from intelligence_toolkit.AI.client import reset_client_pool
+from intelligence_toolkit.AI.rate_limiter import reset_rate_limiters
+
+
+@pytest.fixture(autouse=True)
+def clean_shared_clients():
+    # Pooled clients and limiters outlive a test, so patched classes would leak
+    reset_client_pool()
+    reset_rate_limiters()
+    yield
+    reset_client_pool()
+    reset_rate_limiters()
@@ -0,0 +1,69 @@
+# Copyright (c) 2024 Microsoft Corporation. All rights reserved.
+# Licensed under the MIT license. See LICENSE file in the project.
+#
+
+import pandas as pd
+import pytest
+
+from intelligence_toolkit.detect_case_patterns.record_counter import RecordCounter
+from intelligence_toolkit.helpers.constants import ATTRIBUTE_VALUE_SEPARATOR as SEP
+
+
+@pytest.fixture
+def model_df():
+    rows = [
+        ("s1", "P1", f"Color{SEP}Red"),
+        ("s1", "P1", f"Size{SEP}L"),
+        ("s2", "P1", f"Color{SEP}Blue"),
+        ("s2", "P1", f"Size{SEP}L"),
+        ("s3", "P2", f"Color{SEP}Red"),
+        ("s3", "P2", f"Size{SEP}S"),
+        ("s1", "P2", f"Color{SEP}Red"),
+    ]
+    return pd.DataFrame(rows, columns=["Subject ID", "Period", "Full Attribute"])
+
+
+def test_count_records_intersects_types(model_df):
+    rc = RecordCounter(model_df)
+
+    assert rc.count_records([f"Color{SEP}Red"]) == 2
+    assert rc.count_records([f"Color{SEP}Red", f"Size{SEP}L"]) == 1
+    assert rc.count_records(["P2", f"Color{SEP}Red"]) == 2
+    assert rc.count_records(["P1", "P2"]) == 1
+
+
+def test_count_records_unions_values_of_one_type(model_df):
+    rc = RecordCounter(model_df)
+
+    assert rc.count_records([f"Color{SEP}Red", f"Color{SEP}Blue"]) == 3
+    assert rc.count_records([f"Color{SEP}Red", f"Color{SEP}Blue", f"Size{SEP}L"]) == 2
+
+
+def test_count_records_empty_query(model_df):
+    rc = RecordCounter(model_df)
+
+    assert rc.count_records([]) == 0
+
+
+def test_caches_are_bounded(model_df):
+    rc = RecordCounter(model_df, cache_size=2, bitmap_cache_size=2)
+
+    rc.count_records([f"Color{SEP}Red"])
+    rc.count_records([f"Size{SEP}L", "P1"])
+    rc.count_records([f"Color{SEP}Red"])
+    rc.count_records([f"Size{SEP}S"])
+
+    assert list(rc.cache) == [f"Color{SEP}Red", f"Size{SEP}S"]
+    assert len(rc.bitmaps) == 2
+    assert rc.count_records([f"Size{SEP}L", "P1"]) == 2
+
+
+def test_create_time_series_rows(model_df):
+    rc = RecordCounter(model_df)
+
+    rows = rc.create_time_series_rows([f"Color{SEP}Red"])
+
+    assert rows == [
+        ["P1", f"Color{SEP}Red", 1],
+        ["P2", f"Color{SEP}Red", 2],
+    ]
@@ -2,6 +2,8 @@
 # Licensed under the MIT license. See LICENSE file in the project.
 #
 
+from collections import defaultdict
+
 import networkx as nx
 import polars as pl
 import pytest
@@ -13,6 +15,7 @@ from intelligence_toolkit.detect_entity_networks.explore_networks import (
     _merge_condition,
     _merge_node_list,
     _merge_nodes,
+    build_network_from_entities,
     get_entity_graph,
     get_type_color,
     hsl_to_hex,
@@ -147,6 +150,32 @@ class TestFuzzyNeighbors:
         assert ("Attr==Type108", "Attr==Type222") in result.edges()
 
 
+class TestBuildNetworkFromEntities:
+    def test_no_inferred_links(self, simple_graph) -> None:
+        result = build_network_from_entities(
+            simple_graph, {"ENTITY==1": 0}, selected_nodes=["ENTITY==1"]
+        )
+        assert set(result.neighbors("ENTITY==1")) == {"ENTITY==2", "Attr==Type1"}
+        assert result.nodes["ENTITY==1"]["network"] == "0"
+
+    def test_inferred_links_reverse(self, simple_graph) -> None:
+        inferred_links = defaultdict(set)
+        inferred_links["ENTITY==4"].add("ENTITY==1")
+        inferred_links["Attr==Type2"].add("AttributeABCD==Type35")
+
+        result = build_network_from_entities(
+            simple_graph,
+            {},
+            inferred_links=inferred_links,
+            selected_nodes=["ENTITY==1", "ENTITY==3"],
+        )
+
+        assert result.has_edge("ENTITY==1", "ENTITY==4")
+        assert result.has_edge("ENTITY==3", "AttributeABCD==Type35")
+        assert result.has_edge("AttributeABCD==Type35", "Attr==Type2")
+        assert result.has_edge("Attr==Type2", "AttributeABCD==Type47")
+
+
 class TestIntegrateFlags:
     @pytest.fixture()
     def graph_flags(self):
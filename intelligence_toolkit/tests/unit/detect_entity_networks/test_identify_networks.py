@@ -8,7 +8,10 @@ import polars as pl
 import pytest
 
 from intelligence_toolkit.detect_entity_networks.identify_networks import (
+    InferredAdjacency,
     build_entity_records,
+    build_inferred_adjacency,
+    get_attribute_neighbors,
     get_community_nodes,
     get_entity_neighbors,
     get_integrated_flags,
@@ -17,6 +20,7 @@ from intelligence_toolkit.detect_entity_networks.identify_networks import (
     project_entity_graph,
     trim_nodeset,
 )
+from intelligence_toolkit.detect_entity_networks.prepare_model import build_main_graph
 
 
 class TestTrimNodeset:
@@ -88,6 +92,48 @@ class TestTrimNodeset:
         assert trimmed_degrees == trimmed_degrees_expected
 
 
+class TestSharedValueHubs:
+    @pytest.fixture()
+    def hub_graph(self):
+        return build_main_graph(
+            [
+                [("1", "phone", "555"), ("2", "phone", "555"), ("2", "phone", "123")],
+                [("3", "fax", "555"), ("4", "fax", "999")],
+                [("5", "mobile", "555")],
+            ]
+        )
+
+    def test_attribute_neighbors(self, hub_graph) -> None:
+        assert get_attribute_neighbors(hub_graph, "phone==555") == {
+            "ENTITY==1",
+            "ENTITY==2",
+            "fax==555",
+            "mobile==555",
+        }
+
+    def test_trim_counts_shared_values(self, hub_graph) -> None:
+        trimmed_degrees, trimmed_nodes = trim_nodeset(hub_graph, 3)
+        assert trimmed_degrees == {("phone==555", 4)}
+        assert trimmed_nodes == {"phone==555"}
+
+    def test_projection_through_hub(self, hub_graph) -> None:
+        projected = project_entity_graph(hub_graph, set(), {}, [])
+        assert {frozenset(edge) for edge in projected.edges()} == {
+            frozenset(("ENTITY==1", "ENTITY==2")),
+            frozenset(("ENTITY==1", "ENTITY==3")),
+            frozenset(("ENTITY==1", "ENTITY==5")),
+            frozenset(("ENTITY==2", "ENTITY==3")),
+            frozenset(("ENTITY==2", "ENTITY==5")),
+            frozenset(("ENTITY==3", "ENTITY==5")),
+        }
+
+    def test_projection_masks_hub_members(self, hub_graph) -> None:
+        projected = project_entity_graph(hub_graph, {"fax==555"}, {}, ["mobile"])
+        assert {frozenset(edge) for edge in projected.edges()} == {
+            frozenset(("ENTITY==1", "ENTITY==2")),
+        }
+
+
 class TestProjectEntityGraph:
     @pytest.fixture()
     def simple_graph(self):
@@ -220,6 +266,39 @@ class TestProjectEntityGraph:
         assert ("ENTITY==5") in projected.nodes()
         assert ("ENTITY==4") not in projected.nodes()
 
+    def test_edges_through_linked_attributes(self, simple_graph) -> None:
+        inferred_links = defaultdict(set)
+        inferred_links["Attr==Type2"].add("AttributeABCD==Type35")
+        simple_graph.add_edge("ENTITY==4", "Attr==Type2")
+
+        projected = project_entity_graph(simple_graph, set(), inferred_links, [])
+
+        assert projected.has_edge("ENTITY==3", "ENTITY==4")
+        assert not projected.has_edge("ENTITY==1", "ENTITY==4")
+
+    def test_linked_attributes_masked(self, simple_graph) -> None:
+        inferred_links = defaultdict(set)
+        inferred_links["Attr==Type2"].add("AttributeABCD==Type35")
+        simple_graph.add_edge("ENTITY==4", "Attr==Type2")
+
+        supported = project_entity_graph(simple_graph, set(), inferred_links, ["Attr"])
+        trimmed = project_entity_graph(
+            simple_graph, {"AttributeABCD==Type35"}, inferred_links, []
+        )
+
+        assert "ENTITY==4" not in supported.nodes()
+        assert not supported.has_edge("ENTITY==1", "ENTITY==3")
+        assert "ENTITY==4" not in trimmed.nodes()
+        assert trimmed.has_edge("ENTITY==1", "ENTITY==3")
+
+    def test_edges_added_once_shortest_first(self, simple_graph) -> None:
+        projected = project_entity_graph(simple_graph, set(), {}, [])
+        assert list(projected.edges()) == [
+            ("ENTITY==1", "ENTITY==2"),
+            ("ENTITY==1", "ENTITY==3"),
+            ("ENTITY==3", "ENTITY==5"),
+        ]
+
 
 class TestValidNeighbor:
     @pytest.fixture()
@@ -255,6 +334,29 @@ class TestValidNeighbor:
         assert result is False
 
 
+class TestBuildInferredAdjacency:
+    def test_empty(self) -> None:
+        assert build_inferred_adjacency(None) == {}
+        assert build_inferred_adjacency({}) == {}
+
+    def test_indexes_both_directions(self) -> None:
+        inferred_links = defaultdict(set)
+        inferred_links["node5"].add("node2")
+        inferred_links["node7"].add("node2")
+        result = build_inferred_adjacency(inferred_links)
+        assert result == {
+            "node5": {"node2"},
+            "node7": {"node2"},
+            "node2": {"node5", "node7"},
+        }
+        assert dict(inferred_links) == {"node5": {"node2"}, "node7": {"node2"}}
+
+    def test_reuses_adjacency(self) -> None:
+        adjacency = build_inferred_adjacency({"node5": {"node2"}})
+        assert isinstance(adjacency, InferredAdjacency)
+        assert build_inferred_adjacency(adjacency) is adjacency
+
+
 class TestGetEntityNeighbors:
     @pytest.fixture()
     def graph(self):
@@ -678,6 +780,49 @@ class TestIntegratedFlags:
         assert flagged == 3.0
         assert community_flags == 5
 
+    def test_inferred_links_reverse(self, integrated_flags, qualified_entities) -> None:
+        inferred_links = defaultdict(set)
+        inferred_links["ENTITY==5"].add("ENTITY==1")
+        inferred_links["ENTITY==6"].add("ENTITY==3")
+
+        integrated_flags = integrated_flags.vstack(
+            pl.DataFrame(
+                {"qualified_entity": ["ENTITY==5", "ENTITY==6"], "count": [2, 0]}
+            )
+        )
+
+        (
+            community_flags,
+            flagged,
+            flagged_per_unflagged,
+            flags_per_entity,
+            total_entities,
+        ) = get_integrated_flags(integrated_flags, qualified_entities, inferred_links)
+
+        assert total_entities == 5
+        assert flagged == 3
+        assert community_flags == 6
+        assert flags_per_entity == 1.2
+        assert flagged_per_unflagged == 1.5
+
+    def test_flag_totals_used(self, integrated_flags, qualified_entities) -> None:
+        flag_totals = {"ENTITY==1": 2, "ENTITY==3": 4, "ENTITY==5": 1}
+        inferred_links = {"ENTITY==5": {"ENTITY==2"}}
+
+        (
+            community_flags,
+            flagged,
+            _,
+            _,
+            total_entities,
+        ) = get_integrated_flags(
+            integrated_flags, qualified_entities, inferred_links, flag_totals
+        )
+
+        assert community_flags == 7
+        assert flagged == 3
+        assert total_entities == 4
+
 
 class TestBuildEntityRecords:
     @pytest.fixture()
@@ -11,6 +11,7 @@ import pytest
 from intelligence_toolkit.detect_entity_networks.classes import FlagAggregatorType
 from intelligence_toolkit.detect_entity_networks.prepare_model import (
     build_flag_links,
+    build_flag_totals,
     build_flags,
     build_groups,
     build_main_graph,
@@ -81,10 +82,7 @@ class TestFormatDataColumns:
         assert mock_clean_text.call_count == 0
         assert result_df.equals(initial_df)
 
-    @patch("re.sub")
-    def test_special_characters_in_entity_id(self, mock_clean_text) -> None:
-        # Setup
-        mock_clean_text.side_effect = lambda _x, _y, _z: "cleaned"
+    def test_special_characters_in_entity_id(self) -> None:
         initial_df = pl.DataFrame(
             {
                 "entity_id": ["@123!", "#456$"],
@@ -96,9 +94,46 @@ class TestFormatDataColumns:
 
         result_df = format_data_columns(initial_df, columns_to_link, entity_id_column)
 
-        assert mock_clean_text.call_count == 8  # 4 for entity_id + 4 for name
-        for val in result_df[entity_id_column]:
-            assert val == "cleaned"
+        assert result_df[entity_id_column].to_list() == ["@123", "456"]
+
+    def test_matches_clean_text(self) -> None:
+        values = [
+            "  Hello,\t world!  ",
+            "Email me@home.com & bring snacks+",
+            "Ünïcödé — naïve café №5",
+            "東京都 港区\u3000六本木",
+            "tab\x1cseparated\x1fvalues",
+            "under_score (x) [y] {z}",
+            "½ ² ٣",
+            "!!!",
+            "",
+            None,
+        ]
+        initial_df = pl.DataFrame(
+            {
+                "entity_id": [1, -2, 3, 40, 5, 6, 7, 8, 9, None],
+                "text": values,
+                "flag": [True, False, None, True, False, True, False, True, False, None],
+            }
+        )
+
+        result_df = format_data_columns(initial_df, ["text", "flag"], "entity_id")
+
+        for column in ["entity_id", "text", "flag"]:
+            assert result_df[column].to_list() == [
+                None if value is None else clean_text(value)
+                for value in initial_df[column].to_list()
+            ]
+
+    def test_lazy_frame(self) -> None:
+        initial_df = pl.DataFrame({"entity_id": ["a.1", "b.2"], "name": ["J. Doe", "X"]})
+
+        result = format_data_columns(initial_df.lazy(), ["name"], "entity_id")
+
+        assert isinstance(result, pl.LazyFrame)
+        assert result.collect().equals(
+            pl.DataFrame({"entity_id": ["a1", "b2"], "name": ["J Doe", "X"]})
+        )
 
 
 class TestPrepareEntityAttribute:
@@ -160,6 +195,25 @@ class TestBuildUndirectedGraph:
         for edge in expected_edges:
             assert result.has_edge(edge[0], edge[1])
 
+    def test_shared_values_linked_through_hub(self) -> None:
+        network_attribute_links = [
+            [("Entity1", "phone", "555"), ("Entity2", "phone", "555")],
+            [("Entity3", "fax", "555"), ("Entity3", "fax", "777")],
+            [("Entity4", "mobile", "555")],
+        ]
+        result = build_main_graph(network_attribute_links)
+
+        assert set(result.neighbors("SHARED_VALUE==555")) == {
+            "phone==555",
+            "fax==555",
+            "mobile==555",
+        }
+        assert result.nodes["SHARED_VALUE==555"]["type"] == "SHARED_VALUE"
+        assert result.nodes["fax==555"]["type"] == "fax"
+        assert not result.has_edge("phone==555", "fax==555")
+        assert not result.has_node("SHARED_VALUE==777")
+        assert result.number_of_edges() == 8
+
 
 class TestBuildFlagLinks:
     @pytest.fixture()
@@ -459,6 +513,7 @@ class TestBuildFlags:
 
         assert result[1] == expected
 
+
     def test_mean_entity_flags_count(self, link_list_count) -> None:
         result = build_flags(link_list_count)
 
@@ -467,6 +522,22 @@ class TestBuildFlags:
         assert result[2] == expected
 
 
+class TestBuildFlagTotals:
+    def test_empty(self) -> None:
+        assert build_flag_totals() == {}
+        assert build_flag_totals(pl.DataFrame()) == {}
+
+    def test_totals_per_entity(self) -> None:
+        flags, _, _ = build_flags(
+            [
+                ["A", "flags_numb", "fraud", 3],
+                ["A", "flags_numb", "theft", 2],
+                ["C", "flags_numb", "fraud", 0],
+            ]
+        )
+        assert build_flag_totals(flags) == {"ENTITY==A": 5, "ENTITY==C": 0}
+
+
 class TestTransformEntity:
     def test_transform_entity_basic(self) -> None:
         entity = "12345"
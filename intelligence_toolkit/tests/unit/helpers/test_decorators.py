@@ -2,11 +2,23 @@
 # Licensed under the MIT license. See LICENSE file in the project.
 #
 import time
-from unittest.mock import MagicMock
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 
-from intelligence_toolkit.helpers.decorators import retry_with_backoff
+from intelligence_toolkit.helpers.decorators import (
+    RetryStats,
+    get_retry_after,
+    retry_with_backoff,
+)
+
+
+class RateLimitError(Exception):
+    def __init__(self, headers, status_code=429):
+        super().__init__("Rate limit reached")
+        self.status_code = status_code
+        self.response = MagicMock()
+        self.response.headers = headers
 
 
 def test_retry_with_backoff_success_on_first_try():
@@ -90,3 +102,112 @@ def test_retry_with_backoff_returns_correct_value():
     result = decorated()
     
     assert result == expected_value
+
+
+@pytest.mark.asyncio
+async def test_retry_with_backoff_async_success_after_retries():
+    mock_func = AsyncMock(side_effect=[Exception("Error 1"), "success"])
+    stats = RetryStats()
+    decorated = retry_with_backoff(retries=3, backoff_in_seconds=0.01, stats=stats)(
+        mock_func
+    )
+
+    with patch(
+        "intelligence_toolkit.helpers.decorators.asyncio.sleep", new_callable=AsyncMock
+    ) as mock_sleep, patch("intelligence_toolkit.helpers.decorators.time.sleep") as mock_time_sleep:
+        result = await decorated()
+
+    assert result == "success"
+    assert mock_func.await_count == 2
+    mock_sleep.assert_awaited_once()
+    mock_time_sleep.assert_not_called()
+    assert stats.retries == 1
+    assert stats.throttled_retries == 0
+
+
+@pytest.mark.asyncio
+async def test_retry_with_backoff_async_max_retries_exceeded():
+    mock_func = AsyncMock(side_effect=Exception("Persistent error"))
+    decorated = retry_with_backoff(retries=2, backoff_in_seconds=0.01, stats=RetryStats())(
+        mock_func
+    )
+
+    with pytest.raises(Exception, match="Persistent error"):
+        await decorated()
+
+    assert mock_func.await_count == 3
+
+
+@pytest.mark.asyncio
+async def test_retry_with_backoff_async_honours_retry_after():
+    error = Exception("Problem in OpenAI response")
+    error.__cause__ = RateLimitError({"retry-after": "7"})
+    mock_func = AsyncMock(side_effect=[error, "success"])
+    stats = RetryStats()
+    decorated = retry_with_backoff(retries=3, backoff_in_seconds=0.5, stats=stats)(
+        mock_func
+    )
+
+    with patch(
+        "intelligence_toolkit.helpers.decorators.asyncio.sleep", new_callable=AsyncMock
+    ) as mock_sleep:
+        assert await decorated() == "success"
+
+    wait = mock_sleep.await_args[0][0]
+    assert 7 <= wait <= 7.5
+    assert stats.throttled_retries == 1
+    assert stats.throttled_seconds == wait
+
+
+def test_get_retry_after_headers():
+    assert get_retry_after(RateLimitError({"retry-after-ms": "1500"})) == 1.5
+    assert get_retry_after(RateLimitError({"retry-after": "2"})) == 2
+    assert (
+        get_retry_after(
+            RateLimitError(
+                {"x-ratelimit-reset-requests": "1s", "x-ratelimit-reset-tokens": "6m0s"}
+            )
+        )
+        == 360
+    )
+    assert get_retry_after(RateLimitError({"x-ratelimit-reset-tokens": "20ms"})) == 0.02
+    assert get_retry_after(RateLimitError({})) is None
+    assert get_retry_after(Exception("no response")) is None
+
+
+def test_get_retry_after_prefers_retry_after_over_reset_headers():
+    assert (
+        get_retry_after(
+            RateLimitError({"retry-after": "2", "x-ratelimit-reset-tokens": "6m0s"})
+        )
+        == 2
+    )
+    assert (
+        get_retry_after(
+            RateLimitError(
+                {"retry-after-ms": "250", "x-ratelimit-reset-requests": "1s"}
+            )
+        )
+        == 0.25
+    )
+
+
+def test_get_retry_after_ignores_reset_headers_unless_throttled():
+    headers = {"x-ratelimit-reset-requests": "1s", "x-ratelimit-reset-tokens": "6m0s"}
+    assert get_retry_after(RateLimitError(headers, status_code=500)) is None
+    assert get_retry_after(RateLimitError({"retry-after": "3"}, status_code=503)) == 3
+
+
+def test_retry_with_backoff_caps_server_wait():
+    error = RateLimitError({"retry-after": "600"})
+    mock_func = MagicMock(side_effect=[error, "success"])
+    stats = RetryStats()
+    decorated = retry_with_backoff(
+        retries=3, backoff_in_seconds=0.5, stats=stats, max_backoff_in_seconds=10
+    )(mock_func)
+
+    with patch("intelligence_toolkit.helpers.decorators.time.sleep") as mock_sleep:
+        assert decorated() == "success"
+
+    mock_sleep.assert_called_once_with(10)
+    assert stats.throttled_retries == 1
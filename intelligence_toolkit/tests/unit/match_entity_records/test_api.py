@@ -3,6 +3,8 @@
 #
 
 import io
+import json
+import re
 from pathlib import Path
 from unittest.mock import AsyncMock, MagicMock, patch
 
@@ -10,7 +12,6 @@ import numpy as np
 import polars as pl
 import pytest
 
-from intelligence_toolkit.AI.classes import LLMCallback
 from intelligence_toolkit.match_entity_records.api import MatchEntityRecords
 from intelligence_toolkit.match_entity_records.classes import (
     AttributeToMatch,
@@ -233,6 +234,31 @@ class TestEmbedSentences(TestMatchEntityRecords):
         assert isinstance(populated_api.embeddings[0], np.ndarray)
         mock_embedder.embed_store_many.assert_called_once()
 
+    @pytest.mark.asyncio()
+    async def test_embed_sentences_aligns_by_text(self, populated_api) -> None:
+        """Test embeddings follow sentence order, whatever order vectors return in."""
+        mock_embedder = AsyncMock()
+        mock_embedder.embed_store_many = AsyncMock(
+            return_value=[
+                {"text": "sentence2", "vector": [0.4, 0.5]},
+                {"text": "sentence1", "vector": [0.1, 0.2]},
+            ]
+        )
+        populated_api.embedder = mock_embedder
+        populated_api.cache_embeddings = False
+        populated_api.sentences_vector_data = [
+            {"text": "sentence1"},
+            {"text": "sentence2"},
+            {"text": "sentence1"},
+        ]
+
+        await populated_api.embed_sentences()
+
+        assert populated_api.embeddings.shape == (3, 2)
+        np.testing.assert_allclose(
+            populated_api.embeddings, [[0.1, 0.2], [0.4, 0.5], [0.1, 0.2]], rtol=1e-6
+        )
+
 
 class TestDetectRecordGroups(TestMatchEntityRecords):
     def test_detect_record_groups(self, populated_api) -> None:
@@ -265,64 +291,272 @@ class TestDetectRecordGroups(TestMatchEntityRecords):
         assert isinstance(result, pl.DataFrame)
         assert hasattr(populated_api, "matches_df")
 
+    def test_detect_record_groups_with_blocking(self, populated_api) -> None:
+        """Test records are only compared within their blocks."""
+        populated_api.embeddings = np.array([[1.0, 0.0], [1.0, 0.01], [1.0, 0.02]])
+        populated_api.all_sentences = ["a", "b", "c"]
+        populated_api.model_df = pl.DataFrame(
+            {
+                "Entity ID": ["1", "2", "3"],
+                "Entity name": ["Acme", "Acme", "Acme"],
+                "Dataset": ["d1", "d2", "d2"],
+                "City": ["Paris", "Paris", "Rome"],
+            }
+        )
+
+        result = populated_api.detect_record_groups(
+            pair_embedding_threshold=0.05,
+            pair_jaccard_threshold=0.75,
+            blocking_columns=["City"],
+        )
+
+        assert sorted(result["Entity ID"].to_list()) == ["1", "2"]
+
 
 class TestEvaluateGroups(TestMatchEntityRecords):
-    @pytest.mark.asyncio()
-    async def test_evaluate_groups_basic(self, populated_api) -> None:
-        """Test evaluating groups."""
-        # Setup model_df
-        populated_api.model_df = pl.DataFrame(
+    @pytest.fixture()
+    def matches_df(self) -> pl.DataFrame:
+        return pl.DataFrame(
             {
-                "Entity ID": ["1", "2"],
-                "Entity name": ["A", "B"],
-                "Dataset": ["test", "test"],
-                "Name similarity": [0.9, 0.8],
-                "Attribute 1": ["val1", "val2"],
+                "Group ID": [1, 1, 2, 2, 3, 3],
+                "Group size": [2, 2, 2, 2, 2, 2],
+                "Entity name": ["A", "A.", "B", "B Inc", "C", "C Co"],
+                "Dataset": ["d1", "d2", "d1", "d2", "d1", "d2"],
+                "Entity ID": ["1", "2", "3", "4", "5", "6"],
+                "Attribute 1": ["x", "x", "y", "z", "u", "u"],
+                "Name similarity": [0.9, 0.9, 0.8, 0.8, 0.85, 0.85],
             }
         )
 
-        # Mock AI configuration and client
+    @staticmethod
+    def _respond(messages_list, callbacks=None, on_result=None, **kwargs):
+        responses = []
+        for index, messages in enumerate(messages_list):
+            group_ids = sorted(
+                {
+                    int(match)
+                    for match in re.findall(r"^(\d+),", messages[0]["content"], re.M)
+                }
+            )
+            response = json.dumps(
+                {
+                    "evaluations": [
+                        {"group_id": g, "relatedness": g + 5, "explanation": f"Group {g}"}
+                        for g in group_ids
+                    ]
+                }
+            )
+            responses.append(response)
+            on_result(index, response)
+        return responses
+
+    @pytest.mark.asyncio()
+    async def test_evaluate_groups_basic(self, populated_api, matches_df) -> None:
+        """Test every group is evaluated, batched and with structured output."""
+        populated_api.matches_df = matches_df
         populated_api.ai_configuration = MagicMock()
-        mock_response = "1,9,Very similar entities\n2,7,Somewhat related"
 
         with patch(
-            "intelligence_toolkit.match_entity_records.api.OpenAIClient"
-        ) as mock_client:
-            mock_instance = MagicMock()
-            mock_instance.generate_chat_async = AsyncMock(return_value=mock_response)
-            mock_client.return_value = mock_instance
+            "intelligence_toolkit.match_entity_records.api.BaseChat"
+        ) as mock_chat:
+            mock_chat.return_value.generate_texts_async = AsyncMock(
+                side_effect=self._respond
+            )
+
+            result = await populated_api.evaluate_groups(groups_per_request=2)
+
+        messages_list = mock_chat.return_value.generate_texts_async.call_args[0][0]
+        assert len(messages_list) == 2
+        kwargs = mock_chat.return_value.generate_texts_async.call_args[1]
+        assert kwargs["response_format"]["type"] == "json_schema"
+        assert isinstance(result, str)
+        assert populated_api.evaluations_df.to_dicts() == [
+            {"Group ID": 1, "Relatedness": 6, "Explanation": "Group 1"},
+            {"Group ID": 2, "Relatedness": 7, "Explanation": "Group 2"},
+            {"Group ID": 3, "Relatedness": 8, "Explanation": "Group 3"},
+        ]
+        assert len(populated_api.integrated_results) == 6
 
-            result = await populated_api.evaluate_groups()
+    @pytest.mark.asyncio()
+    async def test_evaluate_groups_uses_cache(self, populated_api, matches_df) -> None:
+        """Test only new or changed groups are sent again."""
+        populated_api.matches_df = matches_df
+        populated_api.ai_configuration = MagicMock()
 
-            assert isinstance(result, str)
-            assert hasattr(populated_api, "evaluations_df")
-            assert isinstance(populated_api.evaluations_df, pl.DataFrame)
+        with patch(
+            "intelligence_toolkit.match_entity_records.api.BaseChat"
+        ) as mock_chat:
+            mock_chat.return_value.generate_texts_async = AsyncMock(
+                side_effect=self._respond
+            )
+            await populated_api.evaluate_groups()
+
+            populated_api.matches_df = matches_df.with_columns(
+                pl.when(pl.col("Entity ID") == "6")
+                .then(pl.lit("v"))
+                .otherwise(pl.col("Attribute 1"))
+                .alias("Attribute 1")
+            )
+            await populated_api.evaluate_groups()
+
+            calls = mock_chat.return_value.generate_texts_async.call_args_list
+            assert len(calls) == 2
+            resent = calls[1][0][0]
+            assert len(resent) == 1
+            assert "C Co,v" in resent[0][0]["content"]
+            assert "A." not in resent[0][0]["content"]
+
+            await populated_api.evaluate_groups()
+            assert mock_chat.return_value.generate_texts_async.call_count == 2
+
+        assert len(populated_api.evaluations_df) == 3
 
     @pytest.mark.asyncio()
-    async def test_evaluate_groups_with_callbacks(self, populated_api) -> None:
-        """Test evaluating groups with callbacks."""
-        populated_api.model_df = pl.DataFrame(
+    async def test_evaluate_groups_reuses_renumbered_groups(
+        self, populated_api, matches_df
+    ) -> None:
+        """Test a detection run that renumbers unchanged groups sends nothing."""
+        populated_api.matches_df = matches_df
+        populated_api.ai_configuration = MagicMock()
+
+        with patch(
+            "intelligence_toolkit.match_entity_records.api.BaseChat"
+        ) as mock_chat:
+            mock_chat.return_value.generate_texts_async = AsyncMock(
+                side_effect=self._respond
+            )
+            await populated_api.evaluate_groups()
+
+            # The same groups, numbered and ordered differently
+            populated_api.matches_df = (
+                matches_df.with_columns(
+                    pl.col("Group ID").replace({1: 3, 3: 1}, default=pl.col("Group ID"))
+                )
+                .sort(["Group ID", "Entity name"], descending=[False, True])
+            )
+            await populated_api.evaluate_groups()
+
+        assert mock_chat.return_value.generate_texts_async.call_count == 1
+        assert populated_api.evaluations_df.sort("Group ID").to_dicts() == [
+            {"Group ID": 1, "Relatedness": 8, "Explanation": "Group 3"},
+            {"Group ID": 2, "Relatedness": 7, "Explanation": "Group 2"},
+            {"Group ID": 3, "Relatedness": 6, "Explanation": "Group 1"},
+        ]
+
+    @pytest.mark.asyncio()
+    async def test_evaluate_groups_streams_partial_results(
+        self, populated_api, matches_df
+    ) -> None:
+        """Test evaluations are visible before every request has completed."""
+        populated_api.matches_df = matches_df
+        populated_api.ai_configuration = MagicMock()
+        seen = []
+
+        def respond(messages_list, callbacks=None, on_result=None, **kwargs):
+            def record(index, response):
+                on_result(index, response)
+                seen.append(len(populated_api.integrated_results))
+
+            return self._respond(messages_list, on_result=record)
+
+        with patch(
+            "intelligence_toolkit.match_entity_records.api.BaseChat"
+        ) as mock_chat:
+            mock_chat.return_value.generate_texts_async = AsyncMock(side_effect=respond)
+            await populated_api.evaluate_groups(groups_per_request=1)
+
+        assert seen == [2, 4, 6]
+
+    @pytest.mark.asyncio()
+    async def test_evaluate_groups_skips_malformed_responses(
+        self, populated_api, matches_df
+    ) -> None:
+        """Test a malformed response leaves its groups unevaluated and uncached."""
+        populated_api.matches_df = matches_df
+        populated_api.ai_configuration = MagicMock()
+
+        def respond(messages_list, callbacks=None, on_result=None, **kwargs):
+            on_result(0, "not json")
+            return ["not json"]
+
+        with patch(
+            "intelligence_toolkit.match_entity_records.api.BaseChat"
+        ) as mock_chat:
+            mock_chat.return_value.generate_texts_async = AsyncMock(side_effect=respond)
+            await populated_api.evaluate_groups()
+
+        assert populated_api.evaluations_df.is_empty()
+        assert populated_api.evaluation_cache == {}
+
+    @pytest.mark.asyncio()
+    async def test_evaluate_groups_skips_malformed_items(
+        self, populated_api, matches_df, caplog
+    ) -> None:
+        """Test bad items are skipped and logged while valid ones are kept."""
+        populated_api.matches_df = matches_df
+        populated_api.ai_configuration = MagicMock()
+        response = json.dumps(
             {
-                "Entity ID": ["1"],
-                "Entity name": ["A"],
-                "Dataset": ["test"],
-                "Name similarity": [0.9],
+                "evaluations": [
+                    {"group_id": 1, "relatedness": 6, "explanation": "Group 1"},
+                    {"group_id": 2, "explanation": "No score"},
+                    {"group_id": "3", "relatedness": 8, "explanation": "Group 3"},
+                    "not an item",
+                ]
             }
         )
 
-        populated_api.ai_configuration = MagicMock()
-        mock_response = "1,9,Similar"
-        callbacks = [MagicMock(spec=LLMCallback)]
+        def respond(messages_list, callbacks=None, on_result=None, **kwargs):
+            on_result(0, response)
+            return [response]
 
         with patch(
-            "intelligence_toolkit.match_entity_records.api.OpenAIClient"
-        ) as mock_client:
-            mock_instance = MagicMock()
-            mock_instance.generate_chat_async = AsyncMock(return_value=mock_response)
-            mock_client.return_value = mock_instance
-
-            result = await populated_api.evaluate_groups(callbacks=callbacks)
-            assert isinstance(result, str)
+            "intelligence_toolkit.match_entity_records.api.BaseChat"
+        ) as mock_chat, caplog.at_level("WARNING"):
+            mock_chat.return_value.generate_texts_async = AsyncMock(side_effect=respond)
+            await populated_api.evaluate_groups()
+
+        assert populated_api.evaluations_df.to_dicts() == [
+            {"Group ID": 1, "Relatedness": 6, "Explanation": "Group 1"}
+        ]
+        assert len(populated_api.evaluation_cache) == 1
+        assert "Skipping malformed evaluation" in caplog.text
+        assert "left 2 groups unevaluated" in caplog.text
+
+    @pytest.mark.asyncio()
+    async def test_evaluation_cache_is_per_instance_and_bounded(
+        self, matches_df
+    ) -> None:
+        """Test instances keep separate caches that drop the least recent groups."""
+        first = MatchEntityRecords(evaluation_cache_size=2)
+        second = MatchEntityRecords()
+        first.matches_df = matches_df
+        first.ai_configuration = MagicMock()
+
+        with patch(
+            "intelligence_toolkit.match_entity_records.api.BaseChat"
+        ) as mock_chat:
+            mock_chat.return_value.generate_texts_async = AsyncMock(
+                side_effect=self._respond
+            )
+            await first.evaluate_groups(groups_per_request=1)
+
+        assert len(first.evaluation_cache) == 2
+        assert len(second.evaluation_cache) == 0
+        assert [e["Explanation"] for e in first.evaluation_cache.values()] == [
+            "Group 2",
+            "Group 3",
+        ]
+
+    @pytest.mark.asyncio()
+    async def test_evaluate_groups_without_matches(self, populated_api) -> None:
+        """Test evaluating before any groups are detected."""
+        populated_api.matches_df = pl.DataFrame()
+
+        result = await populated_api.evaluate_groups()
+
+        assert populated_api.evaluations_df.is_empty()
+        assert isinstance(result, str)
 
 
 class TestClearModelDfs(TestMatchEntityRecords):
@@ -2,9 +2,6 @@
 # Licensed under the MIT license. See LICENSE file in the project.
 #
 
-import re
-from collections import defaultdict
-
 import numpy as np
 import polars as pl
 import pytest
@@ -12,12 +9,13 @@ import pytest
 from intelligence_toolkit.match_entity_records.detect import (
     _calculate_mean_score,
     build_attributes_dataframe,
+    build_blocking_keys,
+    build_candidate_near_map,
     build_matches,
     build_matches_dataset,
-    build_near_map,
-    build_nearest_neighbors,
     build_sentence_pair_scores,
     convert_to_sentences,
+    soundex,
 )
 
 
@@ -91,66 +89,99 @@ class TestConvertToSentences:
         assert "VEHICLETYPE: ;" in re["text"]
 
 
-class TestBuildNearestNeighbors:
+class TestBuildCandidateNearMap:
     @pytest.fixture()
-    def embeddings(self) -> np.array:
-        return np.random.rand(1000, 10)
+    def embeddings(self) -> np.ndarray:
+        rng = np.random.default_rng(0)
+        centers = rng.normal(size=(12, 16))
+        return np.repeat(centers, 5, axis=0) + rng.normal(scale=0.02, size=(60, 16))
+
+    def test_matches_brute_force(self, embeddings) -> None:
+        normalized = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+        distances = 1 - normalized @ normalized.T
+        np.fill_diagonal(distances, np.inf)
+        expected = {
+            ix: set(np.nonzero(row <= 0.05)[0].tolist())
+            for ix, row in enumerate(distances)
+        }
+
+        result = build_candidate_near_map(embeddings)
 
-    def test_neighbors_greater_than_embeddings(self) -> None:
-        embeddings = np.array([[1, 2, 3], [4, 5, 6], [7, 8, 9]])
+        assert list(result) == [ix for ix, near in expected.items() if near]
+        for ix, neighbors in result.items():
+            assert set(neighbors) == expected[ix]
 
-        expected_msg = (
-            "Number of neighbors (50) is greater than number of embeddings (3)"
+    def test_batches_do_not_change_result(self, embeddings) -> None:
+        expected = build_candidate_near_map(embeddings, 0.1)
+
+        result = build_candidate_near_map(
+            embeddings, 0.1, query_batch_size=7, corpus_batch_size=11, max_workers=3
         )
-        escaped_expected_msg = re.escape(expected_msg)
-        with pytest.raises(ValueError, match=escaped_expected_msg):
-            build_nearest_neighbors(embeddings, 50)
 
-    def test_neighbors_5(self, embeddings) -> None:
-        result = build_nearest_neighbors(embeddings, 5)
+        assert result == expected
 
-        assert len(result) == 2
-        assert result[0].shape == (1000, 5)
+    def test_n_neighbors_limits_candidates(self, embeddings) -> None:
+        result = build_candidate_near_map(embeddings, 0.5, n_neighbors=3)
 
-    def test_neighbors_10(self, embeddings) -> None:
-        result = build_nearest_neighbors(embeddings, 10)
+        assert all(len(neighbors) == 2 for neighbors in result.values())
+        assert result[0] == build_candidate_near_map(embeddings, 0.5)[0][:2]
 
-        assert len(result) == 2
-        assert result[0].shape == (1000, 10)
+    def test_fewer_records_than_neighbors(self) -> None:
+        embeddings = np.array([[1.0, 0.0], [0.99, 0.01], [0.0, 1.0]])
 
+        result = build_candidate_near_map(embeddings)
 
-class TestBuildNearMap:
-    @pytest.fixture()
-    def all_sentences(self) -> list[str]:
-        return [
-            "ID1: 10; ENTITY NAME: A; VEHICLETYPE: Hatch 1; VEHICLECOLOR: Blue; VEHICLEYEAR: 2021;",
-            "ID1: 20; ENTITY NAME: B; VEHICLETYPE: Sedan 1; VEHICLECOLOR: Red; VEHICLEYEAR: 2022;",
-            "ID1: 30; ENTITY NAME: C; VEHICLETYPE: Truck 1; VEHICLECOLOR: Blue; VEHICLEYEAR: 2022;",
-        ]
+        assert result == {0: [1], 1: [0]}
 
-    def test_result(self, all_sentences) -> None:
-        distances = np.array([[0.01, 0.02, 0.03], [0.04, 0.05, 0.06], [0.03, 0.8, 0.9]])
-        indices = np.array([[0, 1, 2], [0, 1, 2], [0, 1, 2]])
-        result = build_near_map(distances, indices, all_sentences)
+    def test_blocking_keys_restrict_candidates(self, embeddings) -> None:
+        # Split the first cluster across two blocks
+        blocking_keys = [["a"] if ix < 3 else ["b"] for ix in range(60)]
 
-        expected = defaultdict(list)
-        expected[0].extend([1, 2])
-        expected[1].append(1)
+        result = build_candidate_near_map(embeddings, blocking_keys=blocking_keys)
 
-        assert len(result) == 2
-        assert result == expected
+        assert set(result[0]) == {1, 2}
+        assert set(result[3]) == {4}
 
-    def test_result_max_record(self, all_sentences) -> None:
-        distances = np.array([[0.01, 0.02, 0.03], [0.04, 0.05, 0.06], [0.03, 0.8, 0.9]])
-        indices = np.array([[0, 1, 2], [0, 1, 2], [0, 1, 2]])
-        result = build_near_map(distances, indices, all_sentences, 0.1)
+    def test_records_without_keys_have_no_candidates(self, embeddings) -> None:
+        blocking_keys = [[] if ix == 0 else ["a", "b"] for ix in range(60)]
 
-        expected = defaultdict(list)
-        expected[0].extend([1, 2])
-        expected[1].extend([1, 2])
+        result = build_candidate_near_map(embeddings, blocking_keys=blocking_keys)
 
-        assert len(result) == 2
-        assert result == expected
+        assert 0 not in result
+        assert set(result[1]) == {2, 3, 4}
+
+
+class TestBuildBlockingKeys:
+    @pytest.fixture()
+    def merged_df(self) -> pl.DataFrame:
+        return pl.DataFrame(
+            {
+                "Entity name": ["Acme Corp.", "ACME Corporation", "Robert", ""],
+                "City": ["Paris", "paris", "nan", None],
+            }
+        )
+
+    def test_no_blocking(self, merged_df) -> None:
+        assert build_blocking_keys(merged_df) is None
+
+    def test_keys(self, merged_df) -> None:
+        result = build_blocking_keys(
+            merged_df, ["City"], name_prefix_length=4, phonetic_names=True
+        )
+
+        assert result == [
+            ["City=PARIS", "name_prefix=ACME", "name_soundex=A252"],
+            ["City=PARIS", "name_prefix=ACME", "name_soundex=A252"],
+            ["name_prefix=ROBE", "name_soundex=R163"],
+            [],
+        ]
+
+    def test_soundex(self) -> None:
+        assert soundex("Robert") == "R163"
+        assert soundex("Rupert") == "R163"
+        assert soundex("Ashcraft") == "A261"
+        assert soundex("Tymczak") == "T522"
+        assert soundex("") == ""
 
 
 class TestBuildSentencePairScores:
@@ -322,6 +353,40 @@ class TestBuildMatches:
         _, matches, _ = build_matches(sentence_pair_scores, merged_df)
         assert len(matches) == 2
 
+    def test_merged_groups_keep_all_matches(self, merged_df) -> None:
+        sentence_pair_scores = [(0, 1, 0.9), (2, 3, 0.85), (0, 2, 0.8)]
+        entity_to_group, matches, _ = build_matches(sentence_pair_scores, merged_df)
+        assert set(entity_to_group.values()) == {1}
+        assert matches == {
+            (1, "A", "X"),
+            (1, "B", "X"),
+            (1, "C", "Y"),
+            (1, "D", "Y"),
+        }
+
+    def test_chained_merges(self) -> None:
+        merged_df = pl.DataFrame(
+            {
+                "Entity name": [str(i) for i in range(8)],
+                "Dataset": ["X"] * 8,
+            }
+        )
+        # Four separate pairs, then merged one after another
+        sentence_pair_scores = [
+            (0, 1, 0.99),
+            (2, 3, 0.98),
+            (4, 5, 0.97),
+            (6, 7, 0.96),
+            (1, 2, 0.95),
+            (3, 4, 0.94),
+            (5, 6, 0.93),
+        ]
+        entity_to_group, matches, _ = build_matches(sentence_pair_scores, merged_df)
+        assert set(entity_to_group.values()) == {3}
+        assert len(entity_to_group) == 8
+        assert {match[0] for match in matches} == {3}
+        assert len(matches) == 8
+
     def test_pair_to_match(self, merged_df, sentence_pair_scores) -> None:
         _, _, pair_to_match = build_matches(sentence_pair_scores, merged_df)
         expected = {("A::X", "B::X"): 0.8}
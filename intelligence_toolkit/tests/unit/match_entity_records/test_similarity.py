@@ -0,0 +1,74 @@
+# Copyright (c) 2024 Microsoft Corporation. All rights reserved.
+# Licensed under the MIT license. See LICENSE file in the project.
+#
+
+import numpy as np
+import pytest
+
+from intelligence_toolkit.match_entity_records.similarity import (
+    jaro_winkler,
+    score_name_pairs,
+    token_set,
+    trigram_jaccard,
+)
+
+
+@pytest.fixture()
+def names() -> list[str]:
+    return ["Acme Corp.", "ACME CORP", "Acme Corporation", "Corp Acme", "Xy", "MARTHA", "MARHTA"]
+
+
+def test_trigram_jaccard(names) -> None:
+    ix = np.array([0, 0, 4])
+    nx = np.array([1, 2, 4])
+
+    result = trigram_jaccard(names, ix, nx)
+
+    # "ACME CORP" has 7 trigrams, all shared with "ACME CORPORATION" (14 trigrams)
+    np.testing.assert_allclose(result, [1.0, 7 / 14, 0.0])
+
+
+def test_trigram_jaccard_batches(names, monkeypatch) -> None:
+    monkeypatch.setattr(
+        "intelligence_toolkit.match_entity_records.similarity.PAIR_BATCH_SIZE", 2
+    )
+    ix = np.array([0, 0, 1, 2, 3])
+    nx = np.array([1, 2, 3, 3, 0])
+    expected = [trigram_jaccard(names, ix[k : k + 1], nx[k : k + 1])[0] for k in range(5)]
+
+    np.testing.assert_allclose(trigram_jaccard(names, ix, nx), expected)
+
+
+def test_token_set(names) -> None:
+    result = token_set(names, np.array([0, 0]), np.array([3, 2]))
+
+    np.testing.assert_allclose(result, [1.0, 1 / 3])
+
+
+def test_jaro_winkler(names) -> None:
+    result = jaro_winkler(names, np.array([5, 4]), np.array([6, 0]))
+
+    np.testing.assert_allclose(result, [0.9611, 0.0], atol=1e-4)
+
+
+def test_score_name_pairs_exact_names(names) -> None:
+    result = score_name_pairs(names, [0, 4], [1, 4], "token_set")
+
+    np.testing.assert_allclose(result, [1.0, 1.0])
+
+
+def test_score_name_pairs_custom_function(names) -> None:
+    def first_letter(record_names, ix, nx):
+        return np.array(
+            [record_names[i][0] == record_names[n][0] for i, n in zip(ix, nx)], dtype=float
+        )
+
+    result = score_name_pairs(names, [0, 0], [3, 4], first_letter)
+
+    np.testing.assert_allclose(result, [0.0, 0.0])
+    np.testing.assert_allclose(score_name_pairs(names, [0], [2], first_letter), [1.0])
+
+
+def test_score_name_pairs_unknown_function(names) -> None:
+    with pytest.raises(ValueError, match="Unknown name similarity"):
+        score_name_pairs(names, [0], [1], "cosine")
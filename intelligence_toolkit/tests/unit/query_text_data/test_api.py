@@ -9,6 +9,7 @@ from unittest.mock import AsyncMock, MagicMock, patch
 import pandas as pd
 import pytest
 
+from intelligence_toolkit.AI.utils import hash_text
 from intelligence_toolkit.query_text_data.api import QueryTextData, QueryTextDataStage
 from intelligence_toolkit.query_text_data.classes import ChunkSearchConfig, ProcessedChunks
 
@@ -145,6 +146,54 @@ class TestProcessTextChunks:
             )
 
 
+class TestAddTextChunks:
+    @pytest.mark.asyncio
+    async def test_add_text_chunks_embeds_only_new_chunks(self) -> None:
+        """Test appending files processes and embeds only the new chunks."""
+        qtd = QueryTextData()
+        qtd.label_to_chunks = {"file1": ["chunk1"]}
+        qtd.processed_chunks = MagicMock()
+        qtd.processed_chunks.cid_to_text = {1: "text1", 2: "text2"}
+        qtd.cid_to_vector = {1: [0.1, 0.2]}
+        qtd._chunk_vectors_source = qtd.cid_to_vector
+        qtd._community_index_source = qtd.processed_chunks
+        qtd.text_embedder = MagicMock()
+        qtd.embedding_cache = "cache"
+
+        with patch(
+            "intelligence_toolkit.query_text_data.api.input_processor"
+        ) as mock_ip, patch(
+            "intelligence_toolkit.query_text_data.api.helper_functions"
+        ) as mock_hf:
+            mock_ip.update_processed_chunks.return_value = ([2], False)
+            mock_hf.embed_texts = AsyncMock(return_value={2: [0.3, 0.4]})
+
+            result = await qtd.add_text_chunks(
+                {"file1": ["chunk1"], "file2": ["chunk2"]}
+            )
+
+        assert result == [2]
+        assert mock_ip.update_processed_chunks.call_args[0][1] == {"file2": ["chunk2"]}
+        assert mock_hf.embed_texts.call_args[0][0] == {2: "text2"}
+        assert qtd.cid_to_vector == {1: [0.1, 0.2], 2: [0.3, 0.4]}
+        assert qtd._chunk_vectors_source is None
+        assert qtd._community_index_source is None
+        assert list(qtd.label_to_chunks) == ["file1", "file2"]
+
+    @pytest.mark.asyncio
+    async def test_add_text_chunks_before_processing(self) -> None:
+        """Test chunks added before processing are just collected."""
+        qtd = QueryTextData()
+        qtd.label_to_chunks = {"file1": ["chunk1"]}
+
+        with patch("intelligence_toolkit.query_text_data.api.input_processor") as mock_ip:
+            result = await qtd.add_text_chunks({"file2": ["chunk2"]})
+
+        assert result == []
+        mock_ip.update_processed_chunks.assert_not_called()
+        assert qtd.label_to_chunks == {"file1": ["chunk1"], "file2": ["chunk2"]}
+
+
 class TestEmbedTextChunks:
     @pytest.mark.asyncio
     async def test_embed_text_chunks(self) -> None:
@@ -166,6 +215,33 @@ class TestEmbedTextChunks:
             assert qtd.cid_to_vector == mock_vectors
             assert qtd.stage == QueryTextDataStage.CHUNKS_EMBEDDED
 
+    def test_create_vector_index(self, tmp_path) -> None:
+        """Test the vector index replaces exhaustive chunk ranking."""
+        qtd = QueryTextData()
+        qtd.cid_to_vector = {1: [0.1, 0.2], 2: [0.3, 0.4]}
+
+        index = qtd.create_vector_index(db_path=str(tmp_path), candidates=1)
+
+        assert qtd.chunk_vectors is index
+        assert qtd._get_chunk_vectors() is index
+        assert index.rank([0.3, 0.4]) == [2]
+
+    def test_create_vector_index_keys_rows_by_text(self, tmp_path) -> None:
+        """Test index rows carry the embedding cache key of their chunk."""
+        qtd = QueryTextData()
+        qtd.processed_chunks = MagicMock()
+        qtd.processed_chunks.cid_to_text = {1: "first", 2: "second"}
+        qtd.text_embedder = MagicMock(model="test-model")
+        qtd.cid_to_vector = {1: [0.1, 0.2], 2: [0.3, 0.4]}
+
+        index = qtd.create_vector_index(db_path=str(tmp_path))
+
+        stored = index.vector_store.table.to_arrow()
+        assert stored.column("key").to_pylist() == [
+            "test-model:" + hash_text("first"),
+            "test-model:" + hash_text("second"),
+        ]
+
 
 class TestAnchorQueryToConcepts:
     @pytest.mark.asyncio
@@ -5,10 +5,12 @@
 from unittest.mock import MagicMock
 
 import networkx as nx
+import numpy as np
 
 from intelligence_toolkit.query_text_data.classes import (
     AnswerObject,
     ChunkSearchConfig,
+    ChunkVectors,
     ProcessedChunks,
 )
 
@@ -79,6 +81,29 @@ class TestProcessedChunks:
         assert "num_chunks=3" in repr_str
 
 
+class TestChunkVectors:
+    def test_rank_orders_by_cosine_distance(self) -> None:
+        """Test chunks are ranked closest first regardless of vector length."""
+        vectors = ChunkVectors({3: [0.0, 1.0], 1: [10.0, 0.0], 2: [1.0, 1.0]})
+
+        assert vectors.matrix.dtype == np.float32
+        assert vectors.rank([1.0, 0.1]) == [1, 2, 3]
+        assert vectors.rank([1.0, 0.1], exclude=[2]) == [1, 3]
+
+    def test_rank_ties_keep_chunk_order(self) -> None:
+        """Test equal distances are ordered by chunk ID."""
+        vectors = ChunkVectors({5: [1.0, 0.0], 4: [2.0, 0.0], 6: [0.0, 0.0]})
+
+        assert vectors.rank([1.0, 0.0]) == [4, 5, 6]
+
+    def test_empty(self) -> None:
+        """Test an empty set of vectors ranks nothing."""
+        vectors = ChunkVectors({})
+
+        assert len(vectors) == 0
+        assert vectors.rank([1.0, 0.0]) == []
+
+
 class TestChunkSearchConfig:
     def test_initialization(self) -> None:
         """Test ChunkSearchConfig initialization."""
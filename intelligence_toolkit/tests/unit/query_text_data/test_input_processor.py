@@ -3,14 +3,20 @@
 """Tests for query_text_data input_processor module."""
 
 import json
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import MagicMock, patch
 
+import intelligence_toolkit.query_text_data.graph_builder as graph_builder
+from intelligence_toolkit.query_text_data.classes import CommunityIndex
 from intelligence_toolkit.query_text_data.input_processor import (
+    ConceptGraphBuilder,
     PeriodOption,
     concert_titled_texts_to_chunks,
+    process_chunk_stream,
     process_chunks,
     process_json_text,
     process_json_texts,
+    update_processed_chunks,
 )
 
 
@@ -374,6 +380,282 @@ class TestProcessChunks:
             assert len(result.cid_to_text) == 2
 
 
+def _word_pair_concepts(
+    node_counts, edge_counts, periods, chunk, cid, concept_to_cids, cid_to_concepts
+):
+    # Stands in for noun-phrase extraction, which needs NLTK corpora
+    words = json.loads(chunk)["text_chunk"].split()
+    concepts = sorted({f"{a} {b}" for a, b in zip(words, words[1:])})
+    for concept in concepts:
+        concept_to_cids[concept].append(cid)
+    cid_to_concepts[cid] = concepts
+    for period in periods:
+        for concept in concepts:
+            node_counts[concept][period] += 1
+        for ix, first in enumerate(concepts):
+            for second in concepts[ix + 1 :]:
+                edge_counts[(first, second)][period] += 1
+
+
+def _file_to_chunks():
+    words = ["solar power", "wind farm", "carbon tax", "grid storage"]
+    return {
+        f"file{f}.txt": [
+            json.dumps({
+                "title": f"Doc{f}",
+                "text_chunk": " ".join(words[(f + c) % 4 : (f + c) % 4 + 2]),
+                "chunk_id": c + 1,
+                "period": f"2024-0{c % 2 + 1}",
+            })
+            for c in range(f + 2)
+        ]
+        for f in range(4)
+    }
+
+
+def _as_dicts(counts):
+    return {key: dict(period_counts) for key, period_counts in counts.items()}
+
+
+class TestConceptGraphBuilder:
+    def test_parallel_matches_serial(self) -> None:
+        """Test merged per-batch counts equal in-process extraction."""
+        with patch(
+            "intelligence_toolkit.query_text_data.input_processor.graph_builder.update_concept_graph_edges",
+            _word_pair_concepts,
+        ):
+            serial = ConceptGraphBuilder(max_workers=1)
+            serial.add_chunks(_file_to_chunks())
+            parallel = ConceptGraphBuilder(
+                max_workers=3, batch_size=2, min_parallel_chunks=1
+            )
+            callback = MagicMock()
+            # Threads stand in for worker processes so the patch applies
+            with patch(
+                "intelligence_toolkit.query_text_data.input_processor.ProcessPoolExecutor",
+                side_effect=lambda max_workers, mp_context: ThreadPoolExecutor(
+                    max_workers
+                ),
+            ) as mock_pool:
+                parallel.add_chunks(_file_to_chunks(), callbacks=[callback])
+
+        assert dict(parallel.cid_to_concepts) == dict(serial.cid_to_concepts)
+        assert dict(parallel.concept_to_cids) == dict(serial.concept_to_cids)
+        assert _as_dicts(parallel.node_period_counts) == _as_dicts(serial.node_period_counts)
+        assert _as_dicts(parallel.edge_period_counts) == _as_dicts(serial.edge_period_counts)
+        assert callback.on_batch_change.call_args[0] == (14, 14)
+        assert mock_pool.call_args[1]["mp_context"].get_start_method() == "spawn"
+        serial_graph = serial.concept_graphs()["ALL"]
+        parallel_graph = parallel.concept_graphs()["ALL"]
+        assert list(parallel_graph.nodes(data=True)) == list(serial_graph.nodes(data=True))
+        assert list(parallel_graph.edges(data=True)) == list(serial_graph.edges(data=True))
+
+    def test_next_links_stop_at_file_end(self) -> None:
+        """Test each file's last chunk has no next chunk, whatever the file lengths."""
+        with patch("intelligence_toolkit.query_text_data.input_processor.graph_builder"):
+            builder = ConceptGraphBuilder(max_workers=1)
+            cids = builder.add_chunks(_file_to_chunks())
+
+        assert cids == list(range(1, 15))
+        # Files hold 2, 3, 4 and 5 chunks
+        assert 2 not in builder.next_cid
+        assert builder.next_cid[4] == 5
+        assert 5 not in builder.next_cid
+        assert 6 not in builder.previous_cid
+
+    def test_stream_matches_batch_processing(self) -> None:
+        """Test streaming files one at a time builds the same graphs."""
+        graphs = []
+        with patch(
+            "intelligence_toolkit.query_text_data.input_processor.graph_builder.update_concept_graph_edges",
+            _word_pair_concepts,
+        ), patch(
+            "intelligence_toolkit.query_text_data.input_processor.graph_builder.prepare_concept_graphs",
+            return_value=({}, {}),
+        ):
+            streamed = process_chunk_stream(
+                iter(_file_to_chunks().items()),
+                100,
+                1,
+                1,
+                graph_callback=graphs.append,
+                max_workers=1,
+            )
+            batched = process_chunks(_file_to_chunks(), 100, 1, 1, max_workers=1)
+
+        assert len(graphs) == 4
+        assert len(graphs[0]["ALL"].nodes()) < len(graphs[-1]["ALL"].nodes())
+        assert dict(streamed.cid_to_concepts) == dict(batched.cid_to_concepts)
+        assert list(streamed.period_concept_graphs["ALL"].edges(data=True)) == list(
+            batched.period_concept_graphs["ALL"].edges(data=True)
+        )
+
+
+class TestUpdateProcessedChunks:
+    def _processed_chunks(self):
+        file_to_chunks = _file_to_chunks()
+        initial = {label: file_to_chunks[label] for label in ["file0.txt", "file1.txt"]}
+        return process_chunks(initial, 100, 1, 1, max_workers=1), file_to_chunks
+
+    def test_adds_only_new_chunks(self) -> None:
+        """Test new files get fresh chunk IDs and leave existing chunks untouched."""
+        with patch(
+            "intelligence_toolkit.query_text_data.input_processor.graph_builder.update_concept_graph_edges",
+            _word_pair_concepts,
+        ):
+            processed_chunks, file_to_chunks = self._processed_chunks()
+            existing = dict(processed_chunks.cid_to_concepts)
+            new_cids, _ = update_processed_chunks(
+                processed_chunks,
+                {"file2.txt": file_to_chunks["file2.txt"]},
+                100,
+                1,
+                1,
+                drift_threshold=1.0,
+                max_workers=1,
+            )
+            batched = process_chunks(
+                {label: file_to_chunks[label] for label in ["file0.txt", "file1.txt", "file2.txt"]},
+                100,
+                1,
+                1,
+                max_workers=1,
+            )
+
+        assert new_cids == [6, 7, 8, 9]
+        assert {cid: processed_chunks.cid_to_concepts[cid] for cid in existing} == existing
+        assert dict(processed_chunks.cid_to_concepts) == dict(batched.cid_to_concepts)
+        assert processed_chunks.previous_cid[7] == 6
+        assert 9 not in processed_chunks.next_cid
+        assert set(processed_chunks.period_concept_graphs["ALL"].nodes()) == set(
+            batched.period_concept_graphs["ALL"].nodes()
+        )
+
+    def test_recomputes_communities_only_past_drift_threshold(self) -> None:
+        """Test community detection reruns only when enough concepts lack a community."""
+        new_file = [
+            json.dumps({"title": "New", "text_chunk": "heat pump retrofit", "chunk_id": 1})
+        ]
+        with patch(
+            "intelligence_toolkit.query_text_data.input_processor.graph_builder.update_concept_graph_edges",
+            _word_pair_concepts,
+        ):
+            processed_chunks, file_to_chunks = self._processed_chunks()
+            communities = processed_chunks.hierarchical_communities
+            with patch(
+                "intelligence_toolkit.query_text_data.input_processor.graph_builder.detect_concept_communities",
+                wraps=graph_builder.detect_concept_communities,
+            ) as mock_detect:
+                # Only known concepts, so nothing has drifted
+                _, recomputed = update_processed_chunks(
+                    processed_chunks,
+                    {"file3.txt": file_to_chunks["file3.txt"]},
+                    100,
+                    1,
+                    1,
+                    drift_threshold=0.0,
+                    max_workers=1,
+                )
+                assert not recomputed
+                mock_detect.assert_not_called()
+                assert processed_chunks.hierarchical_communities is communities
+
+                _, recomputed = update_processed_chunks(
+                    processed_chunks,
+                    {"new.txt": new_file},
+                    100,
+                    1,
+                    1,
+                    drift_threshold=0.0,
+                    max_workers=1,
+                )
+
+        assert recomputed
+        mock_detect.assert_called_once()
+        graph = processed_chunks.period_concept_graphs["ALL"]
+        assert graph.nodes["heat pump"]["community"] != -1
+
+
+    def test_keeps_new_concepts_below_drift_threshold(self) -> None:
+        """Test concepts added without recomputing take a neighbouring community."""
+        new_file = [
+            json.dumps({
+                "title": "New",
+                "text_chunk": "solar power wind farm heat pump",
+                "chunk_id": 1,
+            })
+        ]
+        with patch(
+            "intelligence_toolkit.query_text_data.input_processor.graph_builder.update_concept_graph_edges",
+            _word_pair_concepts,
+        ):
+            processed_chunks, _ = self._processed_chunks()
+            _, recomputed = update_processed_chunks(
+                processed_chunks,
+                {"new.txt": new_file},
+                100,
+                1,
+                1,
+                drift_threshold=1.0,
+                max_workers=1,
+            )
+
+        assert not recomputed
+        graph = processed_chunks.period_concept_graphs["ALL"]
+        assert "heat pump" in graph.nodes()
+        assert graph.nodes["heat pump"]["community"] in {
+            graph.nodes[concept]["community"]
+            for concept in ["solar power", "power wind", "wind farm"]
+        }
+
+
+    def test_ranks_chunks_of_new_concepts_below_drift_threshold(self) -> None:
+        """Test appended chunks with only new concepts join community ranking."""
+        new_file = [
+            json.dumps({
+                "title": "New",
+                "text_chunk": "solar power wind farm heat pump",
+                "chunk_id": 1,
+            }),
+            json.dumps({"title": "New", "text_chunk": "heat pump retrofit", "chunk_id": 2}),
+        ]
+        with patch(
+            "intelligence_toolkit.query_text_data.input_processor.graph_builder.update_concept_graph_edges",
+            _word_pair_concepts,
+        ):
+            processed_chunks, _ = self._processed_chunks()
+            new_cids, recomputed = update_processed_chunks(
+                processed_chunks,
+                {"new.txt": new_file},
+                100,
+                1,
+                1,
+                drift_threshold=1.0,
+                max_workers=1,
+            )
+
+        assert not recomputed
+        retrofit_cid = new_cids[1]
+        assert processed_chunks.cid_to_concepts[retrofit_cid] == [
+            "heat pump",
+            "pump retrofit",
+        ]
+        assert {"heat pump", "pump retrofit"} <= processed_chunks.inferred_concepts
+        _, level_to_community_to_cids = CommunityIndex(processed_chunks).rank(
+            [retrofit_cid], 5
+        )
+        assert any(
+            retrofit_cid in cids for cids in level_to_community_to_cids[0].values()
+        )
+        networks = graph_builder.build_meta_graph(
+            processed_chunks.period_concept_graphs["ALL"],
+            processed_chunks.hierarchical_communities,
+        )
+        assert any(
+            "pump retrofit" in network.nodes() for network in networks[0].values()
+        )
+
+
 class TestPeriodOption:
     def test_period_option_values(self) -> None:
         """Test PeriodOption enum has expected values."""
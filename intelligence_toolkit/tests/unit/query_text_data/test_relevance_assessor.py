@@ -277,3 +277,117 @@ class TestAssessRelevance:
             progress_callback.assert_called()
             chunk_callback.assert_called()
             commentary.add_chunks.assert_called()
+
+
+def _reference_ranking(aq_embedding, cid_to_vector, processed_chunks, ranking_chunks):
+    # The original per-chunk cosine loop and list.index community ordering
+    from collections import defaultdict
+
+    import scipy.spatial.distance
+
+    semantic_search_cids = [
+        cid
+        for cid, _ in sorted(
+            [
+                (cid, scipy.spatial.distance.cosine(aq_embedding, vector))
+                for cid, vector in sorted(cid_to_vector.items())
+            ],
+            key=lambda x: x[1],
+        )
+    ]
+    concept_to_level_to_community = defaultdict(dict)
+    for hc in processed_chunks.hierarchical_communities:
+        concept_to_level_to_community[hc.node][hc.level] = (
+            processed_chunks.community_to_label[hc.cluster]
+        )
+    level_to_sequence = {}
+    level_to_community_to_cids = defaultdict(lambda: defaultdict(list))
+    candidates = defaultdict(lambda: defaultdict(set))
+    cid_to_level_to_communities = defaultdict(lambda: defaultdict(set))
+    max_level = max(hc.level for hc in processed_chunks.hierarchical_communities)
+    for level in range(max_level + 1):
+        for cid, concepts in processed_chunks.cid_to_concepts.items():
+            for concept in concepts:
+                level_to_community = concept_to_level_to_community.get(concept, {})
+                for source_level in (level, level - 1):
+                    if source_level in level_to_community:
+                        community = level_to_community[source_level]
+                        cid_to_level_to_communities[cid][level].add(community)
+                        candidates[level][community].add(cid)
+                        break
+        mean_ranks = [
+            (
+                community,
+                np.mean(
+                    sorted(semantic_search_cids.index(c) for c in cids)[:ranking_chunks]
+                ),
+            )
+            for community, cids in candidates[level].items()
+        ]
+        sequence = [x[0] for x in sorted(mean_ranks, key=lambda x: x[1])]
+        level_to_sequence[level] = sequence
+        for cid in semantic_search_cids:
+            communities = cid_to_level_to_communities[cid][level]
+            if len(communities) > 0:
+                assigned = sorted(communities, key=sequence.index)[0]
+                level_to_community_to_cids[level][assigned].append(cid)
+    return semantic_search_cids, level_to_sequence, level_to_community_to_cids
+
+
+class TestCommunityIndex:
+    def _processed_chunks(self, rng, num_chunks, num_concepts):
+        hierarchical = []
+        community_to_label = {}
+        for concept in range(num_concepts):
+            top = concept % 3
+            hierarchical.append(
+                MagicMock(node=f"c{concept}", level=0, cluster=top, parent_cluster=None)
+            )
+            community_to_label[top] = str(top)
+            if concept % 2 == 0:
+                child = 10 + concept
+                hierarchical.append(
+                    MagicMock(node=f"c{concept}", level=1, cluster=child, parent_cluster=top)
+                )
+                community_to_label[child] = str(child)
+        processed_chunks = MagicMock()
+        processed_chunks.hierarchical_communities = hierarchical
+        processed_chunks.community_to_label = community_to_label
+        processed_chunks.cid_to_concepts = {
+            cid: [f"c{x}" for x in rng.choice(num_concepts, size=2, replace=False)]
+            for cid in range(num_chunks)
+        }
+        return processed_chunks
+
+    def test_matches_reference_ranking(self) -> None:
+        """Test the vectorized ranking reproduces the per-chunk implementation."""
+        from intelligence_toolkit.query_text_data.classes import (
+            ChunkVectors,
+            CommunityIndex,
+        )
+
+        rng = np.random.default_rng(0)
+        cid_to_vector = {cid: rng.normal(size=16).tolist() for cid in range(200)}
+        processed_chunks = self._processed_chunks(rng, 200, 12)
+        query = rng.normal(size=16)
+
+        semantic_search_cids = ChunkVectors(cid_to_vector).rank(query)
+        community_index = CommunityIndex(processed_chunks)
+        sequence, community_to_cids = community_index.rank(semantic_search_cids, 5)
+        expected_cids, expected_sequence, expected_community_to_cids = (
+            _reference_ranking(query, cid_to_vector, processed_chunks, 5)
+        )
+
+        assert semantic_search_cids == expected_cids
+        for level, expected in expected_sequence.items():
+            assert sequence[level] == expected
+            assert dict(community_to_cids[level]) == dict(
+                expected_community_to_cids[level]
+            )
+        assert community_index.community_to_parent["10"] == "0"
+
+        # Excluded chunks are left out of every community
+        excluded = semantic_search_cids[:50]
+        _, community_to_cids = community_index.rank(semantic_search_cids[50:], 5)
+        assigned = [cid for cids in community_to_cids[1].values() for cid in cids]
+        assert not set(excluded) & set(assigned)
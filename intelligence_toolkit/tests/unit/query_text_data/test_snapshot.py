@@ -0,0 +1,194 @@
+# Copyright (c) 2024 Microsoft Corporation. All rights reserved.
+# Licensed under the MIT license. See LICENSE file in the project.
+"""Tests for query_text_data snapshot module."""
+
+import json
+import os
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from intelligence_toolkit.query_text_data.api import QueryTextData, QueryTextDataStage
+from intelligence_toolkit.query_text_data.classes import ChunkVectors
+from intelligence_toolkit.query_text_data.input_processor import process_chunks
+from intelligence_toolkit.query_text_data.snapshot import (
+    Snapshot,
+    load_snapshot,
+    save_snapshot,
+)
+
+
+def _word_pair_concepts(
+    node_counts, edge_counts, periods, chunk, cid, concept_to_cids, cid_to_concepts
+):
+    # Stands in for noun-phrase extraction, which needs NLTK corpora
+    words = json.loads(chunk)["text_chunk"].split()
+    concepts = sorted({f"{a} {b}" for a, b in zip(words, words[1:])})
+    for concept in concepts:
+        concept_to_cids[concept].append(cid)
+    cid_to_concepts[cid] = concepts
+    for period in periods:
+        for concept in concepts:
+            node_counts[concept][period] += 1
+        for ix, first in enumerate(concepts):
+            for second in concepts[ix + 1 :]:
+                edge_counts[(first, second)][period] += 1
+
+
+@pytest.fixture
+def label_to_chunks():
+    words = ["solar power", "wind farm", "carbon tax", "grid storage", "heat pump"]
+    return {
+        f"file{f}.txt": [
+            json.dumps({
+                "title": f"Doc{f}",
+                "text_chunk": " ".join(words[(f + c) % 5 : (f + c) % 5 + 3]),
+                "chunk_id": c + 1,
+                "period": f"2024-0{c % 2 + 1}",
+            })
+            for c in range(f + 2)
+        ]
+        for f in range(3)
+    }
+
+
+@pytest.fixture
+def processed_chunks(label_to_chunks):
+    with patch(
+        "intelligence_toolkit.query_text_data.input_processor.graph_builder.update_concept_graph_edges",
+        _word_pair_concepts,
+    ):
+        return process_chunks(label_to_chunks, 100, 1, 1, max_workers=1)
+
+
+def _as_dicts(counts):
+    return {key: dict(period_counts) for key, period_counts in counts.items()}
+
+
+def test_round_trip(tmp_path, processed_chunks, label_to_chunks) -> None:
+    """Test a saved snapshot reloads the same workspace state."""
+    cid_to_vector = {
+        cid: np.array([cid, 1.0, 0.5], dtype=np.float32)
+        for cid in processed_chunks.cid_to_text
+    }
+    processed_chunks.inferred_concepts = {
+        processed_chunks.hierarchical_communities[0].node
+    }
+    save_snapshot(
+        str(tmp_path),
+        Snapshot(
+            processed_chunks,
+            cid_to_vector=cid_to_vector,
+            label_to_chunks=label_to_chunks,
+            metadata={"concept_graph_params": [100, 1, 1]},
+        ),
+    )
+
+    loaded = load_snapshot(str(tmp_path))
+    pc = loaded.processed_chunks
+
+    assert pc.cid_to_text == processed_chunks.cid_to_text
+    assert pc.text_to_cid == processed_chunks.text_to_cid
+    assert pc.previous_cid == processed_chunks.previous_cid
+    assert pc.next_cid == processed_chunks.next_cid
+    assert dict(pc.cid_to_concepts) == dict(processed_chunks.cid_to_concepts)
+    assert dict(pc.concept_to_cids) == dict(processed_chunks.concept_to_cids)
+    assert dict(pc.period_to_cids) == dict(processed_chunks.period_to_cids)
+    assert _as_dicts(pc.node_period_counts) == _as_dicts(processed_chunks.node_period_counts)
+    assert _as_dicts(pc.edge_period_counts) == _as_dicts(processed_chunks.edge_period_counts)
+    assert len(pc.hierarchical_communities) > 0
+    assert list(pc.hierarchical_communities) == list(processed_chunks.hierarchical_communities)
+    assert (
+        pc.hierarchical_communities.final_level_hierarchical_clustering()
+        == processed_chunks.hierarchical_communities.final_level_hierarchical_clustering()
+    )
+    assert pc.community_to_label == processed_chunks.community_to_label
+    assert pc.inferred_concepts == processed_chunks.inferred_concepts
+    assert set(pc.period_concept_graphs) == set(processed_chunks.period_concept_graphs)
+    for period, G in processed_chunks.period_concept_graphs.items():
+        assert dict(pc.period_concept_graphs[period].nodes(data=True)) == dict(G.nodes(data=True))
+        assert {
+            frozenset((u, v)): data
+            for u, v, data in pc.period_concept_graphs[period].edges(data=True)
+        } == {frozenset((u, v)): data for u, v, data in G.edges(data=True)}
+    assert dict(loaded.label_to_chunks) == label_to_chunks
+    assert loaded.metadata == {"concept_graph_params": [100, 1, 1]}
+    assert set(loaded.cid_to_vector) == set(cid_to_vector)
+    for cid, vector in cid_to_vector.items():
+        np.testing.assert_array_equal(loaded.cid_to_vector[cid], vector)
+
+
+def test_round_trip_without_optional_parts(tmp_path, processed_chunks) -> None:
+    """Test a snapshot of unembedded chunks without communities."""
+    processed_chunks.hierarchical_communities = None
+    save_snapshot(str(tmp_path), Snapshot(processed_chunks))
+
+    loaded = load_snapshot(str(tmp_path))
+
+    assert loaded.cid_to_vector is None
+    assert loaded.label_to_chunks is None
+    assert loaded.processed_chunks.hierarchical_communities is None
+    assert not os.path.exists(tmp_path / "vectors.arrow")
+
+
+def test_loaded_chunk_vectors_share_the_mapped_file(tmp_path, processed_chunks) -> None:
+    """Test ranking uses the memory-mapped vectors without copying them."""
+    cid_to_vector = {
+        cid: [float(cid), 1.0, 0.5] for cid in processed_chunks.cid_to_text
+    }
+    save_snapshot(str(tmp_path), Snapshot(processed_chunks, cid_to_vector=cid_to_vector))
+
+    loaded = load_snapshot(str(tmp_path))
+
+    matrix = loaded.chunk_vectors.matrix
+    assert not matrix.flags.owndata
+    assert np.shares_memory(matrix, loaded.cid_to_vector[min(cid_to_vector)])
+    assert loaded.chunk_vectors.rank([1.0, 2.0, 0.0]) == ChunkVectors(
+        cid_to_vector
+    ).rank([1.0, 2.0, 0.0])
+
+
+def test_save_requires_processed_chunks(tmp_path) -> None:
+    """Test saving before any chunks are processed is reported clearly."""
+    with pytest.raises(ValueError, match="No processed chunks"):
+        QueryTextData().save_snapshot(str(tmp_path))
+
+    assert not os.path.exists(tmp_path / "manifest.json")
+
+
+def test_load_rejects_newer_version(tmp_path, processed_chunks) -> None:
+    """Test snapshots from a newer format version are refused."""
+    save_snapshot(str(tmp_path), Snapshot(processed_chunks))
+    manifest_path = tmp_path / "manifest.json"
+    manifest = json.loads(manifest_path.read_text())
+    manifest["version"] += 1
+    manifest_path.write_text(json.dumps(manifest))
+
+    with pytest.raises(ValueError, match="newer"):
+        load_snapshot(str(tmp_path))
+
+
+def test_load_requires_manifest(tmp_path) -> None:
+    """Test an incomplete snapshot directory is reported."""
+    with pytest.raises(FileNotFoundError):
+        load_snapshot(str(tmp_path))
+
+
+def test_query_text_data_round_trip(tmp_path, processed_chunks, label_to_chunks) -> None:
+    """Test the workflow reopens a saved corpus at the embedded stage."""
+    qtd = QueryTextData()
+    qtd.label_to_chunks = label_to_chunks
+    qtd.processed_chunks = processed_chunks
+    qtd.concept_graph_params = (100, 1, 1)
+    qtd.cid_to_vector = {cid: [float(cid), 1.0] for cid in processed_chunks.cid_to_text}
+    qtd.save_snapshot(str(tmp_path))
+
+    reopened = QueryTextData()
+    result = reopened.load_snapshot(str(tmp_path))
+
+    assert result is reopened.processed_chunks
+    assert result.cid_to_text == processed_chunks.cid_to_text
+    assert reopened.concept_graph_params == (100, 1, 1)
+    assert reopened.stage == QueryTextDataStage.CHUNKS_EMBEDDED
+    assert reopened.chunk_vectors.rank([1.0, 1.0])[0] == 1
@@ -0,0 +1,139 @@
+# Copyright (c) 2024 Microsoft Corporation. All rights reserved.
+# Licensed under the MIT license. See LICENSE file in the project.
+"""Tests for query_text_data vector_index module."""
+
+import tempfile
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from intelligence_toolkit.AI.vector_store import VectorStore
+from intelligence_toolkit.query_text_data.classes import ChunkVectors
+from intelligence_toolkit.query_text_data.vector_index import (
+    ChunkVectorIndex,
+    _num_sub_vectors,
+)
+
+
+@pytest.fixture
+def temp_db_path():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        yield tmpdir
+
+
+@pytest.fixture
+def cid_to_vector():
+    rng = np.random.default_rng(0)
+    return {cid: rng.normal(size=16).tolist() for cid in range(400)}
+
+
+class TestChunkVectorIndex:
+    def test_exhaustive_search_matches_chunk_vectors(
+        self, temp_db_path, cid_to_vector
+    ) -> None:
+        """Test an unindexed corpus ranks like the in-memory vectors."""
+        index = ChunkVectorIndex(cid_to_vector, temp_db_path, candidates=20)
+        query = cid_to_vector[5]
+
+        assert not index.indexed
+        assert index.rank(query) == ChunkVectors(cid_to_vector).rank(query)[:20]
+
+    def test_rank_excludes_chunks(self, temp_db_path, cid_to_vector) -> None:
+        """Test excluded chunks are skipped without shrinking the candidate list."""
+        index = ChunkVectorIndex(cid_to_vector, temp_db_path, candidates=10)
+
+        ranked = index.rank(cid_to_vector[5], exclude=[5])
+
+        assert 5 not in ranked
+        assert len(ranked) == 10
+
+    def test_builds_ann_index(self, temp_db_path, cid_to_vector) -> None:
+        """Test corpora above the size threshold get an IVF-PQ index."""
+        index = ChunkVectorIndex(
+            cid_to_vector, temp_db_path, candidates=5, nprobes=20, refine_factor=20, min_rows=0
+        )
+
+        assert index.indexed
+        assert index.rank(cid_to_vector[42])[0] == 42
+
+    def test_reopens_persisted_index(self, temp_db_path, cid_to_vector) -> None:
+        """Test the same embeddings reuse the stored table and index."""
+        ChunkVectorIndex(cid_to_vector, temp_db_path, min_rows=0)
+
+        with patch.object(VectorStore, "save") as mock_save, patch.object(
+            VectorStore, "create_vector_index"
+        ) as mock_index:
+            index = ChunkVectorIndex(cid_to_vector, temp_db_path, min_rows=0)
+
+        mock_save.assert_not_called()
+        mock_index.assert_not_called()
+        assert index.indexed
+        assert len(index) == 400
+
+    def test_appends_new_chunks_to_one_table(self, temp_db_path, cid_to_vector) -> None:
+        """Test a grown corpus writes only its new rows into the same table."""
+        first = {cid: cid_to_vector[cid] for cid in range(350)}
+        ChunkVectorIndex(first, temp_db_path, min_rows=0)
+
+        with patch.object(
+            VectorStore, "save", autospec=True, side_effect=VectorStore.save
+        ) as mock_save, patch.object(VectorStore, "create_vector_index") as mock_index:
+            index = ChunkVectorIndex(cid_to_vector, temp_db_path, min_rows=0)
+
+        saved = mock_save.call_args[0][1]
+        assert saved.column("cid").to_pylist() == list(range(350, 400))
+        # 50 of 400 rows unindexed is below the retrain share
+        mock_index.assert_not_called()
+        assert index.vector_store.count_unindexed_rows() == 50
+        assert index.vector_store.db_connection.table_names() == [
+            index.vector_store.table_name
+        ]
+        assert index.rank(cid_to_vector[380])[0] == 380
+
+    def test_retrains_index_past_share(self, temp_db_path, cid_to_vector) -> None:
+        """Test the index is retrained once enough rows were appended after it."""
+        first = {cid: cid_to_vector[cid] for cid in range(300)}
+        ChunkVectorIndex(first, temp_db_path, min_rows=0)
+
+        index = ChunkVectorIndex(
+            cid_to_vector, temp_db_path, min_rows=0, retrain_share=0.2
+        )
+
+        assert index.vector_store.count_unindexed_rows() == 0
+
+    def test_rebuilds_changed_embeddings(self, temp_db_path, cid_to_vector) -> None:
+        """Test a table holding other embeddings for the same chunks is rewritten."""
+        ChunkVectorIndex(cid_to_vector, temp_db_path, candidates=1)
+        changed = {cid: list(reversed(vector)) for cid, vector in cid_to_vector.items()}
+
+        index = ChunkVectorIndex(changed, temp_db_path, candidates=1)
+
+        assert index.vector_store.table.count_rows() == 400
+        assert index.rank(changed[7]) == [7]
+
+    def test_drops_fingerprint_tables(self, temp_db_path, cid_to_vector) -> None:
+        """Test tables named after an embedding fingerprint are removed."""
+        VectorStore(None, temp_db_path).db_connection.create_table(
+            "query_text_data_chunks_" + "0f" * 16, data=[{"cid": 1}]
+        )
+
+        index = ChunkVectorIndex(cid_to_vector, temp_db_path)
+
+        assert index.vector_store.db_connection.table_names() == [
+            "query_text_data_chunks"
+        ]
+
+    def test_empty(self, temp_db_path) -> None:
+        """Test an empty corpus ranks nothing."""
+        index = ChunkVectorIndex({}, temp_db_path)
+
+        assert index.rank([1.0, 0.0]) == []
+
+
+def test_num_sub_vectors_divides_dimensions() -> None:
+    """Test the PQ sub-vector count always divides the dimension count."""
+    assert _num_sub_vectors(1536) == 96
+    assert _num_sub_vectors(384) == 24
+    assert _num_sub_vectors(100) == 5
+    assert _num_sub_vectors(3) == 1